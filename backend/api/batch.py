@@ -0,0 +1,119 @@
+"""
+POST /api/batch: several read-only API calls in one round trip.
+
+The batch is authenticated once, which leaves the caller's principal in the
+principal cache, and every sub-request is then dispatched in-process through
+the application (with the caller's Authorization header), so it runs the same
+routes, dependencies and authorization checks as a direct call. Sub-requests
+run concurrently, at most MAX_CONCURRENCY at a time, and each result carries
+its own status code; a failing item never fails the batch.
+
+Response bodies are spliced into the batch response as they are, without being
+parsed and encoded again.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+
+from ..core.auth import get_current_user_async
+from ..models import models, schemas
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+MAX_BATCH_SIZE = 20
+# Below the database pool size, so one batch cannot take every connection
+MAX_CONCURRENCY = 6
+READ_METHODS = {"GET"}
+API_PREFIX = "/api/"
+BATCH_PATH = "/api/batch"
+# Headers of a sub-response that are meaningless inside the batch body
+SKIPPED_HEADERS = {"content-length", "content-type", "content-encoding", "vary"}
+
+def _error(detail: str) -> bytes:
+    return orjson.dumps({"detail": detail})
+
+async def _dispatch(request: Request, path: str, query: str) -> Tuple[int, Dict[str, str], bytes, bool]:
+    """Run one GET through the application; (status, headers, body, body is JSON)."""
+    headers = [(b"accept", b"application/json")]
+    authorization = request.headers.get("authorization")
+    if authorization:
+        headers.append((b"authorization", authorization.encode("latin-1")))
+    scope = {
+        **{key: request.scope[key] for key in ("http_version", "scheme", "server", "client", "root_path") if key in request.scope},
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "method": "GET",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        # Lifespan state is shared; per-request keys must not be
+        "state": dict(request.scope.get("state", {})),
+    }
+    start: Dict = {}
+    chunks: List[bytes] = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            start.update(message)
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        # The server error middleware has already sent a 500 if the route raised
+        logger.exception("Batch sub-request GET %s failed", path)
+        if not start:
+            return 500, {}, _error("Internal Server Error"), True
+    response_headers = {}
+    is_json = False
+    for name, value in start.get("headers", []):
+        name = name.decode("latin-1").lower()
+        if name == "content-type":
+            is_json = value.startswith(b"application/json")
+        elif name not in SKIPPED_HEADERS:
+            response_headers[name] = value.decode("latin-1")
+    return start.get("status", 500), response_headers, b"".join(chunks), is_json
+
+async def _run_item(request: Request, item: schemas.BatchItem, semaphore: asyncio.Semaphore) -> Tuple[int, Dict[str, str], bytes, bool]:
+    if item.method.upper() not in READ_METHODS:
+        return 405, {}, _error("Only GET sub-requests can be batched"), True
+    url = urlsplit(item.path)
+    if url.scheme or url.netloc or not url.path.startswith(API_PREFIX):
+        return 400, {}, _error(f"Sub-request paths must start with {API_PREFIX}"), True
+    if url.path.rstrip("/") == BATCH_PATH:
+        return 400, {}, _error("Batches cannot be nested"), True
+    async with semaphore:
+        return await _dispatch(request, url.path, url.query)
+
+def _item_json(item: schemas.BatchItem, result: Tuple[int, Dict[str, str], bytes, bool]) -> bytes:
+    status, headers, body, is_json = result
+    if not body:
+        body = b"null"
+    elif not is_json:
+        body = orjson.dumps(body.decode("utf-8", errors="replace"))
+    # Everything but the body, then the body bytes as the route produced them
+    head = orjson.dumps({"id": item.id, "status": status, "headers": headers})
+    return head[:-1] + b',"body":' + body + b"}"
+
+@router.post("/batch", response_model=schemas.BatchResponse)
+async def batch(batch_request: schemas.BatchRequest, request: Request, current_user: models.User = Depends(get_current_user_async)):
+    """Run up to MAX_BATCH_SIZE read-only sub-requests concurrently; results keep the request order."""
+    if not batch_request.requests:
+        raise HTTPException(status_code=400, detail="A batch needs at least one request")
+    if len(batch_request.requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {MAX_BATCH_SIZE} requests")
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    results = await asyncio.gather(*(_run_item(request, item, semaphore) for item in batch_request.requests))
+    body = b'{"responses":[' + b",".join(_item_json(item, result) for item, result in zip(batch_request.requests, results)) + b"]}"
+    return Response(content=body, media_type="application/json")
@@ -1,36 +1,76 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import List, Optional
 import uuid
 
 from ..models import models, schemas
-from ..database import get_db
+from ..database import get_async_db
 from ..core.decomposition import decompose_goal_ml_enhanced # Import the new service
-from ..core.auth import get_current_user
+from ..core.auth import get_current_user_async
+from ..core.authorization import get_owned_goal_async
+from ..core.outbox import record_change
+from ..core.http_cache import Conditional, goals_conditional, goals_scope, touch
+from ..core.pagination import PageParams, keyset_page_async, next_cursor_headers
 
 router = APIRouter()
 
+# Sub-goals and their tasks come from one IN query per level, whatever the number of goals
+_TREE_OPTIONS = selectinload(models.Goal.sub_goals).selectinload(models.SubGoal.tasks)
+
+def _fields(value: Optional[str], schema) -> Optional[set]:
+    """Parse a comma-separated field list of a schema; None keeps every field."""
+    if value is None:
+        return None
+    fields = {field.strip() for field in value.split(",") if field.strip()}
+    unknown = fields - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+def _tree_projection(fields: Optional[str], sub_goal_fields: Optional[str], task_fields: Optional[str]) -> Optional[dict]:
+    """The `include` argument of model_dump for the requested fields at each level."""
+    goal = _fields(fields, schemas.Goal)
+    sub_goal = _fields(sub_goal_fields, schemas.SubGoal)
+    task = _fields(task_fields, schemas.Task)
+    if goal is None and sub_goal is None and task is None:
+        return None
+    sub_goal_include = {name: True for name in (sub_goal or schemas.SubGoal.model_fields)}
+    sub_goal_include["tasks"] = {"__all__": set(task or schemas.Task.model_fields)}
+    include = {name: True for name in (goal or schemas.Goal.model_fields)}
+    include["sub_goals"] = {"__all__": sub_goal_include}
+    return include
+
+def _dump_tree(goal: models.Goal, include: Optional[dict]) -> dict:
+    return schemas.GoalTree.model_validate(goal).model_dump(mode="json", include=include)
+
 # Create a new goal
 @router.post("/goals/", response_model=schemas.Goal)
-def create_goal(goal: schemas.GoalCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def create_goal(goal: schemas.GoalCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     # Check if the user has reached their goal limit
-    if current_user.tier == "free" and len(current_user.goals) >= current_user.goal_limit:
-        raise HTTPException(status_code=403, detail="Goal limit reached for free tier. Upgrade to create more goals.")
+    if current_user.tier == "free":
+        goal_count = await db.scalar(select(func.count(models.Goal.id)).where(models.Goal.owner_id == current_user.id))
+        if goal_count >= current_user.goal_limit:
+                raise HTTPException(status_code=403, detail="Goal limit reached for free tier. Upgrade to create more goals.")
 
     goal_data = goal.dict()
     goal_data["owner_id"] = current_user.id
     db_goal = models.Goal(**goal_data, id=str(uuid.uuid4()))
     db.add(db_goal)
-    db.commit()
-    db.refresh(db_goal)
+    await db.flush()
+    record_change(db, "goal.created", schemas.Goal.model_validate(db_goal).model_dump(mode="json"), goal_id=db_goal.id, team_id=db_goal.team_id, user_id=current_user.id)
+    touch(db, goals_scope(current_user.id))
+    await db.commit()
     return db_goal
 
 # Decompose a goal and create sub-goals
 @router.post("/goals/{goal_id}/decompose", response_model=List[schemas.SubGoal])
-def decompose_goal_endpoint(goal_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def decompose_goal_endpoint(goal_id: str, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     """Decompose a goal into sub-goals using AI/rule-based logic."""
     # Check if the goal exists and belongs to the user
-    goal = db.query(models.Goal).filter(models.Goal.id == goal_id, models.Goal.owner_id == current_user.id).first()
+    goal = (await db.scalars(select(models.Goal).where(models.Goal.id == goal_id, models.Goal.owner_id == current_user.id))).first()
     if not goal:
         raise HTTPException(status_code=404, detail="Goal not found")
 
@@ -49,41 +89,102 @@ def decompose_goal_endpoint(goal_id: str, db: Session = Depends(get_db), current
         db.add(sub_goal)
         sub_goals.append(sub_goal)
     
-    db.commit()
+    await db.flush()
+    record_change(
+        db,
+        "goal.decomposed",
+        {"id": goal_id, "sub_goals": [schemas.SubGoal.model_validate(sub_goal).model_dump(mode="json") for sub_goal in sub_goals]},
+        goal_id=goal_id,
+        user_id=current_user.id,
+    )
+    touch(db, goals_scope(current_user.id))
+    await db.commit()
     return sub_goals
 
-# Get all goals
+# Get the current user's goals
 @router.get("/goals/", response_model=List[schemas.Goal])
-def read_goals(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    goals = db.query(models.Goal).offset(skip).limit(limit).all()
-    return goals
+async def read_goals(page: PageParams = Depends(), conditional: Conditional = Depends(goals_conditional), db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    """The current user's goals by target date, one page at a time (cursor in X-Next-Cursor)."""
+    if conditional.hit:
+        return conditional.hit
+    statement = select(models.Goal).where(models.Goal.owner_id == current_user.id)
+    goals, next_cursor = await keyset_page_async(db, statement, models.Goal.target_date, models.Goal.id, page.cursor, page.limit, descending=False)
+    return conditional.respond(goals, List[schemas.Goal], next_cursor_headers(next_cursor))
+
+# Get the current user's goals with their sub-goals and tasks, one page at a time
+@router.get("/goals/tree", response_model=List[schemas.GoalTree])
+async def read_goal_trees(
+    page: PageParams = Depends(),
+    fields: Optional[str] = None,
+    sub_goal_fields: Optional[str] = None,
+    task_fields: Optional[str] = None,
+    conditional: Conditional = Depends(goals_conditional),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
+):
+    """Goals by target date, each with its sub-goals and their tasks, in three queries.
+
+    `fields`, `sub_goal_fields` and `task_fields` restrict each level to the listed
+    fields. The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    include = _tree_projection(fields, sub_goal_fields, task_fields)
+    if conditional.hit:
+        return conditional.hit
+    statement = select(models.Goal).where(models.Goal.owner_id == current_user.id).options(_TREE_OPTIONS)
+    goals, next_cursor = await keyset_page_async(db, statement, models.Goal.target_date, models.Goal.id, page.cursor, page.limit, descending=False)
+    return conditional.respond([_dump_tree(goal, include) for goal in goals], headers=next_cursor_headers(next_cursor))
+
+# Get a goal with its sub-goals and tasks
+@router.get("/goals/{goal_id}/tree", response_model=schemas.GoalTree)
+async def read_goal_tree(
+    goal_id: str,
+    fields: Optional[str] = None,
+    sub_goal_fields: Optional[str] = None,
+    task_fields: Optional[str] = None,
+    conditional: Conditional = Depends(goals_conditional),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
+):
+    """The goal, its sub-goals and their tasks in one response, from three queries."""
+    include = _tree_projection(fields, sub_goal_fields, task_fields)
+    goal = await get_owned_goal_async(db, goal_id, current_user.id, "Not authorized to view this goal")
+    if conditional.hit:
+        return conditional.hit
+    # The goal is loaded; its sub-goals and their tasks take one IN query per level
+    sub_goals = (await db.scalars(select(models.SubGoal).where(models.SubGoal.goal_id == goal_id).options(selectinload(models.SubGoal.tasks)))).all()
+    set_committed_value(goal, "sub_goals", sub_goals)
+    return conditional.respond(_dump_tree(goal, include))
 
 # Get a specific goal by ID
 @router.get("/goals/{goal_id}", response_model=schemas.Goal)
-def read_goal(goal_id: str, db: Session = Depends(get_db)):
-    db_goal = db.query(models.Goal).filter(models.Goal.id == goal_id).first()
-    if db_goal is None:
-        raise HTTPException(status_code=404, detail="Goal not found")
-    return db_goal
+async def read_goal(goal_id: str, conditional: Conditional = Depends(goals_conditional), db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    goal = await get_owned_goal_async(db, goal_id, current_user.id, "Not authorized to view this goal")
+    if conditional.hit:
+        return conditional.hit
+    return conditional.respond(goal, schemas.Goal)
 
 # Update a goal
 @router.put("/goals/{goal_id}", response_model=schemas.Goal)
-def update_goal(goal_id: str, goal: schemas.GoalCreate, db: Session = Depends(get_db)):
-    db_goal = db.query(models.Goal).filter(models.Goal.id == goal_id).first()
-    if db_goal is None:
-        raise HTTPException(status_code=404, detail="Goal not found")
+async def update_goal(goal_id: str, goal: schemas.GoalCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    db_goal = await get_owned_goal_async(db, goal_id, current_user.id, "Not authorized to update this goal")
     for key, value in goal.dict().items():
         setattr(db_goal, key, value)
-    db.commit()
-    db.refresh(db_goal)
+    await db.flush()
+    record_change(db, "goal.updated", schemas.Goal.model_validate(db_goal).model_dump(mode="json"), goal_id=goal_id, team_id=db_goal.team_id, user_id=db_goal.owner_id)
+    touch(db, goals_scope(db_goal.owner_id))
+    await db.commit()
     return db_goal
 
 # Delete a goal
 @router.delete("/goals/{goal_id}")
-def delete_goal(goal_id: str, db: Session = Depends(get_db)):
-    db_goal = db.query(models.Goal).filter(models.Goal.id == goal_id).first()
-    if db_goal is None:
-        raise HTTPException(status_code=404, detail="Goal not found")
-    db.delete(db_goal)
-    db.commit()
+async def delete_goal(goal_id: str, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    db_goal = await get_owned_goal_async(db, goal_id, current_user.id, "Not authorized to delete this goal")
+    record_change(db, "goal.deleted", {"id": goal_id}, goal_id=goal_id, team_id=db_goal.team_id, user_id=db_goal.owner_id)
+    touch(db, goals_scope(db_goal.owner_id))
+    # Sub-goals and tasks go with the goal; left behind they would have no owner
+    sub_goal_ids = select(models.SubGoal.id).where(models.SubGoal.goal_id == goal_id)
+    await db.execute(delete(models.Task).where(models.Task.sub_goal_id.in_(sub_goal_ids)))
+    await db.execute(delete(models.SubGoal).where(models.SubGoal.goal_id == goal_id))
+    await db.delete(db_goal)
+    await db.commit()
     return {"message": "Goal deleted successfully"}
\ No newline at end of file
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import List
 import uuid
@@ -7,6 +7,7 @@ import datetime
 from ..models import models, schemas
 from ..database import get_db
 from ..core.auth import get_current_user
+from ..core.pagination import PageParams, keyset_page, set_next_cursor
 
 router = APIRouter()
 
@@ -116,8 +117,8 @@ def create_learning_course(platform_id: str, course: schemas.LearningCourseCreat
     return db_course
 
 @router.get("/learning-platforms/{platform_id}/courses/", response_model=List[schemas.LearningCourse])
-def get_learning_courses(platform_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    """Get all courses for a learning platform."""
+def get_learning_courses(platform_id: str, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Get a learning platform's courses, latest enrollment first, one page at a time (cursor in X-Next-Cursor)."""
     # Verify platform ownership
     platform = db.query(models.LearningPlatform).filter(
         models.LearningPlatform.id == platform_id,
@@ -126,9 +127,9 @@ def get_learning_courses(platform_id: str, db: Session = Depends(get_db), curren
     if not platform:
         raise HTTPException(status_code=404, detail="Learning platform not found")
     
-    courses = db.query(models.LearningCourse).filter(
-        models.LearningCourse.platform_id == platform_id
-    ).all()
+    query = db.query(models.LearningCourse).filter(models.LearningCourse.platform_id == platform_id)
+    courses, next_cursor = keyset_page(query, models.LearningCourse.enrollment_date, models.LearningCourse.id, page.cursor, page.limit)
+    set_next_cursor(response, next_cursor)
     return courses
 
 @router.get("/learning-courses/{course_id}", response_model=schemas.LearningCourse)
@@ -1,54 +1,94 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import datetime
+import hashlib
+import json
 import uuid
 
 from ..models import models, schemas
-from ..database import get_db
-from ..core.auth import get_current_user
+from ..database import get_async_db
+from ..core.auth import get_current_user_async
+from ..core.pagination import PageParams, keyset_page_async, next_cursor_headers
+from ..core.serialization import ORJSONResponse, trusted
 from ..core.websocket_manager import manager
-from ..ml.reminder_optimizer import get_reminder_frequency
+from ..core.authorization import authorize_owner
+from ..ml.reminder_optimizer import get_owned_task_with_reminder_interval_async
 
 router = APIRouter()
 
 @router.post("/notifications/", response_model=schemas.Notification)
-def create_notification(notification: schemas.NotificationCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def create_notification(notification: schemas.NotificationCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     if notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to create notification for this user")
     
     # If a task is provided, adjust the notification_time relative to task start
     if notification.task_id:
-        reminder_frequency = get_reminder_frequency(notification.task_id)
-        task = db.query(models.Task).filter(models.Task.id == notification.task_id).first()
-        if not task:
-            raise HTTPException(status_code=404, detail="Task not found")
-        notification.notification_time = task.planned_start - reminder_frequency
+        owned_task, reminder_interval = await get_owned_task_with_reminder_interval_async(db, notification.task_id, current_user.id)
+        task = authorize_owner(owned_task, current_user.id, "Task not found", "Not authorized to create notification for this task")
+        notification.notification_time = task.planned_start - reminder_interval
 
     db_notification = models.Notification(**notification.dict(), id=str(uuid.uuid4()))
     db.add(db_notification)
-    db.commit()
-    db.refresh(db_notification)
+    await db.commit()
     return db_notification
 
 @router.get("/notifications/me", response_model=List[schemas.Notification])
-def get_my_notifications(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    notifications = db.query(models.Notification).filter(models.Notification.user_id == current_user.id).all()
-    return notifications
+async def get_my_notifications(
+    page: PageParams = Depends(),
+    is_sent: Optional[bool] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
+):
+    """Get the current user's notifications, newest first, one page at a time.
+
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    statement = select(models.Notification).where(models.Notification.user_id == current_user.id)
+    if is_sent is not None:
+        statement = statement.where(models.Notification.is_sent == is_sent)
+    if since:
+        statement = statement.where(models.Notification.notification_time >= since)
+    if until:
+        statement = statement.where(models.Notification.notification_time < until)
+
+    # This aggregate (served from the user's index range) identifies the feed's
+    # state because of an invariant: notifications are only added
+    # (create_notification) or marked sent (mark_notification_sent), never
+    # edited in place, deleted or marked unsent. A route that did any of those
+    # could leave count, sum(is_sent) and max(notification_time) unchanged and
+    # would have to add something to the fingerprint (e.g. an updated_at column).
+    count, sent_count, latest = (await db.execute(select(
+        func.count(models.Notification.id),
+        func.sum(cast(models.Notification.is_sent, Integer)),
+        func.max(models.Notification.notification_time),
+    ).where(models.Notification.user_id == current_user.id))).one()
+    fingerprint = f"{count}:{sent_count}:{latest}:{page.limit}:{page.cursor}:{is_sent}:{since}:{until}"
+    etag = f'W/"{hashlib.sha1(fingerprint.encode()).hexdigest()}"'
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    notifications, next_cursor = await keyset_page_async(db, statement, models.Notification.notification_time, models.Notification.id, page.cursor, page.limit)
+    return ORJSONResponse(trusted(notifications, schemas.Notification), headers={"ETag": etag, **next_cursor_headers(next_cursor)})
 
 @router.put("/notifications/{notification_id}/mark_sent", response_model=schemas.Notification)
-async def mark_notification_sent(notification_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_notification = db.query(models.Notification).filter(models.Notification.id == notification_id).first()
+async def mark_notification_sent(notification_id: str, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    db_notification = await db.get(models.Notification, notification_id)
     if db_notification is None:
         raise HTTPException(status_code=404, detail="Notification not found")
     if db_notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this notification")
     
     db_notification.is_sent = True
-    db.commit()
-    db.refresh(db_notification)
+    await db.commit()
     
     # Send real-time notification
-    await manager.send_personal_message(f"Notification sent: {db_notification.message}", current_user.id)
+    message = {"type": "notification.sent", "data": {"id": db_notification.id, "task_id": db_notification.task_id, "message": db_notification.message}}
+    await manager.send_personal_message(json.dumps(message), current_user.id)
 
     return db_notification
@@ -1,5 +1,5 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import List
 import uuid
@@ -9,6 +9,9 @@ from dateutil.rrule import rrulestr
 from ..models import models, schemas
 from ..database import get_db
 from ..core.auth import get_current_user
+from ..core.outbox import record_change
+from ..core.pagination import PageParams, keyset_page, set_next_cursor
+from ..core.progress import apply_progress, progress_statements, task_progress
 
 router = APIRouter()
 
@@ -23,8 +26,11 @@ def create_recurring_task(recurring_task: schemas.RecurringTaskCreate, db: Sessi
     return db_recurring_task
 
 @router.get("/recurring_tasks/me", response_model=List[schemas.RecurringTask])
-def get_my_recurring_tasks(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    recurring_tasks = db.query(models.RecurringTask).filter(models.RecurringTask.user_id == current_user.id).all()
+def get_my_recurring_tasks(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """The current user's recurring tasks by start date, one page at a time (cursor in X-Next-Cursor)."""
+    query = db.query(models.RecurringTask).filter(models.RecurringTask.user_id == current_user.id)
+    recurring_tasks, next_cursor = keyset_page(query, models.RecurringTask.start_date, models.RecurringTask.id, page.cursor, page.limit, descending=False)
+    set_next_cursor(response, next_cursor)
     return recurring_tasks
 
 @router.post("/recurring_tasks/{recurring_task_id}/generate_tasks", response_model=List[schemas.Task])
@@ -76,6 +82,11 @@ def generate_tasks_from_recurring(recurring_task_id: str, db: Session = Depends(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid RRULE: {e}")
     
+    # Occurrences without a sub-goal count towards no goal and issue no updates
+    apply_progress(db, progress_statements((None, task_progress(task)) for task in generated_tasks))
+    db.flush()
+    for task in generated_tasks:
+        record_change(db, "task.created", schemas.Task.model_validate(task).model_dump(mode="json"), user_id=current_user.id)
     db.commit()
     for task in generated_tasks:
         db.refresh(task)
@@ -1,13 +1,20 @@
+from collections import defaultdict
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import delete, insert, update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List
 import uuid
 
 from ..models import models, schemas
 from ..database import get_db
 from ..core.scheduling import schedule_tasks # Import the new service
 from ..core.auth import get_current_user # Import get_current_user
+from ..core.authorization import Owned, authorize_owner, get_owned_goal, get_owned_sub_goal, goal_ownership, load_owned, sub_goal_ownership, tasks_with_owner
+from ..core.bulk import BulkOutcome, check_bulk_size, reject_repeated_ids
 from ..core.calendar_sync import sync_calendar_events # Import calendar sync
+from ..core.http_cache import Conditional, goals_conditional, goals_scope, touch
+from ..core.outbox import record_change
+from ..core.progress import apply_progress, goal_progress_statements, progress_statements, task_progress
 
 router = APIRouter()
 
@@ -22,16 +29,96 @@ def create_sub_goal(sub_goal: schemas.SubGoalCreate, db: Session = Depends(get_d
 
     db_sub_goal = models.SubGoal(**sub_goal.dict(), id=str(uuid.uuid4()))
     db.add(db_sub_goal)
+    db.flush()
+    record_change(db, "sub_goal.created", schemas.SubGoal.model_validate(db_sub_goal).model_dump(mode="json"), goal_id=db_sub_goal.goal_id, user_id=current_user.id)
+    touch(db, goals_scope(current_user.id))
     db.commit()
     db.refresh(db_sub_goal)
     return db_sub_goal
 
+def _record_bulk_sub_goal_changes(db: Session, event_type: str, sub_goals_by_goal: Dict[str, List[dict]], user_id: str):
+    """One outbox event per goal instead of one per sub-goal."""
+    for goal_id, sub_goals in sub_goals_by_goal.items():
+        record_change(db, event_type, {"id": goal_id, "sub_goals": sub_goals}, goal_id=goal_id, user_id=user_id)
+
+# Create many sub-goals at once, e.g. when importing a plan
+@router.post("/sub_goals/bulk", response_model=schemas.BulkResult)
+def create_sub_goals_bulk(sub_goals: List[schemas.SubGoalCreate], db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Create sub-goals with one ownership query, one INSERT executemany and one commit; failures are reported per item."""
+    check_bulk_size(sub_goals)
+    outcome = BulkOutcome(len(sub_goals))
+    owned_goals = load_owned(db, goal_ownership({sub_goal.goal_id for sub_goal in sub_goals}))
+
+    rows = []
+    created = defaultdict(list)
+    for index, sub_goal in enumerate(sub_goals):
+        goal = outcome.check(index, lambda: authorize_owner(owned_goals.get(sub_goal.goal_id), current_user.id, "Parent goal not found", "Not authorized to create sub-goals for this goal"))
+        if goal is None:
+            continue
+        row = {**sub_goal.model_dump(), "id": str(uuid.uuid4()), "total_tasks": 0, "done_tasks": 0}
+        rows.append(row)
+        created[sub_goal.goal_id].append({**sub_goal.model_dump(mode="json"), "id": row["id"], "total_tasks": 0, "done_tasks": 0})
+        outcome.succeed(index, row["id"])
+
+    if rows:
+        db.execute(insert(models.SubGoal), rows)
+        _record_bulk_sub_goal_changes(db, "goal.sub_goals_created", created, current_user.id)
+        touch(db, goals_scope(current_user.id))
+        db.commit()
+    return outcome.result()
+
+# Update many sub-goals at once
+@router.put("/sub_goals/bulk", response_model=schemas.BulkResult)
+def update_sub_goals_bulk(sub_goals: List[schemas.SubGoalBulkUpdate], db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Replace sub-goals by id like PUT /sub_goals/{sub_goal_id}, with one UPDATE executemany and one commit; failures are reported per item."""
+    check_bulk_size(sub_goals)
+    outcome = BulkOutcome(len(sub_goals))
+    accepted = reject_repeated_ids(outcome, (sub_goal.id for sub_goal in sub_goals))
+    owned_sub_goals = load_owned(db, sub_goal_ownership(accepted.values()))
+    # Goals the sub-goals are in come with them; only look up the ones they move to
+    owned_goals = {
+        owned.entity.goal_id: Owned(owned.entity.parent_goal, owned.owner_id)
+        for owned in owned_sub_goals.values() if owned.entity.parent_goal is not None
+    }
+    targets = {sub_goals[index].goal_id for index in accepted} - set(owned_goals)
+    if targets:
+        owned_goals.update(load_owned(db, goal_ownership(targets)))
+
+    rows = []
+    # Net (total, done) task counts moving onto each goal
+    shifts = defaultdict(lambda: [0, 0])
+    updated = defaultdict(list)
+    for index in accepted:
+        sub_goal = sub_goals[index]
+        db_sub_goal = outcome.check(index, lambda: authorize_owner(owned_sub_goals.get(sub_goal.id), current_user.id, "Sub-goal not found", "Not authorized to update this sub-goal"))
+        if db_sub_goal is None:
+            continue
+        moved = sub_goal.goal_id != db_sub_goal.goal_id
+        if moved and outcome.check(index, lambda: authorize_owner(owned_goals.get(sub_goal.goal_id), current_user.id, "Goal not found", "Not authorized to move sub-goal to this goal")) is None:
+            continue
+        rows.append(sub_goal.model_dump())
+        data = {**sub_goal.model_dump(mode="json"), "total_tasks": db_sub_goal.total_tasks, "done_tasks": db_sub_goal.done_tasks}
+        updated[sub_goal.goal_id].append(data)
+        if moved:
+            for goal_id, sign in ((db_sub_goal.goal_id, -1), (sub_goal.goal_id, 1)):
+                shifts[goal_id][0] += sign * db_sub_goal.total_tasks
+                shifts[goal_id][1] += sign * db_sub_goal.done_tasks
+            updated[db_sub_goal.goal_id].append(data)
+        outcome.succeed(index, sub_goal.id)
+
+    if rows:
+        db.execute(update(models.SubGoal), rows)
+        for goal_id, (total, done) in shifts.items():
+            apply_progress(db, goal_progress_statements(goal_id, total, done))
+        _record_bulk_sub_goal_changes(db, "goal.sub_goals_updated", updated, current_user.id)
+        touch(db, goals_scope(current_user.id))
+        db.commit()
+    return outcome.result()
+
 # Schedule all tasks for a sub-goal
 @router.post("/sub_goals/{sub_goal_id}/schedule/", response_model=List[schemas.Task])
 def schedule_sub_goal_tasks(sub_goal_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_sub_goal = db.query(models.SubGoal).filter(models.SubGoal.id == sub_goal_id).first()
-    if db_sub_goal is None:
-        raise HTTPException(status_code=404, detail="Sub-goal not found")
+    db_sub_goal = get_owned_sub_goal(db, sub_goal_id, current_user.id, "Not authorized to schedule tasks for this sub-goal")
 
     # Fetch user's calendar integrations and sync events (no duplication)
     calendar_integrations = db.query(models.CalendarIntegration).filter(models.CalendarIntegration.user_id == current_user.id).all()
@@ -40,8 +127,9 @@ def schedule_sub_goal_tasks(sub_goal_id: str, db: Session = Depends(get_db), cur
         events = sync_calendar_events(current_user.id, integration.provider, integration.access_token)
         all_calendar_events.extend(events)
 
-    # Load latest tasks from the database to avoid stale relationship cache
-    tasks_to_schedule = db.query(models.Task).filter(models.Task.sub_goal_id == sub_goal_id).all()
+    # Load latest tasks from the database to avoid stale relationship cache; the
+    # scheduler reads each task's sub-goal and goal, which this join populates
+    tasks_to_schedule = [owned.entity for owned in load_owned(db, tasks_with_owner().where(models.Task.sub_goal_id == sub_goal_id)).values()]
 
     # If there are no tasks yet, create a placeholder task so scheduling returns something meaningful
     if not tasks_to_schedule:
@@ -56,6 +144,8 @@ def schedule_sub_goal_tasks(sub_goal_id: str, db: Session = Depends(get_db), cur
             dependencies=None
         )
         db.add(placeholder)
+        apply_progress(db, progress_statements([(None, task_progress(placeholder))]))
+        touch(db, goals_scope(current_user.id))
         db.commit()
         db.refresh(placeholder)
         tasks_to_schedule = [placeholder]
@@ -74,51 +164,78 @@ def schedule_sub_goal_tasks(sub_goal_id: str, db: Session = Depends(get_db), cur
 
     for task in scheduled_tasks:
         db.add(task)
-    
+    db.flush()
+
+    # One event for the whole schedule instead of one per task
+    record_change(
+        db,
+        "sub_goal.scheduled",
+        {"id": sub_goal_id, "tasks": [schemas.Task.model_validate(task).model_dump(mode="json") for task in scheduled_tasks]},
+        goal_id=db_sub_goal.goal_id,
+        sub_goal_id=sub_goal_id,
+        user_id=current_user.id,
+    )
+    touch(db, goals_scope(current_user.id))
     db.commit()
     for task in scheduled_tasks:
         db.refresh(task)
-
     return scheduled_tasks
 
 # Get all sub-goals for a specific goal
 @router.get("/goals/{goal_id}/sub_goals/", response_model=List[schemas.SubGoal])
-def get_sub_goals(goal_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def get_sub_goals(goal_id: str, conditional: Conditional = Depends(goals_conditional), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     """Get all sub-goals for a specific goal."""
     # Check if the goal exists and belongs to the user
     goal = db.query(models.Goal).filter(models.Goal.id == goal_id, models.Goal.owner_id == current_user.id).first()
     if not goal:
         raise HTTPException(status_code=404, detail="Goal not found")
+    if conditional.hit:
+        return conditional.hit
 
     sub_goals = db.query(models.SubGoal).filter(models.SubGoal.goal_id == goal_id).all()
-    return sub_goals
+    return conditional.respond(sub_goals, List[schemas.SubGoal])
 
 # Get a specific sub-goal by ID
 @router.get("/sub_goals/{sub_goal_id}", response_model=schemas.SubGoal)
-def read_sub_goal(sub_goal_id: str, db: Session = Depends(get_db)):
-    db_sub_goal = db.query(models.SubGoal).filter(models.SubGoal.id == sub_goal_id).first()
-    if db_sub_goal is None:
-        raise HTTPException(status_code=404, detail="Sub-goal not found")
-    return db_sub_goal
+def read_sub_goal(sub_goal_id: str, conditional: Conditional = Depends(goals_conditional), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    sub_goal = get_owned_sub_goal(db, sub_goal_id, current_user.id, "Not authorized to view this sub-goal")
+    if conditional.hit:
+        return conditional.hit
+    return conditional.respond(sub_goal, schemas.SubGoal)
 
 # Update a sub-goal
 @router.put("/sub_goals/{sub_goal_id}", response_model=schemas.SubGoal)
-def update_sub_goal(sub_goal_id: str, sub_goal: schemas.SubGoalCreate, db: Session = Depends(get_db)):
-    db_sub_goal = db.query(models.SubGoal).filter(models.SubGoal.id == sub_goal_id).first()
-    if db_sub_goal is None:
-        raise HTTPException(status_code=404, detail="Sub-goal not found")
+def update_sub_goal(sub_goal_id: str, sub_goal: schemas.SubGoalCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    db_sub_goal = get_owned_sub_goal(db, sub_goal_id, current_user.id, "Not authorized to update this sub-goal")
+    # Moving to another goal requires owning that goal too
+    if sub_goal.goal_id != db_sub_goal.goal_id:
+        get_owned_goal(db, sub_goal.goal_id, current_user.id, "Not authorized to move sub-goal to this goal")
+    previous_goal_id = db_sub_goal.goal_id
     for key, value in sub_goal.dict().items():
         setattr(db_sub_goal, key, value)
+    if previous_goal_id != db_sub_goal.goal_id:
+        # The sub-goal's tasks now count towards the new goal
+        apply_progress(db, goal_progress_statements(previous_goal_id, -db_sub_goal.total_tasks, -db_sub_goal.done_tasks))
+        apply_progress(db, goal_progress_statements(db_sub_goal.goal_id, db_sub_goal.total_tasks, db_sub_goal.done_tasks))
+    db.flush()
+    data = schemas.SubGoal.model_validate(db_sub_goal).model_dump(mode="json")
+    record_change(db, "sub_goal.updated", data, goal_id=db_sub_goal.goal_id, sub_goal_id=sub_goal_id, user_id=current_user.id)
+    if previous_goal_id != db_sub_goal.goal_id:
+        record_change(db, "sub_goal.updated", data, goal_id=previous_goal_id, user_id=current_user.id)
+    touch(db, goals_scope(current_user.id))
     db.commit()
     db.refresh(db_sub_goal)
     return db_sub_goal
 
 # Delete a sub-goal
 @router.delete("/sub_goals/{sub_goal_id}")
-def delete_sub_goal(sub_goal_id: str, db: Session = Depends(get_db)):
-    db_sub_goal = db.query(models.SubGoal).filter(models.SubGoal.id == sub_goal_id).first()
-    if db_sub_goal is None:
-        raise HTTPException(status_code=404, detail="Sub-goal not found")
+def delete_sub_goal(sub_goal_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    db_sub_goal = get_owned_sub_goal(db, sub_goal_id, current_user.id, "Not authorized to delete this sub-goal")
+    record_change(db, "sub_goal.deleted", {"id": sub_goal_id}, goal_id=db_sub_goal.goal_id, sub_goal_id=sub_goal_id, user_id=current_user.id)
+    apply_progress(db, goal_progress_statements(db_sub_goal.goal_id, -db_sub_goal.total_tasks, -db_sub_goal.done_tasks))
+    touch(db, goals_scope(current_user.id))
+    # Otherwise the tasks would be detached and become tasks without an owner
+    db.execute(delete(models.Task).where(models.Task.sub_goal_id == sub_goal_id))
     db.delete(db_sub_goal)
     db.commit()
     return {"message": "Sub-goal deleted successfully"}
\ No newline at end of file
@@ -1,121 +1,221 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from collections import defaultdict
+from fastapi import APIRouter, Depends
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
 import uuid
 import datetime
 
 from ..models import models, schemas
-from ..database import get_db
-from ..core.auth import get_current_user
+from ..database import get_async_db
+from ..core.auth import get_current_user_async
+from ..core.authorization import Owned, authorize_owner, get_owned_sub_goal_async, get_owned_task_async, load_owned_async, sub_goal_ownership, task_ownership
+from ..core.bulk import BulkOutcome, check_bulk_size, reject_repeated_ids
+from ..core.http_cache import Conditional, goals_conditional, goals_scope, touch
+from ..core.outbox import record_change
+from ..core.progress import DONE, apply_progress_async, progress_statements, task_progress
 
 router = APIRouter()
 
+async def _record_task_change(db: AsyncSession, event_type: str, db_task: models.Task, user_id: str):
+    """Record a task change in the outbox; subscribers of its sub-goal and goal hear of it on commit."""
+    await db.flush()
+    sub_goal = await db.get(models.SubGoal, db_task.sub_goal_id) if db_task.sub_goal_id else None
+    record_change(
+        db,
+        event_type,
+        schemas.Task.model_validate(db_task).model_dump(mode="json"),
+        goal_id=sub_goal.goal_id if sub_goal else None,
+        sub_goal_id=sub_goal.id if sub_goal else None,
+        user_id=user_id,
+    )
+
 # Create a new task
 @router.post("/tasks/", response_model=schemas.Task)
-def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def create_task(task: schemas.TaskCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     # Validate sub-goal if provided
     if task.sub_goal_id:
-        sub_goal = db.query(models.SubGoal).filter(models.SubGoal.id == task.sub_goal_id).first()
-        if sub_goal is None:
-            raise HTTPException(status_code=404, detail="Sub-goal not found")
-        # Ensure ownership
-        if sub_goal.parent_goal.owner_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Not authorized to create task for this sub-goal")
+        await get_owned_sub_goal_async(db, task.sub_goal_id, current_user.id, "Not authorized to create task for this sub-goal")
 
     db_task = models.Task(**task.dict(), id=str(uuid.uuid4()))
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await apply_progress_async(db, progress_statements([(None, task_progress(db_task))]))
+    await _record_task_change(db, "task.created", db_task, current_user.id)
+    touch(db, goals_scope(current_user.id))
+    await db.commit()
     return db_task
 
+def _completion_notification(task_id: str, user_id: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "task_id": task_id,
+        "message": f"Task completed: {task_id}",
+        "notification_time": datetime.datetime.now(),
+        "method": "push",
+        "is_sent": False,
+    }
+
+def _record_bulk_task_changes(db: AsyncSession, event_type: str, tasks_by_sub_goal: Dict[str, List[dict]], goal_ids: Dict[str, str], user_id: str, task_event_type: str, unparented: List[dict]):
+    """One outbox event per sub-goal instead of one per task; tasks in no sub-goal get the single-task event."""
+    for sub_goal_id, tasks in tasks_by_sub_goal.items():
+        record_change(db, event_type, {"id": sub_goal_id, "tasks": tasks}, goal_id=goal_ids.get(sub_goal_id), sub_goal_id=sub_goal_id, user_id=user_id)
+    for task in unparented:
+        record_change(db, task_event_type, task, user_id=user_id)
+
+# Create many tasks at once, e.g. when importing a plan
+@router.post("/tasks/bulk", response_model=schemas.BulkResult)
+async def create_tasks_bulk(tasks: List[schemas.TaskCreate], db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    """Create tasks with one ownership query, one INSERT executemany and one commit; failures are reported per item."""
+    check_bulk_size(tasks)
+    outcome = BulkOutcome(len(tasks))
+    # Like POST /tasks/, a task without a sub-goal needs no ownership check
+    owned_sub_goals = await load_owned_async(db, sub_goal_ownership({task.sub_goal_id for task in tasks if task.sub_goal_id}))
+
+    rows = []
+    changes = []
+    created = defaultdict(list)
+    unparented = []
+    for index, task in enumerate(tasks):
+        if task.sub_goal_id and outcome.check(index, lambda: authorize_owner(owned_sub_goals.get(task.sub_goal_id), current_user.id, "Sub-goal not found", "Not authorized to create task for this sub-goal")) is None:
+            continue
+        row = {**task.model_dump(), "id": str(uuid.uuid4())}
+        rows.append(row)
+        changes.append((None, task_progress(task)))
+        data = {**task.model_dump(mode="json"), "id": row["id"]}
+        if task.sub_goal_id:
+            created[task.sub_goal_id].append(data)
+        else:
+            unparented.append(data)
+        outcome.succeed(index, row["id"])
+
+    if rows:
+        await db.execute(insert(models.Task), rows)
+        await apply_progress_async(db, progress_statements(changes))
+        goal_ids = {sub_goal_id: owned.entity.goal_id for sub_goal_id, owned in owned_sub_goals.items()}
+        _record_bulk_task_changes(db, "sub_goal.tasks_created", created, goal_ids, current_user.id, "task.created", unparented)
+        touch(db, goals_scope(current_user.id))
+        await db.commit()
+    return outcome.result()
+
+# Update many tasks at once
+@router.put("/tasks/bulk", response_model=schemas.BulkResult)
+async def update_tasks_bulk(tasks: List[schemas.TaskBulkUpdate], db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    """Replace tasks by id like PUT /tasks/{task_id}, with one UPDATE executemany and one commit; failures are reported per item."""
+    check_bulk_size(tasks)
+    outcome = BulkOutcome(len(tasks))
+    accepted = reject_repeated_ids(outcome, (task.id for task in tasks))
+    owned_tasks = await load_owned_async(db, task_ownership(accepted.values()))
+    # Sub-goals the tasks are in come with them; only look up the ones they move to
+    owned_sub_goals = {
+        owned.entity.sub_goal_id: Owned(owned.entity.parent_sub_goal, owned.owner_id)
+        for owned in owned_tasks.values() if owned.entity.parent_sub_goal is not None
+    }
+    targets = {tasks[index].sub_goal_id for index in accepted if tasks[index].sub_goal_id} - set(owned_sub_goals)
+    if targets:
+        owned_sub_goals.update(await load_owned_async(db, sub_goal_ownership(targets)))
+
+    rows = []
+    changes = []
+    notifications = []
+    updated = defaultdict(list)
+    unparented = []
+    for index in accepted:
+        task = tasks[index]
+        db_task = outcome.check(index, lambda: authorize_owner(owned_tasks.get(task.id), current_user.id, "Task not found", "Not authorized to update this task"))
+        if db_task is None:
+            continue
+        if task.sub_goal_id and task.sub_goal_id != db_task.sub_goal_id and outcome.check(index, lambda: authorize_owner(owned_sub_goals.get(task.sub_goal_id), current_user.id, "Sub-goal not found", "Not authorized to move task to this sub-goal")) is None:
+            continue
+        rows.append(task.model_dump())
+        changes.append((task_progress(db_task), task_progress(task)))
+        if db_task.status != DONE and task.status == DONE:
+            notifications.append(_completion_notification(task.id, current_user.id))
+        data = task.model_dump(mode="json")
+        # Subscribers of the sub-goal a task leaves hear of the move too
+        sub_goal_ids = {task.sub_goal_id, db_task.sub_goal_id} - {None, ""}
+        for sub_goal_id in sub_goal_ids:
+            updated[sub_goal_id].append(data)
+        if not sub_goal_ids:
+            unparented.append(data)
+        outcome.succeed(index, task.id)
+
+    if rows:
+        await db.execute(update(models.Task), rows)
+        if notifications:
+            await db.execute(insert(models.Notification), notifications)
+        await apply_progress_async(db, progress_statements(changes))
+        goal_ids = {sub_goal_id: owned.entity.goal_id for sub_goal_id, owned in owned_sub_goals.items()}
+        _record_bulk_task_changes(db, "sub_goal.tasks_updated", updated, goal_ids, current_user.id, "task.updated", unparented)
+        touch(db, goals_scope(current_user.id))
+        await db.commit()
+    return outcome.result()
+
 # Get all tasks for a sub-goal
 @router.get("/sub_goals/{sub_goal_id}/tasks/", response_model=List[schemas.Task])
-def read_tasks_for_sub_goal(sub_goal_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    sub_goal = db.query(models.SubGoal).filter(models.SubGoal.id == sub_goal_id).first()
-    if sub_goal is None:
-        raise HTTPException(status_code=404, detail="Sub-goal not found")
-    if sub_goal.parent_goal.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to view tasks for this sub-goal")
-    return sub_goal.tasks
+async def read_tasks_for_sub_goal(sub_goal_id: str, conditional: Conditional = Depends(goals_conditional), db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    await get_owned_sub_goal_async(db, sub_goal_id, current_user.id, "Not authorized to view tasks for this sub-goal")
+    if conditional.hit:
+        return conditional.hit
+    tasks = (await db.scalars(select(models.Task).where(models.Task.sub_goal_id == sub_goal_id))).all()
+    return conditional.respond(tasks, List[schemas.Task])
 
 # Get a specific task by ID
 @router.get("/tasks/{task_id}", response_model=schemas.Task)
-def read_task(task_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-    if db_task.parent_sub_goal and db_task.parent_sub_goal.parent_goal.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to view this task")
-    return db_task
+async def read_task(task_id: str, conditional: Conditional = Depends(goals_conditional), db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    db_task = await get_owned_task_async(db, task_id, current_user.id, "Not authorized to view this task")
+    if conditional.hit:
+        return conditional.hit
+    return conditional.respond(db_task, schemas.Task)
 
 # Update an existing task
 @router.put("/tasks/{task_id}", response_model=schemas.Task)
-def update_task(task_id: str, task: schemas.TaskCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-
+async def update_task(task_id: str, task: schemas.TaskCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     # Authorization: user must own the parent goal of the sub-goal (if present)
-    if db_task.parent_sub_goal and db_task.parent_sub_goal.parent_goal.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this task")
+    db_task = await get_owned_task_async(db, task_id, current_user.id, "Not authorized to update this task")
 
     # If sub_goal_id is changing, validate new sub-goal and ownership
     if task.sub_goal_id and task.sub_goal_id != db_task.sub_goal_id:
-        new_sub_goal = db.query(models.SubGoal).filter(models.SubGoal.id == task.sub_goal_id).first()
-        if new_sub_goal is None:
-            raise HTTPException(status_code=404, detail="Sub-goal not found")
-        if new_sub_goal.parent_goal.owner_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Not authorized to move task to this sub-goal")
+        await get_owned_sub_goal_async(db, task.sub_goal_id, current_user.id, "Not authorized to move task to this sub-goal")
 
     # Track previous status before applying updates
     previous_status = db_task.status
+    previous_progress = task_progress(db_task)
     for key, value in task.dict().items():
         setattr(db_task, key, value)
+    await apply_progress_async(db, progress_statements([(previous_progress, task_progress(db_task))]))
 
-    db.commit()
-    db.refresh(db_task)
-
-    # Generate a notification if the task has been completed
+    # Generate a notification if the task has been completed; it commits together
+    # with the update and its outbox event
     if previous_status != 'done' and db_task.status == 'done':
-        completion_notification = models.Notification(
-            id=str(uuid.uuid4()),
-            user_id=current_user.id,
-            task_id=db_task.id,
-            message=f"Task completed: {db_task.id}",
-            notification_time=datetime.datetime.now(),
-            method="push",
-            is_sent=False,
-        )
-        db.add(completion_notification)
-        db.commit()
+        db.add(models.Notification(**_completion_notification(db_task.id, current_user.id)))
 
+    await _record_task_change(db, "task.updated", db_task, current_user.id)
+    touch(db, goals_scope(current_user.id))
+    await db.commit()
     return db_task
 
 # Delete a task
 @router.delete("/tasks/{task_id}")
-def delete_task(task_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-    if db_task.parent_sub_goal and db_task.parent_sub_goal.parent_goal.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this task")
-    db.delete(db_task)
-    db.commit()
+async def delete_task(task_id: str, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    db_task = await get_owned_task_async(db, task_id, current_user.id, "Not authorized to delete this task")
+    sub_goal = db_task.parent_sub_goal
+    await apply_progress_async(db, progress_statements([(task_progress(db_task), None)]))
+    await db.delete(db_task)
+    record_change(db, "task.deleted", {"id": task_id}, goal_id=sub_goal.goal_id if sub_goal else None, sub_goal_id=sub_goal.id if sub_goal else None, user_id=current_user.id)
+    touch(db, goals_scope(current_user.id))
+    await db.commit()
     return {"message": "Task deleted successfully"}
 
 # Specialized reschedule endpoint
 @router.put("/tasks/{task_id}/reschedule", response_model=schemas.Task)
-def reschedule_task(task_id: str, reschedule: schemas.RescheduleTask, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    if not db_task:
-        raise HTTPException(status_code=404, detail="Task not found")
-
+async def reschedule_task(task_id: str, reschedule: schemas.RescheduleTask, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     # Check if the user is authorized to reschedule the task
-    if db_task.parent_sub_goal and db_task.parent_sub_goal.parent_goal.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to reschedule this task")
+    db_task = await get_owned_task_async(db, task_id, current_user.id, "Not authorized to reschedule this task")
 
     db_task.planned_start = reschedule.planned_start
     db_task.planned_end = reschedule.planned_end
-    db.commit()
-    db.refresh(db_task)
-    return db_task
\ No newline at end of file
+    await _record_task_change(db, "task.updated", db_task, current_user.id)
+    touch(db, goals_scope(current_user.id))
+    await db.commit()
+    return db_task
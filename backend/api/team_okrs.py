@@ -7,6 +7,9 @@ import datetime
 from ..models import models, schemas
 from ..database import get_db
 from ..core.auth import get_current_user
+from ..core.http_cache import Conditional, team_conditional, team_scope, touch
+from ..core.outbox import record_change
+from ..core.pagination import PageParams, keyset_page, next_cursor_headers
 
 router = APIRouter()
 
@@ -32,43 +35,50 @@ def create_team_okr(team_id: str, okr: schemas.TeamOKRCreate, db: Session = Depe
     # Create the OKR
     db_okr = models.TeamOKR(**okr.dict(exclude={'key_results'}), id=str(uuid.uuid4()))
     db.add(db_okr)
-    db.commit()
-    db.refresh(db_okr)
     
     # Create key results if provided
     if okr.key_results:
         for kr_data in okr.key_results:
             db_kr = models.TeamOKRKeyResult(**kr_data.dict(), id=str(uuid.uuid4()), okr_id=db_okr.id)
             db.add(db_kr)
-        db.commit()
-        db.refresh(db_okr)
+    db.flush()
+    db.refresh(db_okr)
     
+    record_change(db, "okr.created", schemas.TeamOKR.model_validate(db_okr).model_dump(mode="json"), team_id=team_id, user_id=current_user.id)
+    touch(db, team_scope(team_id))
+    db.commit()
+    db.refresh(db_okr)
     return db_okr
 
 @router.get("/teams/{team_id}/okrs/", response_model=List[schemas.TeamOKR])
-def get_team_okrs(team_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    """Get all OKRs for a team."""
-    # Check if user is a member of the team
+def get_team_okrs(team_id: str, page: PageParams = Depends(), conditional: Conditional = Depends(team_conditional), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Get a team's OKRs, newest first, one page at a time (cursor in X-Next-Cursor)."""
+    # Check if user is a member of the team; membership is read afresh, not from the stamp
     team_membership = db.query(models.TeamMember).filter(
         models.TeamMember.team_id == team_id, 
         models.TeamMember.user_id == current_user.id
     ).first()
     if not team_membership:
         raise HTTPException(status_code=403, detail="Not a member of this team")
+    if conditional.hit:
+        return conditional.hit
     
-    okrs = db.query(models.TeamOKR).filter(models.TeamOKR.team_id == team_id).all()
-    return okrs
+    query = db.query(models.TeamOKR).filter(models.TeamOKR.team_id == team_id)
+    okrs, next_cursor = keyset_page(query, models.TeamOKR.created_at, models.TeamOKR.id, page.cursor, page.limit)
+    return conditional.respond(okrs, List[schemas.TeamOKR], next_cursor_headers(next_cursor))
 
 @router.get("/teams/{team_id}/okrs/{okr_id}", response_model=schemas.TeamOKR)
-def get_team_okr(team_id: str, okr_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def get_team_okr(team_id: str, okr_id: str, conditional: Conditional = Depends(team_conditional), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     """Get a specific OKR by ID."""
-    # Check if user is a member of the team
+    # Check if user is a member of the team; membership is read afresh, not from the stamp
     team_membership = db.query(models.TeamMember).filter(
         models.TeamMember.team_id == team_id, 
         models.TeamMember.user_id == current_user.id
     ).first()
     if not team_membership:
         raise HTTPException(status_code=403, detail="Not a member of this team")
+    if conditional.hit:
+        return conditional.hit
     
     okr = db.query(models.TeamOKR).filter(
         models.TeamOKR.id == okr_id,
@@ -77,7 +87,7 @@ def get_team_okr(team_id: str, okr_id: str, db: Session = Depends(get_db), curre
     if not okr:
         raise HTTPException(status_code=404, detail="OKR not found")
     
-    return okr
+    return conditional.respond(okr, schemas.TeamOKR)
 
 @router.put("/teams/{team_id}/okrs/{okr_id}", response_model=schemas.TeamOKR)
 def update_team_okr(team_id: str, okr_id: str, okr_update: schemas.TeamOKRCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -107,9 +117,12 @@ def update_team_okr(team_id: str, okr_id: str, okr_update: schemas.TeamOKRCreate
         setattr(db_okr, key, value)
     
     db_okr.updated_at = datetime.datetime.utcnow()
+    db.flush()
+    
+    record_change(db, "okr.updated", schemas.TeamOKR.model_validate(db_okr).model_dump(mode="json"), team_id=team_id, user_id=current_user.id)
+    touch(db, team_scope(team_id))
     db.commit()
     db.refresh(db_okr)
-    
     return db_okr
 
 @router.delete("/teams/{team_id}/okrs/{okr_id}")
@@ -136,6 +149,8 @@ def delete_team_okr(team_id: str, okr_id: str, db: Session = Depends(get_db), cu
         raise HTTPException(status_code=404, detail="OKR not found")
     
     db.delete(db_okr)
+    record_change(db, "okr.deleted", {"id": okr_id}, team_id=team_id, user_id=current_user.id)
+    touch(db, team_scope(team_id))
     db.commit()
     return {"message": "OKR deleted successfully"}
 
@@ -162,6 +177,9 @@ def add_key_result(okr_id: str, key_result: schemas.TeamOKRKeyResultCreate, db:
     
     db_kr = models.TeamOKRKeyResult(**key_result.dict(), id=str(uuid.uuid4()), okr_id=okr_id)
     db.add(db_kr)
+    db.flush()
+    record_change(db, "key_result.created", schemas.TeamOKRKeyResult.model_validate(db_kr).model_dump(mode="json"), team_id=okr.team_id, user_id=current_user.id)
+    touch(db, team_scope(okr.team_id))
     db.commit()
     db.refresh(db_kr)
     return db_kr
@@ -198,6 +216,9 @@ def update_key_result(okr_id: str, kr_id: str, key_result_update: schemas.TeamOK
         setattr(db_kr, key, value)
     
     db_kr.updated_at = datetime.datetime.utcnow()
+    db.flush()
+    record_change(db, "key_result.updated", schemas.TeamOKRKeyResult.model_validate(db_kr).model_dump(mode="json"), team_id=okr.team_id, user_id=current_user.id)
+    touch(db, team_scope(okr.team_id))
     db.commit()
     db.refresh(db_kr)
     return db_kr
@@ -231,5 +252,7 @@ def delete_key_result(okr_id: str, kr_id: str, db: Session = Depends(get_db), cu
         raise HTTPException(status_code=404, detail="Key result not found")
     
     db.delete(db_kr)
+    record_change(db, "key_result.deleted", {"id": kr_id, "okr_id": okr_id}, team_id=okr.team_id, user_id=current_user.id)
+    touch(db, team_scope(okr.team_id))
     db.commit()
     return {"message": "Key result deleted successfully"}
@@ -7,6 +7,7 @@ import uuid
 from ..models import models, schemas
 from ..database import get_db
 from ..core.auth import get_current_user
+from ..core.http_cache import team_scope, touch
 
 router = APIRouter()
 
@@ -36,6 +37,8 @@ def add_team_member(team_id: str, member: schemas.TeamMemberCreate, db: Session
 
     db_new_member = models.TeamMember(**member.dict(), id=str(uuid.uuid4()), team_id=team_id)
     db.add(db_new_member)
+    # Membership decides who may read the team's OKRs
+    touch(db, team_scope(team_id))
     db.commit()
     db.refresh(db_new_member)
     return db_new_member
@@ -108,6 +111,7 @@ def delete_team(team_id: str, db: Session = Depends(get_db), current_user: model
     db.query(models.TeamMember).filter(models.TeamMember.team_id == team_id).delete()
     # Delete the team
     db.delete(team)
+    touch(db, team_scope(team_id))
     db.commit()
     return {"message": "Team deleted successfully"}
 
@@ -136,5 +140,6 @@ def remove_team_member(team_id: str, user_id: str, db: Session = Depends(get_db)
         raise HTTPException(status_code=400, detail="Cannot remove team owner")
     
     db.delete(member_to_remove)
+    touch(db, team_scope(team_id))
     db.commit()
     return {"message": "Member removed successfully"}
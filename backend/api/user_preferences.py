@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
 import uuid
@@ -6,62 +8,66 @@ import datetime
 from datetime import date
 
 from ..models import models, schemas
-from ..database import get_db
-from ..core.auth import get_current_user
+from ..database import get_async_db, get_db
+from ..core.auth import get_current_user, get_current_user_async
+from ..core.http_cache import Conditional, preferences_conditional, preferences_scope, touch
+from ..core.outbox import record_change
+from ..core.pagination import PageParams, keyset_page, keyset_page_async, next_cursor_headers
+from ..core.serialization import ORJSONResponse, trusted
 
 router = APIRouter()
 
 # User Preferences Endpoints
+def _preference_by_key(user_id: str, preference_key: str):
+    return select(models.UserPreference).where(
+        models.UserPreference.user_id == user_id,
+        models.UserPreference.preference_key == preference_key
+    )
+
 @router.post("/preferences/", response_model=schemas.UserPreference)
-def create_user_preference(preference: schemas.UserPreferenceCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def create_user_preference(preference: schemas.UserPreferenceCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     """Create a new user preference."""
     if preference.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Can only create preferences for yourself")
     
     # Check if preference already exists
-    existing = db.query(models.UserPreference).filter(
-        models.UserPreference.user_id == current_user.id,
-        models.UserPreference.preference_key == preference.preference_key
-    ).first()
+    existing = (await db.scalars(_preference_by_key(current_user.id, preference.preference_key))).first()
     
     if existing:
         raise HTTPException(status_code=400, detail="Preference already exists for this key")
     
     db_preference = models.UserPreference(**preference.dict(), id=str(uuid.uuid4()))
     db.add(db_preference)
-    db.commit()
-    db.refresh(db_preference)
+    touch(db, preferences_scope(current_user.id))
+    await db.commit()
     return db_preference
 
 @router.get("/preferences/", response_model=List[schemas.UserPreference])
-def get_user_preferences(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    """Get all preferences for the current user."""
-    preferences = db.query(models.UserPreference).filter(
-        models.UserPreference.user_id == current_user.id
-    ).all()
-    return preferences
+async def get_user_preferences(page: PageParams = Depends(), conditional: Conditional = Depends(preferences_conditional), db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
+    """Get the current user's preferences by key, one page at a time (cursor in X-Next-Cursor)."""
+    if conditional.hit:
+        return conditional.hit
+    statement = select(models.UserPreference).where(models.UserPreference.user_id == current_user.id)
+    preferences, next_cursor = await keyset_page_async(db, statement, models.UserPreference.preference_key, models.UserPreference.id, page.cursor, page.limit, descending=False)
+    return conditional.respond(preferences, List[schemas.UserPreference], next_cursor_headers(next_cursor))
 
 @router.get("/preferences/{preference_key}", response_model=schemas.UserPreference)
-def get_user_preference(preference_key: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def get_user_preference(preference_key: str, conditional: Conditional = Depends(preferences_conditional), db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     """Get a specific preference by key."""
-    preference = db.query(models.UserPreference).filter(
-        models.UserPreference.user_id == current_user.id,
-        models.UserPreference.preference_key == preference_key
-    ).first()
+    if conditional.hit:
+        return conditional.hit
+    preference = (await db.scalars(_preference_by_key(current_user.id, preference_key))).first()
     if not preference:
         raise HTTPException(status_code=404, detail="Preference not found")
-    return preference
+    return conditional.respond(preference, schemas.UserPreference)
 
 @router.put("/preferences/{preference_key}", response_model=schemas.UserPreference)
-def update_user_preference(preference_key: str, preference_update: schemas.UserPreferenceCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def update_user_preference(preference_key: str, preference_update: schemas.UserPreferenceCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     """Update a user preference."""
     if preference_update.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Can only update your own preferences")
     
-    db_preference = db.query(models.UserPreference).filter(
-        models.UserPreference.user_id == current_user.id,
-        models.UserPreference.preference_key == preference_key
-    ).first()
+    db_preference = (await db.scalars(_preference_by_key(current_user.id, preference_key))).first()
     if not db_preference:
         raise HTTPException(status_code=404, detail="Preference not found")
     
@@ -69,22 +75,20 @@ def update_user_preference(preference_key: str, preference_update: schemas.UserP
         setattr(db_preference, key, value)
     
     db_preference.updated_at = datetime.datetime.utcnow()
-    db.commit()
-    db.refresh(db_preference)
+    touch(db, preferences_scope(current_user.id))
+    await db.commit()
     return db_preference
 
 @router.delete("/preferences/{preference_key}")
-def delete_user_preference(preference_key: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def delete_user_preference(preference_key: str, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     """Delete a user preference."""
-    db_preference = db.query(models.UserPreference).filter(
-        models.UserPreference.user_id == current_user.id,
-        models.UserPreference.preference_key == preference_key
-    ).first()
+    db_preference = (await db.scalars(_preference_by_key(current_user.id, preference_key))).first()
     if not db_preference:
         raise HTTPException(status_code=404, detail="Preference not found")
     
-    db.delete(db_preference)
-    db.commit()
+    await db.delete(db_preference)
+    touch(db, preferences_scope(current_user.id))
+    await db.commit()
     return {"message": "Preference deleted successfully"}
 
 # User Analytics Endpoints
@@ -105,13 +109,15 @@ def create_user_analytics(analytics: schemas.UserAnalyticsCreate, db: Session =
     
     db_analytics = models.UserAnalytics(**analytics.dict(), id=str(uuid.uuid4()))
     db.add(db_analytics)
+    db.flush()
+    record_change(db, "analytics.created", schemas.UserAnalytics.model_validate(db_analytics).model_dump(mode="json"), user_id=current_user.id)
     db.commit()
     db.refresh(db_analytics)
     return db_analytics
 
 @router.get("/analytics/", response_model=List[schemas.UserAnalytics])
-def get_user_analytics(start_date: date = None, end_date: date = None, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    """Get analytics for the current user with optional date range."""
+def get_user_analytics(start_date: date = None, end_date: date = None, page: PageParams = Depends(), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Get analytics for the current user with optional date range, newest first, one page at a time."""
     query = db.query(models.UserAnalytics).filter(models.UserAnalytics.user_id == current_user.id)
     
     if start_date:
@@ -119,8 +125,8 @@ def get_user_analytics(start_date: date = None, end_date: date = None, db: Sessi
     if end_date:
         query = query.filter(models.UserAnalytics.date <= end_date)
     
-    analytics = query.order_by(models.UserAnalytics.date.desc()).all()
-    return analytics
+    analytics, next_cursor = keyset_page(query, models.UserAnalytics.date, models.UserAnalytics.id, page.cursor, page.limit)
+    return ORJSONResponse(trusted(analytics, schemas.UserAnalytics), headers=next_cursor_headers(next_cursor))
 
 @router.get("/analytics/{analytics_date}", response_model=schemas.UserAnalytics)
 def get_user_analytics_by_date(analytics_date: date, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -149,6 +155,8 @@ def update_user_analytics(analytics_date: date, analytics_update: schemas.UserAn
     for key, value in analytics_update.dict().items():
         setattr(db_analytics, key, value)
     
+    db.flush()
+    record_change(db, "analytics.updated", schemas.UserAnalytics.model_validate(db_analytics).model_dump(mode="json"), user_id=current_user.id)
     db.commit()
     db.refresh(db_analytics)
     return db_analytics
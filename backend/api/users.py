@@ -1,36 +1,45 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 import uuid
 
 from ..models import models, schemas
-from ..database import get_db
+from ..database import get_async_db
 from ..core import auth
+from ..core.password_hashing import password_hasher
 
 router = APIRouter()
 
+async def _user_by_email(db: AsyncSession, email: str):
+    return (await db.scalars(select(models.User).where(models.User.email == email).limit(1))).first()
+
 @router.post("/users/", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await _user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     db_user = models.User(id=str(uuid.uuid4()), email=user.email, hashed_password=hashed_password, daily_start_hour=user.daily_start_hour, daily_end_hour=user.daily_end_hour)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     return db_user
 
 @router.post("/token")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await _user_by_email(db, form_data.username)
+    verified, new_hash = (await password_hasher.verify_and_update(form_data.password, user.hashed_password)) if user else (False, None)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored with a different bcrypt cost than configured; upgrade it now that we have the password
+        user.hashed_password = new_hash
+        await db.commit()
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
@@ -42,20 +51,21 @@ def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
     return current_user
 
 @router.put("/users/{user_id}", response_model=schemas.User)
-def update_user(user_id: str, user: schemas.UserCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+async def update_user(user_id: str, user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(auth.get_current_user_async)):
     if user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this user")
     
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.get(models.User, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
     db_user.email = user.email
     if user.password:
-        db_user.hashed_password = auth.get_password_hash(user.password)
+        db_user.hashed_password = await password_hasher.hash(user.password)
     db_user.daily_start_hour = user.daily_start_hour
     db_user.daily_end_hour = user.daily_end_hour
 
-    db.commit()
-    db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    await db.commit()
+    # Cached principals still hold the old profile
+    auth.principal_cache.invalidate_user(user_id)
+    return db_user
@@ -0,0 +1,193 @@
+"""
+Latency and throughput of the three ways a route can reach the database.
+
+Concurrent clients hammer the same endpoint (read a sub-goal's tasks, or mark a
+task done) implemented three ways against one seeded SQLite file:
+
+- threadpool: `def` route with a sync Session; FastAPI runs it in a worker
+  thread, so concurrency is capped by the threadpool
+- blocking:   `async def` route with a sync Session, as mark_notification_sent
+  used to be; every query stalls the event loop for all other requests
+- async:      `async def` route with an AsyncSession from get_async_db's engine
+
+Requests go through the ASGI app in-process, and a probe task measures how late
+the event loop wakes it up (loop lag), which is what the blocking variant hurts.
+
+Usage:
+    python -m backend.benchmarks.async_routes --clients 16 --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+import numpy as np
+from fastapi import Depends, FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..database import create_async_db_engine, create_db_engine
+from ..models import models
+
+MODES = ("threadpool", "blocking", "async")
+
+def seed(session_factory, sub_goals: int, tasks_per_sub_goal: int) -> List[str]:
+    db = session_factory()
+    user = models.User(id=str(uuid.uuid4()), email="bench@example.com", hashed_password="x")
+    goal = models.Goal(id=str(uuid.uuid4()), title="Bench", owner_id=user.id, target_date=datetime.datetime(2030, 1, 1))
+    db.add_all([user, goal])
+    sub_goal_ids = []
+    for _ in range(sub_goals):
+        sub_goal = models.SubGoal(id=str(uuid.uuid4()), goal_id=goal.id, title="Sub-goal", target_date=goal.target_date)
+        db.add(sub_goal)
+        sub_goal_ids.append(sub_goal.id)
+        for _ in range(tasks_per_sub_goal):
+            db.add(models.Task(id=str(uuid.uuid4()), sub_goal_id=sub_goal.id, status="todo"))
+    db.commit()
+    db.close()
+    return sub_goal_ids
+
+def build_app(session_factory, async_session_factory) -> FastAPI:
+    app = FastAPI()
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with async_session_factory() as db:
+            yield db
+
+    def read_sync(db: Session, sub_goal_id: str):
+        return [task.id for task in db.query(models.Task).filter(models.Task.sub_goal_id == sub_goal_id).all()]
+
+    def write_sync(db: Session, sub_goal_id: str):
+        task = db.query(models.Task).filter(models.Task.sub_goal_id == sub_goal_id).first()
+        task.status = "done" if task.status != "done" else "todo"
+        db.commit()
+        return task.id
+
+    @app.get("/threadpool/{sub_goal_id}")
+    def threadpool_read(sub_goal_id: str, db: Session = Depends(get_db)):
+        return read_sync(db, sub_goal_id)
+
+    @app.put("/threadpool/{sub_goal_id}")
+    def threadpool_write(sub_goal_id: str, db: Session = Depends(get_db)):
+        return write_sync(db, sub_goal_id)
+
+    @app.get("/blocking/{sub_goal_id}")
+    async def blocking_read(sub_goal_id: str, db: Session = Depends(get_db)):
+        return read_sync(db, sub_goal_id)
+
+    @app.put("/blocking/{sub_goal_id}")
+    async def blocking_write(sub_goal_id: str, db: Session = Depends(get_db)):
+        return write_sync(db, sub_goal_id)
+
+    @app.get("/async/{sub_goal_id}")
+    async def async_read(sub_goal_id: str, db: AsyncSession = Depends(get_async_db)):
+        return (await db.scalars(select(models.Task.id).where(models.Task.sub_goal_id == sub_goal_id))).all()
+
+    @app.put("/async/{sub_goal_id}")
+    async def async_write(sub_goal_id: str, db: AsyncSession = Depends(get_async_db)):
+        task = (await db.scalars(select(models.Task).where(models.Task.sub_goal_id == sub_goal_id).limit(1))).first()
+        task.status = "done" if task.status != "done" else "todo"
+        await db.commit()
+        return task.id
+
+    return app
+
+async def _client(client: httpx.AsyncClient, mode: str, sub_goal_ids: List[str], deadline: float, write_ratio: float, seed_value: int, results: Dict[str, list]):
+    rng = random.Random(seed_value)
+    while time.perf_counter() < deadline:
+        path = f"/{mode}/{rng.choice(sub_goal_ids)}"
+        is_write = rng.random() < write_ratio
+        started = time.perf_counter()
+        response = await (client.put(path) if is_write else client.get(path))
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            results["errors"].append(response.status_code)
+        else:
+            results["writes" if is_write else "reads"].append(elapsed)
+
+async def _probe_loop_lag(deadline: float, lags: List[float], interval: float = 0.01):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+async def run_mode(app: FastAPI, mode: str, sub_goal_ids: List[str], clients: int, seconds: float, write_ratio: float) -> Dict[str, float]:
+    results: Dict[str, list] = {"reads": [], "writes": [], "errors": []}
+    lags: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(
+            _probe_loop_lag(deadline, lags),
+            *(_client(client, mode, sub_goal_ids, deadline, write_ratio, i, results) for i in range(clients)),
+        )
+
+    latencies = np.asarray(results["reads"] + results["writes"]) * 1000 if results["reads"] or results["writes"] else np.zeros(1)
+    lag = np.asarray(lags) * 1000 if lags else np.zeros(1)
+    return {
+        "requests_per_second": (len(results["reads"]) + len(results["writes"])) / seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "loop_lag_p99_ms": float(np.percentile(lag, 99)),
+        "loop_lag_max_ms": float(lag.max()),
+        "errors": len(results["errors"]),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare threadpool, blocking and asyncio database routes under concurrent load.")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--sub-goals", type=int, default=500)
+    parser.add_argument("--tasks-per-sub-goal", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args(argv)
+
+    summaries = {}
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        engine = create_db_engine(url)
+        async_engine = create_async_db_engine(url)
+        models.Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        sub_goal_ids = seed(session_factory, args.sub_goals, args.tasks_per_sub_goal)
+        app = build_app(session_factory, async_session_factory)
+
+        async def run_all():
+            for mode in args.modes:
+                print(f"{mode}:")
+                summaries[mode] = await run_mode(app, mode, sub_goal_ids, args.clients, args.seconds, args.write_ratio)
+            await async_engine.dispose()
+
+        try:
+            asyncio.run(run_all())
+        finally:
+            engine.dispose()
+
+    print(f"\n{args.clients} clients, {args.seconds:.0f}s, {args.write_ratio:.0%} writes")
+    for mode, summary in summaries.items():
+        print(
+            f"{mode:>10}: {summary['requests_per_second']:7.0f} req/s, "
+            f"p50 {summary['p50_ms']:.2f}ms p99 {summary['p99_ms']:.2f}ms, "
+            f"loop lag p99 {summary['loop_lag_p99_ms']:.2f}ms max {summary['loop_lag_max_ms']:.2f}ms, "
+            f"errors {summary['errors']}"
+        )
+    return summaries
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Rows per second of importing tasks one by one versus through the bulk routes.
+
+The real tasks router runs against a seeded SQLite file and requests go through
+the ASGI app in-process:
+
+- single:      POST /api/tasks/ per task; each call authorizes, flushes,
+               records its outbox event and commits
+- bulk-create: POST /api/tasks/bulk with every task in one request
+- bulk-update: PUT /api/tasks/bulk completing all of those tasks again
+
+Usage:
+    python -m backend.benchmarks.bulk_import --rows 5000 --single 200
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ..api import tasks
+from ..core.auth import create_access_token
+from ..database import create_async_db_engine, create_db_engine, get_async_db
+from ..models import models
+
+def seed(engine, sub_goals: int) -> List[str]:
+    with engine.begin() as conn:
+        user_id = str(uuid.uuid4())
+        goal_id = str(uuid.uuid4())
+        target_date = datetime.datetime(2030, 1, 1)
+        conn.execute(models.User.__table__.insert().values(id=user_id, email="bench@example.com", hashed_password="x"))
+        conn.execute(models.Goal.__table__.insert().values(id=goal_id, title="Bench", owner_id=user_id, target_date=target_date))
+        sub_goal_ids = [str(uuid.uuid4()) for _ in range(sub_goals)]
+        conn.execute(models.SubGoal.__table__.insert(), [
+            {"id": sub_goal_id, "goal_id": goal_id, "title": "Sub-goal", "target_date": target_date} for sub_goal_id in sub_goal_ids
+        ])
+    return sub_goal_ids
+
+def build_app(async_session_factory) -> FastAPI:
+    app = FastAPI()
+    app.include_router(tasks.router, prefix="/api")
+
+    async def get_bench_db():
+        async with async_session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_bench_db
+    return app
+
+def _summary(rows: int, seconds: float, errors: int) -> Dict[str, float]:
+    return {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds if seconds else 0.0, "errors": errors}
+
+async def run(app: FastAPI, sub_goal_ids: List[str], rows: int, single: int) -> Dict[str, Dict[str, float]]:
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench@example.com'})}"}
+    plan = [{"sub_goal_id": sub_goal_ids[i % len(sub_goal_ids)], "priority": i % 5} for i in range(rows)]
+    summaries = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        errors = 0
+        started = time.perf_counter()
+        for task in plan[:single]:
+            errors += (await client.post("/api/tasks/", headers=headers, json=task)).status_code != 200
+        summaries["single"] = _summary(single, time.perf_counter() - started, errors)
+
+        started = time.perf_counter()
+        created = (await client.post("/api/tasks/bulk", headers=headers, json=plan)).json()
+        summaries["bulk-create"] = _summary(rows, time.perf_counter() - started, len(created["errors"]))
+
+        updates = [{**task, "id": task_id, "status": "done"} for task, task_id in zip(plan, created["ids"])]
+        started = time.perf_counter()
+        updated = (await client.put("/api/tasks/bulk", headers=headers, json=updates)).json()
+        summaries["bulk-update"] = _summary(rows, time.perf_counter() - started, len(updated["errors"]))
+    return summaries
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-task and bulk task imports on SQLite.")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--single", type=int, default=200, help="Tasks to create one request at a time")
+    parser.add_argument("--sub-goals", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        engine = create_db_engine(url)
+        async_engine = create_async_db_engine(url)
+        models.Base.metadata.create_all(bind=engine)
+        sub_goal_ids = seed(engine, args.sub_goals)
+        app = build_app(async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False))
+
+        async def run_all():
+            try:
+                return await run(app, sub_goal_ids, args.rows, args.single)
+            finally:
+                await async_engine.dispose()
+
+        try:
+            summaries = asyncio.run(run_all())
+        finally:
+            engine.dispose()
+
+    print(f"\n{args.rows} tasks over {args.sub_goals} sub-goals")
+    for name, summary in summaries.items():
+        print(f"{name:>12}: {summary['rows']:6d} rows in {summary['seconds']:.2f}s, {summary['rows_per_second']:8.0f} rows/s, errors {summary['errors']}")
+    return summaries
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Concurrent read/write throughput of the database engine configurations.
+
+Threads share one engine and run a mix of indexed reads and single-row update
+transactions against a benchmark-only table (bench_tasks), checking a pooled
+connection out per operation like a request would. Compares:
+
+- sqlite-default: the previous engine (rollback journal, default pragmas and pool)
+- sqlite-tuned:   create_db_engine (WAL, synchronous=NORMAL, busy_timeout, mmap, pool sizing)
+- postgresql:     create_db_engine for --postgres-url, when given
+
+Usage:
+    python -m backend.benchmarks.db_engine --threads 8 --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, bindparam, create_engine, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from ..database import create_db_engine
+
+metadata = MetaData()
+bench_tasks = Table(
+    "bench_tasks",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("sub_goal_id", Integer, index=True),
+    Column("status", String),
+    Column("priority", Integer),
+    Column("updated_at", DateTime),
+)
+
+STATUSES = ("todo", "in_progress", "done")
+
+def seed(engine: Engine, rows: int, sub_goals: int):
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    now = time.time()
+    with engine.begin() as conn:
+        conn.execute(bench_tasks.insert(), [
+            {"id": i, "sub_goal_id": i % sub_goals, "status": "todo", "priority": i % 3, "updated_at": None}
+            for i in range(rows)
+        ])
+    print(f"  seeded {rows} rows in {time.time() - now:.2f}s")
+
+def _worker(engine: Engine, deadline: float, write_ratio: float, rows: int, sub_goals: int, seed_value: int, results: Dict[str, List[float]]):
+    rng = random.Random(seed_value)
+    reads, writes, errors = [], [], 0
+    read_query = select(bench_tasks.c.id, bench_tasks.c.status, bench_tasks.c.priority).where(bench_tasks.c.sub_goal_id == bindparam("sub_goal_id"))
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                with engine.begin() as conn:
+                    conn.execute(
+                        update(bench_tasks)
+                        .where(bench_tasks.c.id == rng.randrange(rows))
+                        .values(status=rng.choice(STATUSES), updated_at=None)
+                    )
+                writes.append(time.perf_counter() - started)
+            else:
+                with engine.connect() as conn:
+                    conn.execute(read_query, {"sub_goal_id": rng.randrange(sub_goals)}).fetchall()
+                reads.append(time.perf_counter() - started)
+        except OperationalError:
+            # "database is locked" when a writer gives up waiting
+            errors += 1
+    results["reads"].extend(reads)
+    results["writes"].extend(writes)
+    results["errors"].append(errors)
+
+def run(engine: Engine, threads: int, seconds: float, write_ratio: float, rows: int, sub_goals: int) -> Dict[str, float]:
+    seed(engine, rows, sub_goals)
+    results: Dict[str, List[float]] = {"reads": [], "writes": [], "errors": []}
+    deadline = time.perf_counter() + seconds
+    workers = [
+        threading.Thread(target=_worker, args=(engine, deadline, write_ratio, rows, sub_goals, i, results))
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    summary = {"errors": sum(results["errors"])}
+    for kind in ("reads", "writes"):
+        latencies = np.asarray(results[kind]) * 1000 if results[kind] else np.zeros(1)
+        summary[f"{kind}_per_second"] = len(results[kind]) / seconds
+        summary[f"{kind}_p50_ms"] = float(np.percentile(latencies, 50))
+        summary[f"{kind}_p99_ms"] = float(np.percentile(latencies, 99))
+    return summary
+
+def build_configurations(sqlite_path: str, postgres_url: Optional[str]) -> Dict[str, Engine]:
+    url = f"sqlite:///{sqlite_path}"
+    configurations = {
+        "sqlite-default": create_engine(url, connect_args={"check_same_thread": False}),
+        "sqlite-tuned": create_db_engine(url),
+    }
+    if postgres_url:
+        configurations["postgresql"] = create_db_engine(postgres_url)
+    return configurations
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark concurrent read/write throughput per database engine configuration.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--sub-goals", type=int, default=5_000)
+    parser.add_argument("--postgres-url", default=os.getenv("BENCH_POSTGRES_URL"), help="Also benchmark this PostgreSQL database (creates and drops bench_tasks)")
+    args = parser.parse_args(argv)
+
+    summaries = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, engine in build_configurations(os.path.join(directory, "bench.db"), args.postgres_url).items():
+            if name.startswith("sqlite"):
+                # Each SQLite configuration gets a fresh file so journal modes do not carry over
+                engine.dispose()
+                for suffix in ("", "-wal", "-shm"):
+                    path = os.path.join(directory, "bench.db" + suffix)
+                    if os.path.exists(path):
+                        os.remove(path)
+            print(f"{name}:")
+            try:
+                summaries[name] = run(engine, args.threads, args.seconds, args.write_ratio, args.rows, args.sub_goals)
+            finally:
+                metadata.drop_all(engine)
+                engine.dispose()
+
+    print(f"\n{args.threads} threads, {args.seconds:.0f}s, {args.write_ratio:.0%} writes")
+    for name, summary in summaries.items():
+        print(
+            f"{name:>15}: reads {summary['reads_per_second']:8.0f}/s "
+            f"(p50 {summary['reads_p50_ms']:.2f}ms p99 {summary['reads_p99_ms']:.2f}ms), "
+            f"writes {summary['writes_per_second']:7.0f}/s "
+            f"(p50 {summary['writes_p50_ms']:.2f}ms p99 {summary['writes_p99_ms']:.2f}ms), "
+            f"errors {summary['errors']}"
+        )
+    return summaries
+
+if __name__ == "__main__":
+    main()
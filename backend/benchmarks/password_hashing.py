@@ -0,0 +1,109 @@
+"""
+Login throughput of the password hashing pool versus worker (core) count.
+
+Concurrent clients verify a password for a fixed time, the way POST /api/token
+does, through PasswordHasher with 1..N worker processes, and through the old
+inline path (bcrypt in the request threadpool) for comparison. Loop lag shows
+how much other requests would be delayed during the burst.
+
+bcrypt releases the GIL, so threads also scale until they run out of cores;
+the pool's advantage is that it caps hashing at the core count and sheds the
+excess with 503 instead of tying up every threadpool worker.
+
+Usage:
+    python -m backend.benchmarks.password_hashing --clients 32 --seconds 5 --rounds 12 [--workers 1 2 4]
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+from fastapi import HTTPException
+
+from ..core.password_hashing import PasswordHasher, bcrypt_rounds, hash_password, verify_and_update
+
+PASSWORD = "correct horse battery staple"
+
+async def _probe_loop_lag(deadline: float, lags: List[float], interval: float = 0.01):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+async def _burst(login, clients: int, seconds: float) -> Dict[str, float]:
+    latencies: List[float] = []
+    lags: List[float] = []
+    shed = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal shed
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                verified, _ = await login()
+                assert verified
+                latencies.append(time.perf_counter() - started)
+            except HTTPException:
+                shed += 1
+                await asyncio.sleep(0.05)
+
+    await asyncio.gather(_probe_loop_lag(deadline, lags), *(client() for _ in range(clients)))
+    latency = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    lag = np.asarray(lags) * 1000 if lags else np.zeros(1)
+    return {
+        "logins_per_second": len(latencies) / seconds,
+        "p50_ms": float(np.percentile(latency, 50)),
+        "p99_ms": float(np.percentile(latency, 99)),
+        "shed": shed,
+        "loop_lag_p99_ms": float(np.percentile(lag, 99)),
+    }
+
+async def run_inline(hashed: str, rounds: int, clients: int, seconds: float) -> Dict[str, float]:
+    # The previous behaviour: each login hashes in a threadpool worker
+    return await _burst(lambda: asyncio.to_thread(verify_and_update, PASSWORD, hashed, rounds), clients, seconds)
+
+async def run_pool(hashed: str, rounds: int, workers: int, clients: int, seconds: float, max_pending: int = None) -> Dict[str, float]:
+    hasher = PasswordHasher(workers=workers, rounds=rounds, max_pending=max_pending)
+    hasher.start()
+    try:
+        # Start every worker process before measuring
+        await asyncio.gather(*(hasher.hash(PASSWORD) for _ in range(workers)))
+        return await _burst(lambda: hasher.verify_and_update(PASSWORD, hashed), clients, seconds)
+    finally:
+        hasher.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark login throughput of the password hashing pool per worker count.")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rounds", type=int, default=bcrypt_rounds())
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--max-pending", type=int, default=None, help="Shedding threshold (default: 8 per worker)")
+    args = parser.parse_args(argv)
+
+    hashed = hash_password(PASSWORD, args.rounds)
+    summaries = {}
+
+    async def run_all():
+        print("inline:")
+        summaries["inline"] = await run_inline(hashed, args.rounds, args.clients, args.seconds)
+        for workers in args.workers:
+            print(f"pool-{workers}:")
+            summaries[f"pool-{workers}"] = await run_pool(hashed, args.rounds, workers, args.clients, args.seconds, args.max_pending)
+
+    asyncio.run(run_all())
+
+    print(f"\n{args.clients} clients, {args.seconds:.0f}s, bcrypt cost {args.rounds}, {os.cpu_count()} cores")
+    for name, summary in summaries.items():
+        print(
+            f"{name:>8}: {summary['logins_per_second']:6.1f} logins/s, "
+            f"p50 {summary['p50_ms']:.0f}ms p99 {summary['p99_ms']:.0f}ms, "
+            f"shed {summary['shed']}, loop lag p99 {summary['loop_lag_p99_ms']:.1f}ms"
+        )
+    return summaries
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Cost of turning a list of ORM rows into a JSON response body.
+
+Lists of tasks, notifications and analytics rows (1000 each by default, more
+than one API page) are serialized three ways:
+
+- stdlib:  validate against the schema, jsonable_encoder, json.dumps; what
+           FastAPI does for a route with a custom response class
+- pydantic: validate against the schema and dump with pydantic-core; FastAPI's
+           default path for a response_model
+- orjson:  trusted() dicts encoded by ORJSONResponse, the opt-in fast path
+
+All three must produce the same JSON, which is checked before timing.
+
+Usage:
+    python -m backend.benchmarks.serialization --rows 1000 --repeat 50
+"""
+import argparse
+import datetime
+import json
+import time
+import uuid
+from typing import Callable, Dict, List
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from ..core.serialization import ORJSONResponse, trusted
+from ..models import models, schemas
+
+def build_rows(kind: str, count: int) -> List:
+    start = datetime.datetime(2025, 1, 1, 9, 0)
+    user_id = str(uuid.uuid4())
+    if kind == "tasks":
+        sub_goal_id = str(uuid.uuid4())
+        return [
+            models.Task(
+                id=str(uuid.uuid4()), sub_goal_id=sub_goal_id, status="todo" if i % 3 else "done", priority=i % 5,
+                planned_start=start + datetime.timedelta(hours=i), planned_end=start + datetime.timedelta(hours=i, minutes=45),
+                dependencies=None, reminder_interval=15,
+            )
+            for i in range(count)
+        ]
+    if kind == "notifications":
+        return [
+            models.Notification(
+                id=str(uuid.uuid4()), user_id=user_id, task_id=str(uuid.uuid4()), message=f"Task {i} starts soon",
+                notification_time=start + datetime.timedelta(minutes=7 * i, microseconds=i), method="push", is_sent=bool(i % 2),
+            )
+            for i in range(count)
+        ]
+    if kind == "analytics":
+        return [
+            models.UserAnalytics(
+                id=str(uuid.uuid4()), user_id=user_id, date=start.date() - datetime.timedelta(days=i),
+                tasks_completed=i % 9, goals_achieved=i % 2, productivity_score=(i % 100) / 10, focus_time_minutes=25 * (i % 8),
+                created_at=start,
+            )
+            for i in range(count)
+        ]
+    raise ValueError(kind)
+
+SCHEMAS = {"tasks": schemas.Task, "notifications": schemas.Notification, "analytics": schemas.UserAnalytics}
+
+def serializers(schema) -> Dict[str, Callable[[List], bytes]]:
+    adapter = TypeAdapter(List[schema])
+    return {
+        "stdlib": lambda rows: json.dumps(jsonable_encoder(adapter.validate_python(rows, from_attributes=True))).encode(),
+        "pydantic": lambda rows: adapter.dump_json(adapter.validate_python(rows, from_attributes=True)),
+        "orjson": lambda rows: ORJSONResponse(trusted(rows, schema)).body,
+    }
+
+def measure(serialize: Callable[[List], bytes], rows: List, repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = serialize(rows)
+        timings.append(time.perf_counter() - started)
+    timings = np.asarray(timings) * 1000
+    return {
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "bytes": len(body),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark JSON serialization of list responses.")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--kinds", nargs="+", default=list(SCHEMAS), choices=list(SCHEMAS))
+    args = parser.parse_args(argv)
+
+    summaries = {}
+    for kind in args.kinds:
+        rows = build_rows(kind, args.rows)
+        candidates = serializers(SCHEMAS[kind])
+        expected = json.loads(candidates["pydantic"](rows))
+        for name, serialize in candidates.items():
+            assert json.loads(serialize(rows)) == expected, f"{name} output differs for {kind}"
+            summaries[f"{kind}-{name}"] = measure(serialize, rows, args.repeat)
+
+    print(f"\n{args.rows} rows per response, {args.repeat} runs")
+    for name, summary in summaries.items():
+        kind = name.split("-")[0]
+        speedup = summaries[f"{kind}-stdlib"]["p50_ms"] / summary["p50_ms"] if summary["p50_ms"] else 0.0
+        print(
+            f"{name:>22}: p50 {summary['p50_ms']:6.2f}ms p99 {summary['p99_ms']:6.2f}ms, "
+            f"{summary['bytes'] / 1024:.0f} KiB, {speedup:.1f}x stdlib"
+        )
+    return summaries
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, WebSocket, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import get_async_db, get_db
 from ..models.models import User
+from .password_hashing import bcrypt_rounds, build_context
+from .principal_cache import Principal, principal_cache
 
-# Password Hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password Hashing. Request handlers go through password_hashing.password_hasher,
+# which runs bcrypt in a process pool; these inline helpers are for scripts and tests.
+pwd_context = build_context(bcrypt_rounds())
 
 import os
 
@@ -17,6 +22,9 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
+# Browsers cannot set headers on a WebSocket handshake, so sockets send the
+# token as ?token=... or as a "bearer.<token>" subprotocol
+WEBSOCKET_TOKEN_PREFIX = "bearer."
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -35,22 +43,59 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# Get current user from token
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_claims(token: str):
+    """The email a token was issued for and its expiry; raises 401 for invalid or expired tokens."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+    email: str = payload.get("sub")
+    if email is None:
+        raise _credentials_exception()
+    return email, float(payload.get("exp") or float("inf"))
+
+# Get current user from token. Returns a Principal snapshot of the user, cached
+# per token so repeat requests skip token verification and the user lookup.
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    version = principal_cache.version
+    email, expires_at = _token_claims(token)
     user = db.query(User).filter(User.email == email).first()
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise _credentials_exception()
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, expires_at, version)
+    return principal
+
+# Same as get_current_user, for `async def` routes using get_async_db
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    version = principal_cache.version
+    email, expires_at = _token_claims(token)
+    user = (await db.scalars(select(User).where(User.email == email).limit(1))).first()
+    if user is None:
+        raise _credentials_exception()
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, expires_at, version)
+    return principal
+
+def websocket_token(websocket: WebSocket) -> Optional[str]:
+    """The bearer token of a WebSocket handshake, from the token query parameter or a bearer.<token> subprotocol."""
+    token = websocket.query_params.get("token")
+    if token:
+        return token
+    for subprotocol in websocket.scope.get("subprotocols", []):
+        if subprotocol.startswith(WEBSOCKET_TOKEN_PREFIX):
+            return subprotocol[len(WEBSOCKET_TOKEN_PREFIX):]
+    return None
@@ -0,0 +1,88 @@
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, contains_eager
+
+from ..models import models
+
+class Owned(NamedTuple):
+    """An entity together with the owner of the goal it belongs to (None when it has no goal)."""
+    entity: Any
+    owner_id: Optional[str]
+
+def tasks_with_owner():
+    """
+    Select tasks with their owner, in one joined query; add the filter.
+
+    The sub-goal and goal come from the same join and are populated on the task,
+    so `task.parent_sub_goal.parent_goal` afterwards costs no further queries.
+    """
+    return (
+        select(models.Task, models.Goal.owner_id)
+        .outerjoin(models.Task.parent_sub_goal)
+        .outerjoin(models.SubGoal.parent_goal)
+        .options(contains_eager(models.Task.parent_sub_goal).contains_eager(models.SubGoal.parent_goal))
+    )
+
+def task_ownership(task_ids: Iterable[str]):
+    return tasks_with_owner().where(models.Task.id.in_(list(task_ids)))
+
+def sub_goal_ownership(sub_goal_ids: Iterable[str]):
+    """Sub-goals with their owner; the parent goal is populated from the same join."""
+    return (
+        select(models.SubGoal, models.Goal.owner_id)
+        .outerjoin(models.SubGoal.parent_goal)
+        .options(contains_eager(models.SubGoal.parent_goal))
+        .where(models.SubGoal.id.in_(list(sub_goal_ids)))
+    )
+
+def goal_ownership(goal_ids: Iterable[str]):
+    return select(models.Goal, models.Goal.owner_id).where(models.Goal.id.in_(list(goal_ids)))
+
+def _by_id(rows) -> Dict[str, Owned]:
+    return {entity.id: Owned(entity, owner_id) for entity, owner_id in rows}
+
+def load_owned(db: Session, statement) -> Dict[str, Owned]:
+    """Run one of the *_ownership statements; results are keyed by entity id."""
+    return _by_id(db.execute(statement).all())
+
+async def load_owned_async(db: AsyncSession, statement) -> Dict[str, Owned]:
+    """load_owned for an AsyncSession."""
+    return _by_id((await db.execute(statement)).all())
+
+def _unparented(entity) -> bool:
+    """Whether the entity is outside any goal by design: a task with no sub-goal."""
+    return isinstance(entity, models.Task) and entity.sub_goal_id is None
+
+def authorize_owner(owned: Optional[Owned], user_id: str, not_found: str, forbidden: str):
+    """
+    Return the entity if it exists and the user owns it; 404/403 otherwise.
+
+    Only a task without a sub-goal may have no owner. Anything else without one
+    has lost its sub-goal or goal, and is treated as missing rather than public.
+    """
+    if owned is None or (owned.owner_id is None and not _unparented(owned.entity)):
+        raise HTTPException(status_code=404, detail=not_found)
+    if owned.owner_id is not None and owned.owner_id != user_id:
+        raise HTTPException(status_code=403, detail=forbidden)
+    return owned.entity
+
+def get_owned_task(db: Session, task_id: str, user_id: str, forbidden: str) -> models.Task:
+    return authorize_owner(load_owned(db, task_ownership([task_id])).get(task_id), user_id, "Task not found", forbidden)
+
+async def get_owned_task_async(db: AsyncSession, task_id: str, user_id: str, forbidden: str) -> models.Task:
+    return authorize_owner((await load_owned_async(db, task_ownership([task_id]))).get(task_id), user_id, "Task not found", forbidden)
+
+def get_owned_sub_goal(db: Session, sub_goal_id: str, user_id: str, forbidden: str) -> models.SubGoal:
+    return authorize_owner(load_owned(db, sub_goal_ownership([sub_goal_id])).get(sub_goal_id), user_id, "Sub-goal not found", forbidden)
+
+async def get_owned_sub_goal_async(db: AsyncSession, sub_goal_id: str, user_id: str, forbidden: str) -> models.SubGoal:
+    return authorize_owner((await load_owned_async(db, sub_goal_ownership([sub_goal_id]))).get(sub_goal_id), user_id, "Sub-goal not found", forbidden)
+
+def get_owned_goal(db: Session, goal_id: str, user_id: str, forbidden: str) -> models.Goal:
+    return authorize_owner(load_owned(db, goal_ownership([goal_id])).get(goal_id), user_id, "Goal not found", forbidden)
+
+async def get_owned_goal_async(db: AsyncSession, goal_id: str, user_id: str, forbidden: str) -> models.Goal:
+    return authorize_owner((await load_owned_async(db, goal_ownership([goal_id]))).get(goal_id), user_id, "Goal not found", forbidden)
@@ -0,0 +1,59 @@
+"""
+Shared checks of the bulk create/update routes for tasks and sub-goals.
+
+A bulk request is checked as a whole (size, repeated ids), then item by item
+against ownership loaded in one query: items that fail are reported with the
+status and detail the single-item route would have returned, and the rest are
+written with one executemany per table and a single commit.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from ..models import schemas
+
+MAX_BULK_ITEMS = 5000
+
+T = TypeVar("T")
+
+def check_bulk_size(items: List):
+    if not items:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items can be sent at once")
+
+class BulkOutcome:
+    """Per-item results of a bulk request, in request order."""
+
+    def __init__(self, count: int):
+        self.ids: List[Optional[str]] = [None] * count
+        self.errors: List[schemas.BulkItemError] = []
+
+    def check(self, index: int, check: Callable[[], T]) -> Optional[T]:
+        """Run a single-item check (e.g. authorize_owner); record its HTTPException as the item's error."""
+        try:
+            return check()
+        except HTTPException as exc:
+            self.fail(index, exc.status_code, exc.detail)
+            return None
+
+    def fail(self, index: int, status: int, detail: str):
+        self.errors.append(schemas.BulkItemError(index=index, status=status, detail=detail))
+
+    def succeed(self, index: int, item_id: str):
+        self.ids[index] = item_id
+
+    def result(self) -> schemas.BulkResult:
+        return schemas.BulkResult(ids=self.ids, errors=sorted(self.errors, key=lambda error: error.index))
+
+def reject_repeated_ids(outcome: BulkOutcome, ids: Iterable[str]) -> Dict[int, str]:
+    """Items to update keyed by index; every item after the first with the same id fails with 400."""
+    seen = set()
+    accepted = {}
+    for index, item_id in enumerate(ids):
+        if item_id in seen:
+            outcome.fail(index, 400, "Item id appears more than once in the request")
+            continue
+        seen.add(item_id)
+        accepted[index] = item_id
+    return accepted
@@ -0,0 +1,241 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+CompressionMiddleware encodes HTTP responses with brotli (when the optional
+brotli package is installed) or gzip. The body is compressed chunk by chunk as
+the app sends it, so a streamed response never has to be held in memory.
+
+Responses are left alone when:
+- they are smaller than the minimum size
+- they already have a Content-Encoding
+- their media type is not text-like (images, archives and other
+  already-compressed formats)
+- the connection is a WebSocket (those negotiate their own encodings, see
+  ws_encoding)
+
+Bytes in and out and the CPU time spent compressing are counted per route
+template, for /metrics/compression.
+"""
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+DEFAULT_MINIMUM_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+# Quality 4-5 compresses JSON better than gzip -6 at similar CPU cost; 11 is for static assets
+DEFAULT_BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "application/x-ndjson")
+
+def available_encodings() -> List[str]:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+def negotiate_encoding(accept_encoding: Optional[str], supported: Optional[List[str]] = None) -> Optional[str]:
+    """The supported encoding the client prefers (q-values, then server order), or None."""
+    supported = supported or available_encodings()
+    weights: Dict[str, float] = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    candidates = [
+        (weights.get(coding, weights.get("*", 0.0)), -rank, coding)
+        for rank, coding in enumerate(supported)
+    ]
+    weight, _, coding = max(candidates)
+    return coding if weight > 0 else None
+
+def is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) or "+json" in content_type or "+xml" in content_type
+
+class _Encoder:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=brotli_quality)
+            self._compress = compressor.process
+            self._finish = compressor.finish
+        else:
+            # wbits 31: gzip container
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._compress = compressor.compress
+            self._finish = compressor.flush
+        self.cpu_seconds = 0.0
+
+    def compress(self, chunk: bytes) -> bytes:
+        started = time.thread_time()
+        output = self._compress(chunk)
+        self.cpu_seconds += time.thread_time() - started
+        return output
+
+    def finish(self) -> bytes:
+        started = time.thread_time()
+        output = self._finish()
+        self.cpu_seconds += time.thread_time() - started
+        return output
+
+class CompressionMetrics:
+    """Per-route totals of compressed and skipped responses."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, float]] = defaultdict(lambda: {
+            "compressed": 0, "skipped": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0,
+        })
+
+    def record(self, route: str, bytes_in: int, bytes_out: int, cpu_seconds: float):
+        with self._lock:
+            totals = self._routes[route]
+            totals["compressed"] += 1
+            totals["bytes_in"] += bytes_in
+            totals["bytes_out"] += bytes_out
+            totals["cpu_seconds"] += cpu_seconds
+
+    def skip(self, route: str):
+        with self._lock:
+            self._routes[route]["skipped"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            routes = {}
+            for route, totals in sorted(self._routes.items()):
+                compressed = totals["compressed"]
+                routes[route] = {
+                    **totals,
+                    "ratio": totals["bytes_in"] / totals["bytes_out"] if totals["bytes_out"] else 0.0,
+                    "cpu_ms_per_response": totals["cpu_seconds"] * 1000 / compressed if compressed else 0.0,
+                }
+            return {"encodings": available_encodings(), "routes": routes}
+
+compression_metrics = CompressionMetrics()
+
+def _route_of(scope) -> str:
+    """The matched route as a template (/api/tasks/{task_id}), so metrics do not grow with ids."""
+    if scope.get("endpoint") is None:
+        return "unmatched"
+    # Rebuilt from the path: routes of included routers do not carry their prefix
+    names = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join("{%s}" % names[segment] if segment in names else segment for segment in scope["path"].split("/"))
+
+class CompressionMiddleware:
+    """ASGI middleware compressing HTTP responses; see the module docstring."""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: Optional[int] = None,
+        gzip_level: Optional[int] = None,
+        brotli_quality: Optional[int] = None,
+        metrics: CompressionMetrics = compression_metrics,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.getenv("COMPRESSION_MINIMUM_SIZE", DEFAULT_MINIMUM_SIZE))
+        self.gzip_level = gzip_level if gzip_level is not None else int(os.getenv("COMPRESSION_GZIP_LEVEL", DEFAULT_GZIP_LEVEL))
+        self.brotli_quality = brotli_quality if brotli_quality is not None else int(os.getenv("COMPRESSION_BROTLI_QUALITY", DEFAULT_BROTLI_QUALITY))
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponse(self, scope, encoding, send).run(receive)
+
+class _CompressedResponse:
+    """The send() wrapper for one request; decides on the first body chunk whether to compress."""
+
+    def __init__(self, middleware: CompressionMiddleware, scope, encoding: str, send):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self.send = send
+        self.start_message = None
+        self.encoder: Optional[_Encoder] = None
+        # None until decided, then whether the body passes through untouched
+        self.passthrough: Optional[bool] = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def run(self, receive):
+        await self.middleware.app(self.scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        if self.passthrough is None:
+            await self._start(message)
+            if self.passthrough:
+                await self.send(message)
+                return
+        elif self.passthrough:
+            await self.send(message)
+            return
+        await self._compress(message.get("body", b""), message.get("more_body", False))
+
+    async def _start(self, message):
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        route = _route_of(self.scope)
+        self.passthrough = (
+            self.start_message["status"] in (204, 304)
+            or not is_compressible(headers)
+            or (not more_body and len(body) < self.middleware.minimum_size)
+        )
+        if self.passthrough:
+            if is_compressible(headers) or "content-encoding" in headers:
+                self.middleware.metrics.skip(route)
+            await self.send(self.start_message)
+            return
+        self.encoder = _Encoder(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # The length is only known once the last chunk is compressed
+        del headers["Content-Length"]
+        await self.send(self.start_message)
+
+    async def _compress(self, body: bytes, more_body: bool):
+        self.bytes_in += len(body)
+        output = self.encoder.compress(body) if body else b""
+        if not more_body:
+            output += self.encoder.finish()
+        self.bytes_out += len(output)
+        if output or not more_body:
+            await self.send({"type": "http.response.body", "body": output, "more_body": more_body})
+        if not more_body:
+            self.middleware.metrics.record(_route_of(self.scope), self.bytes_in, self.bytes_out, self.encoder.cpu_seconds)
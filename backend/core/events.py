@@ -0,0 +1,76 @@
+import asyncio
+import json
+from typing import Any, Dict, Optional
+
+from anyio import from_thread
+from sqlalchemy.orm import Session
+
+from ..models import models
+from . import websocket_manager
+
+# Topics clients can subscribe to over /ws/{user_id}
+TOPIC_KINDS = ("goal", "sub_goal", "team")
+
+def goal_topic(goal_id: str) -> str:
+    return f"goal:{goal_id}"
+
+def sub_goal_topic(sub_goal_id: str) -> str:
+    return f"sub_goal:{sub_goal_id}"
+
+def team_topic(team_id: str) -> str:
+    return f"team:{team_id}"
+
+# Publishes scheduled from async routes; held so they are not garbage collected mid-flight
+_scheduled_publishes = set()
+
+def authorize_topic(db: Session, user_id: str, topic: str) -> bool:
+    """Check that a user may subscribe to a topic (owns the goal or belongs to the team)."""
+    kind, _, entity_id = topic.partition(":")
+    if not entity_id or kind not in TOPIC_KINDS:
+        return False
+    if kind == "goal":
+        query = db.query(models.Goal.id).filter(models.Goal.id == entity_id, models.Goal.owner_id == user_id)
+    elif kind == "sub_goal":
+        query = db.query(models.SubGoal.id).join(models.Goal, models.SubGoal.goal_id == models.Goal.id).filter(
+            models.SubGoal.id == entity_id, models.Goal.owner_id == user_id
+        )
+    else:
+        query = db.query(models.TeamMember.id).filter(models.TeamMember.team_id == entity_id, models.TeamMember.user_id == user_id)
+    return query.first() is not None
+
+def publish_change(event_type: str, data: Dict[str, Any], goal_id: Optional[str] = None, sub_goal_id: Optional[str] = None, team_id: Optional[str] = None):
+    """
+    Publish a change event to the goal, sub-goal and/or team topics it affects.
+
+    Call after the change is committed. Works from sync routes, which FastAPI runs
+    in a worker thread, by handing the publish to the event loop, and from async
+    routes by scheduling it on the running loop.
+    """
+    topics = []
+    if goal_id:
+        topics.append(goal_topic(goal_id))
+    if sub_goal_id:
+        topics.append(sub_goal_topic(sub_goal_id))
+    if team_id:
+        topics.append(team_topic(team_id))
+    if not topics:
+        return
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    manager = websocket_manager.manager
+    for topic in topics:
+        message = json.dumps({"type": event_type, "topic": topic, "data": data}, default=str)
+        if loop is not None:
+            task = loop.create_task(manager.publish(topic, message))
+            _scheduled_publishes.add(task)
+            task.add_done_callback(_scheduled_publishes.discard)
+            continue
+        try:
+            from_thread.run(manager.publish, topic, message)
+        except RuntimeError:
+            # Not inside a worker thread of a running event loop (e.g. scripts)
+            pass
@@ -0,0 +1,258 @@
+"""
+Conditional GETs and an optional response cache, driven by version stamps.
+
+Reads are grouped into scopes (one user's goals with their sub-goals and tasks,
+one user's preferences, one team's OKRs). Every write to a scope calls touch(),
+which replaces the scope's stamp in resource_versions when the transaction
+commits. A read's ETag is derived from the stamp, the user and the URL, so a
+matching If-None-Match is answered with 304 without loading the data, and with
+RESPONSE_CACHE_SIZE set, repeat reads are served from memory. Either happens only
+after the route has authorized the read: a stamp says nothing about who may
+still see the scope, and may be stale for a while (see below).
+
+Each worker remembers the stamps it has seen for HTTP_CACHE_STAMP_MAX_AGE_SECONDS;
+writes in the same worker apply immediately, writes in other workers are noticed
+once the remembered stamp expires.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from datetime import datetime as dt
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Depends, Header, Request, Response
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..database import get_async_db
+from ..models import models
+from .auth import get_current_user_async
+from .serialization import dumps, trusted
+
+DEFAULT_STAMP_MAX_AGE_SECONDS = 2.0
+DEFAULT_RESPONSE_CACHE_SIZE = 0
+# Stamp of a scope that has not been written since resource_versions was created
+INITIAL_STAMP = "0"
+
+# Session.info keys: scopes touched in the transaction, and their new stamps
+_TOUCHED_KEY = "http_cache_touched"
+_STAMPED_KEY = "http_cache_stamped"
+
+def goals_scope(user_id: str) -> str:
+    """A user's goals, sub-goals and tasks."""
+    return f"goals:{user_id}"
+
+def preferences_scope(user_id: str) -> str:
+    return f"preferences:{user_id}"
+
+def team_scope(team_id: str) -> str:
+    """A team's OKRs and key results, and its membership."""
+    return f"team:{team_id}"
+
+class VersionStamps:
+    """Stamps this worker has read or written recently, each kept for at most max_age seconds."""
+
+    def __init__(self, max_age: float = DEFAULT_STAMP_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._stamps: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        # Bumped by every committed write, so a read that raced one does not
+        # remember the stamp it read over the newer one
+        self.writes = 0
+
+    def get(self, scope: str, now: Optional[float] = None) -> Optional[str]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._stamps.get(scope)
+            if entry is None or entry[1] <= now:
+                self._stamps.pop(scope, None)
+                return None
+            return entry[0]
+
+    def remember_read(self, scope: str, stamp: str, writes: int, now: Optional[float] = None):
+        """Remember a stamp read from the database while self.writes was `writes`."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.max_age > 0 and writes == self.writes:
+                self._stamps[scope] = (stamp, now + self.max_age)
+
+    def remember_write(self, scope: str, stamp: str, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.writes += 1
+            if self.max_age > 0:
+                self._stamps[scope] = (stamp, now + self.max_age)
+
+    def clear(self):
+        with self._lock:
+            self._stamps.clear()
+
+class ResponseCache:
+    """Bounded LRU of serialized 200 responses keyed by (scope, stamp, user, URL)."""
+
+    def __init__(self, max_size: int = DEFAULT_RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[bytes, Dict[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, body: bytes, headers: Dict[str, str]):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            # Entries of replaced stamps are never hit again and age out here
+            self._entries[key] = (body, headers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "not_modified": self.not_modified,
+            }
+
+version_stamps = VersionStamps(max_age=float(os.getenv("HTTP_CACHE_STAMP_MAX_AGE_SECONDS", DEFAULT_STAMP_MAX_AGE_SECONDS)))
+response_cache = ResponseCache(max_size=int(os.getenv("RESPONSE_CACHE_SIZE", DEFAULT_RESPONSE_CACHE_SIZE)))
+
+def touch(db, scope: str):
+    """Mark a scope as changed by the current transaction; works with Session and AsyncSession."""
+    db.info.setdefault(_TOUCHED_KEY, set()).add(scope)
+
+def _upsert_stamp(session: Session, scope: str, stamp: str):
+    table = models.ResourceVersion.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(scope=scope, stamp=stamp, updated_at=dt.utcnow())
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.scope],
+            set_={"stamp": statement.excluded.stamp, "updated_at": statement.excluded.updated_at},
+        ))
+        return
+    if not session.execute(update(table).where(table.c.scope == scope).values(stamp=stamp, updated_at=dt.utcnow())).rowcount:
+        session.execute(table.insert().values(scope=scope, stamp=stamp, updated_at=dt.utcnow()))
+
+@event.listens_for(Session, "before_commit")
+def _write_stamps(session: Session):
+    scopes = session.info.pop(_TOUCHED_KEY, None)
+    if not scopes:
+        return
+    stamped = session.info.setdefault(_STAMPED_KEY, {})
+    for scope in sorted(scopes):
+        stamp = uuid.uuid4().hex[:16]
+        _upsert_stamp(session, scope, stamp)
+        stamped[scope] = stamp
+
+@event.listens_for(Session, "after_commit")
+def _remember_committed_stamps(session: Session):
+    for scope, stamp in session.info.pop(_STAMPED_KEY, {}).items():
+        version_stamps.remember_write(scope, stamp)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_stamps(session: Session):
+    session.info.pop(_TOUCHED_KEY, None)
+    session.info.pop(_STAMPED_KEY, None)
+
+async def current_stamp(db: AsyncSession, scope: str) -> str:
+    stamp = version_stamps.get(scope)
+    if stamp is None:
+        writes = version_stamps.writes
+        stamp = await db.scalar(select(models.ResourceVersion.stamp).where(models.ResourceVersion.scope == scope)) or INITIAL_STAMP
+        version_stamps.remember_read(scope, stamp, writes)
+    return stamp
+
+@dataclass
+class Conditional:
+    """
+    The cache state of one read.
+
+    Routes authorize the read first, then return `hit` when set, else `respond(...)`.
+    Reads of the user's own scope (e.g. their goal list) have nothing to authorize.
+    """
+    etag: str
+    key: str
+    not_modified: bool = False
+
+    @cached_property
+    def hit(self) -> Optional[Response]:
+        """A 304 for a matching If-None-Match, else the cached response, if any."""
+        if self.not_modified:
+            response_cache.count_not_modified()
+            return Response(status_code=304, headers={"ETag": self.etag})
+        cached = response_cache.get(self.key)
+        if cached is None:
+            return None
+        body, headers = cached
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def respond(self, content: Any, response_type=None, headers: Optional[Dict[str, str]] = None) -> Response:
+        """Serialize content (trusted ORM rows as response_type, or plain JSON data) with the ETag, and cache it."""
+        body = dumps(trusted(content, response_type) if response_type is not None else content)
+        headers = {**(headers or {}), "ETag": self.etag}
+        response_cache.put(self.key, body, headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+def conditional_get(scope_of: Callable[[Request, models.User], str]):
+    """
+    Dependency preparing the ETag and cache key of a read in a scope.
+
+    At most one primary-key lookup of the stamp, none while this worker remembers
+    it. Whether the read is answered with 304 or from the cache is left to the
+    route's `conditional.hit`, after its ownership or membership check.
+    """
+    async def dependency(
+        request: Request,
+        if_none_match: Optional[str] = Header(None),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_current_user_async),
+    ) -> Conditional:
+        scope = scope_of(request, current_user)
+        stamp = await current_stamp(db, scope)
+        url = request.url.path + ("?" + request.url.query if request.url.query else "")
+        key = f"{scope}:{stamp}:{current_user.id}:{url}"
+        etag = f'W/"{hashlib.sha1(key.encode()).hexdigest()}"'
+        not_modified = bool(if_none_match) and etag in [tag.strip() for tag in if_none_match.split(",")]
+        return Conditional(etag=etag, key=key, not_modified=not_modified)
+    return dependency
+
+goals_conditional = conditional_get(lambda request, user: goals_scope(user.id))
+preferences_conditional = conditional_get(lambda request, user: preferences_scope(user.id))
+team_conditional = conditional_get(lambda request, user: team_scope(request.path_params["team_id"]))
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+from datetime import datetime as dt
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from ..models import models
+from .events import publish_change
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Session.info key holding change events to publish once the transaction commits
+_PENDING_KEY = "outbox_pending_publishes"
+
+OutboxHandler = Callable[[Session, List[models.OutboxEvent]], None]
+
+def record_change(db: Session, event_type: str, data: Dict[str, Any], goal_id: Optional[str] = None, sub_goal_id: Optional[str] = None, team_id: Optional[str] = None, user_id: Optional[str] = None):
+    """
+    Append a change to the outbox in the caller's transaction.
+
+    The row commits or rolls back together with the change itself. Once the
+    transaction commits, the event is also pushed to the WebSocket subscribers of
+    its goal, sub-goal and team topics.
+    """
+    db.add(models.OutboxEvent(
+        event_type=event_type,
+        aggregate_type=event_type.split(".", 1)[0],
+        aggregate_id=str(data["id"]) if data.get("id") is not None else None,
+        user_id=user_id,
+        goal_id=goal_id,
+        sub_goal_id=sub_goal_id,
+        team_id=team_id,
+        payload=json.dumps(data, default=str),
+        created_at=dt.utcnow(),
+    ))
+    db.info.setdefault(_PENDING_KEY, []).append((event_type, data, goal_id, sub_goal_id, team_id))
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_changes(session: Session):
+    for event_type, data, goal_id, sub_goal_id, team_id in session.info.pop(_PENDING_KEY, ()):
+        publish_change(event_type, data, goal_id=goal_id, sub_goal_id=sub_goal_id, team_id=team_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_changes(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+
+def get_offset(db: Session, consumer: str) -> int:
+    """Sequence number of the last event the consumer has processed (0 for a new consumer)."""
+    checkpoint = db.get(models.OutboxCheckpoint, consumer)
+    if checkpoint is None:
+        checkpoint = models.OutboxCheckpoint(consumer=consumer, last_seq=0)
+        db.add(checkpoint)
+        db.flush()
+    return checkpoint.last_seq
+
+def read_changes(db: Session, after_seq: int, limit: int = DEFAULT_BATCH_SIZE) -> List[models.OutboxEvent]:
+    """
+    Events with a sequence number above after_seq, oldest first.
+
+    An offset is only safe if events become visible in sequence order. SQLite
+    has a single writer, so a sequence number is assigned and committed before
+    the next one is. With concurrent writers (e.g. PostgreSQL) a transaction
+    holding a lower number can commit after a higher one has been read, and a
+    consumer past it never sees that event.
+    """
+    return (
+        db.query(models.OutboxEvent)
+        .filter(models.OutboxEvent.seq > after_seq)
+        .order_by(models.OutboxEvent.seq)
+        .limit(limit)
+        .all()
+    )
+
+def consume(db: Session, consumer: str, handler: OutboxHandler, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Hand the consumer's next batch of events to `handler` and advance its checkpoint.
+
+    The handler's writes and the new checkpoint commit in one transaction: a
+    failing handler rolls both back and the batch is retried, and if another
+    process advanced the checkpoint first the batch is discarded. On SQLite this
+    makes database side effects happen exactly once per event. On databases with
+    concurrent writers an event can be skipped (see read_changes), so there they
+    are at-most-once. Side effects outside the database (e.g. WebSocket pushes)
+    may repeat on retry. Returns the number of events processed.
+    """
+    try:
+        offset = get_offset(db, consumer)
+        events = read_changes(db, offset, batch_size)
+        if not events:
+            db.commit()
+            return 0
+        handler(db, events)
+        advanced = (
+            db.query(models.OutboxCheckpoint)
+            .filter(models.OutboxCheckpoint.consumer == consumer, models.OutboxCheckpoint.last_seq == offset)
+            .update({"last_seq": events[-1].seq, "updated_at": dt.utcnow()}, synchronize_session=False)
+        )
+        if advanced != 1:
+            db.rollback()
+            logger.info("Outbox consumer %s lost its checkpoint race at seq %s", consumer, offset)
+            return 0
+        db.commit()
+        return len(events)
+    except Exception:
+        db.rollback()
+        raise
+
+async def run_consumer(session_factory, consumer: str, handler: OutboxHandler, batch_size: int = DEFAULT_BATCH_SIZE, poll_interval: float = DEFAULT_POLL_INTERVAL):
+    """Tail the outbox forever, polling when caught up; the handler runs in a worker thread."""
+    def step() -> int:
+        db = session_factory()
+        try:
+            return consume(db, consumer, handler, batch_size)
+        finally:
+            db.close()
+
+    while True:
+        try:
+            processed = await asyncio.to_thread(step)
+        except Exception:
+            logger.exception("Outbox consumer %s failed; retrying", consumer)
+            processed = 0
+        if processed < batch_size:
+            await asyncio.sleep(poll_interval)
+
+def prune_consumed(db: Session) -> int:
+    """Delete events every registered consumer has processed."""
+    low_water = db.query(func.min(models.OutboxCheckpoint.last_seq)).scalar()
+    if not low_water:
+        return 0
+    deleted = db.query(models.OutboxEvent).filter(models.OutboxEvent.seq <= low_water).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -0,0 +1,139 @@
+import base64
+import datetime
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BooleanClauseList
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class PageParams:
+    """`?limit=&cursor=` of a keyset-paginated list route; use as `page: PageParams = Depends()`."""
+
+    def __init__(self, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+        self.limit = limit
+        self.cursor = cursor
+
+def next_cursor_headers(next_cursor: Optional[str]) -> Dict[str, str]:
+    """The X-Next-Cursor header carrying the next page's cursor (none on the last page)."""
+    return {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    response.headers.update(next_cursor_headers(next_cursor))
+
+def encode_cursor(sort_value: Any, row_id: str) -> str:
+    """Encode the (sort_key, id) of the last row of a page as an opaque cursor."""
+    if isinstance(sort_value, (datetime.datetime, datetime.date)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return sort_value, row_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _coerce_sort_value(sort_column, value):
+    # Cursors carry dates as ISO strings; compare them as the column's type
+    if value is None:
+        return None
+    python_type = sort_column.type.python_type
+    try:
+        if python_type is datetime.datetime:
+            return datetime.datetime.fromisoformat(value)
+        if python_type is datetime.date:
+            return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value
+
+# Conditions on the sort column that no NULL satisfies (is_not: IS NOT NULL)
+NULL_REJECTING = {operators.eq, operators.lt, operators.le, operators.gt, operators.ge, operators.is_not}
+
+def _may_have_nulls(query, sort_column) -> bool:
+    """Whether rows with a NULL sort key can match: the column is nullable and the query does not already exclude NULLs."""
+    column = sort_column.expression
+    if not getattr(column, "nullable", True):
+        return False
+    where = query.whereclause
+    if where is None:
+        return True
+    conditions = where.clauses if isinstance(where, BooleanClauseList) and where.operator is operators.and_ else [where]
+    return not any(
+        isinstance(condition, BinaryExpression) and condition.operator in NULL_REJECTING and condition.left.compare(column)
+        for condition in conditions
+    )
+
+def _keyset_queries(query, sort_column, id_column, cursor: Optional[str], descending: bool) -> List[Any]:
+    """
+    The queries of one page, to run in order until the page is full.
+
+    Rows without a sort key come after every row with one, in id order. They
+    are read by a second query (sort_column IS NULL) instead of NULLS LAST, so
+    both queries read the (..., sort_column, id) indexes in order whatever side
+    the database sorts NULLs to. A cursor on such a row carries a null sort key.
+    """
+    # Works on both ORM Query objects and select() statements
+    order = (sort_column.desc(), id_column.desc()) if descending else (sort_column.asc(), id_column.asc())
+    sort_value, row_id = decode_cursor(cursor) if cursor else (None, None)
+    if cursor:
+        after_id = id_column < row_id if descending else id_column > row_id
+
+    nulls = _may_have_nulls(query, sort_column)
+    queries = []
+    if cursor is None or sort_value is not None:
+        keyed = query.filter(sort_column.is_not(None)) if nulls else query
+        if cursor:
+            sort_value = _coerce_sort_value(sort_column, sort_value)
+            after_sort = sort_column < sort_value if descending else sort_column > sort_value
+            keyed = keyed.filter(or_(after_sort, and_(sort_column == sort_value, after_id)))
+        queries.append(keyed.order_by(*order))
+    if nulls:
+        unkeyed = query.filter(sort_column.is_(None))
+        if cursor and sort_value is None:
+            unkeyed = unkeyed.filter(after_id)
+        queries.append(unkeyed.order_by(order[1]))
+    return queries
+
+def _split_page(rows: List[Any], sort_column, id_column, limit: int) -> Tuple[List[Any], Optional[str]]:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
+
+def keyset_page(query, sort_column, id_column, cursor: Optional[str], limit: int, descending: bool = True) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of `query` ordered by (sort_column, id_column).
+
+    Rows after the cursor are selected with a range predicate instead of OFFSET,
+    so every page costs the same index seek. Rows whose sort key is NULL follow
+    all the others. Returns the rows and the cursor of the next page (None on
+    the last page).
+    """
+    rows = []
+    for page_query in _keyset_queries(query, sort_column, id_column, cursor, descending):
+        # One extra row tells whether another page exists
+        rows.extend(page_query.limit(limit + 1 - len(rows)).all())
+        if len(rows) > limit:
+            break
+    return _split_page(rows, sort_column, id_column, limit)
+
+async def keyset_page_async(db: AsyncSession, statement, sort_column, id_column, cursor: Optional[str], limit: int, descending: bool = True) -> Tuple[List[Any], Optional[str]]:
+    """keyset_page for a select() of one entity, run on an AsyncSession."""
+    rows = []
+    for page_query in _keyset_queries(statement, sort_column, id_column, cursor, descending):
+        rows.extend((await db.scalars(page_query.limit(limit + 1 - len(rows)))).all())
+        if len(rows) > limit:
+            break
+    return _split_page(rows, sort_column, id_column, limit)
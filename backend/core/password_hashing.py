@@ -0,0 +1,106 @@
+"""
+bcrypt hashing off the event loop and off the request threadpool.
+
+Each hash or verify costs hundreds of milliseconds of CPU, so it runs in a
+dedicated process pool (one worker per core by default). At most
+PASSWORD_HASH_MAX_PENDING operations may be queued or running; beyond that
+requests are shed with 503 and Retry-After instead of queueing behind a login
+burst.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+DEFAULT_ROUNDS = 12
+
+def bcrypt_rounds() -> int:
+    return int(os.getenv("BCRYPT_ROUNDS", DEFAULT_ROUNDS))
+
+def build_context(rounds: int) -> CryptContext:
+    # Hashes with any other cost are flagged by needs_update and rehashed on login
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+# Per process: the API process for inline use, each pool worker for its jobs
+_contexts = {}
+
+def _context(rounds: int) -> CryptContext:
+    context = _contexts.get(rounds)
+    if context is None:
+        context = _contexts[rounds] = build_context(rounds)
+    return context
+
+def hash_password(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+def verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """Whether the password matches, and a replacement hash if the stored one uses another cost."""
+    return _context(rounds).verify_and_update(password, hashed_password)
+
+class PasswordHasher:
+    """Bounded process pool for password hashing, with load shedding."""
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None, rounds: Optional[int] = None):
+        self.workers = workers or int(os.getenv("PASSWORD_HASH_WORKERS", 0)) or os.cpu_count() or 1
+        self.max_pending = max_pending or int(os.getenv("PASSWORD_HASH_MAX_PENDING", 0)) or self.workers * 8
+        self.rounds = rounds or bcrypt_rounds()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.shed = 0
+
+    def start(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that runs threads (event loop, DB drivers) is unsafe
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def stop(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _run(self, function, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.shed += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many sign-ins in progress, retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        try:
+            executor = self._executor or self.start()
+            return await asyncio.wrap_future(executor.submit(function, *args))
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(verify_and_update, password, hashed_password, self.rounds)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "shed": self.shed,
+            }
+
+password_hasher = PasswordHasher()
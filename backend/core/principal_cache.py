@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+DEFAULT_MAX_SIZE = 10_000
+# Upper bound on how stale a snapshot can get in other worker processes,
+# which do not see this process's invalidations
+DEFAULT_MAX_AGE_SECONDS = 300
+
+@dataclass(frozen=True)
+class Principal:
+    """The fields of a User that request handlers read, as an immutable snapshot."""
+    id: str
+    email: str
+    is_active: bool
+    daily_start_hour: int
+    daily_end_hour: int
+    tier: str
+    goal_limit: int
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=user.is_active,
+            daily_start_hour=user.daily_start_hour,
+            daily_end_hour=user.daily_end_hour,
+            tier=user.tier,
+            goal_limit=user.goal_limit,
+        )
+
+class PrincipalCache:
+    """
+    Bounded LRU of authenticated principals, keyed by a digest of the bearer token.
+
+    A hit skips both JWT verification and the user lookup. Entries live until the
+    token expires (capped at max_age) and are dropped when the user changes.
+    Raw tokens are never stored.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, max_age: float = DEFAULT_MAX_AGE_SECONDS):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a lookup that started before it cannot
+        # cache the snapshot it read
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str, now: Optional[float] = None) -> Optional[Principal]:
+        key = self.key(token)
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, principal: Principal, expires_at: float, version: int, now: Optional[float] = None):
+        """Cache a principal loaded while the cache was at `version` (see self.version)."""
+        now = time.time() if now is None else now
+        expires_at = min(expires_at, now + self.max_age)
+        key = self.key(token)
+        with self._lock:
+            if version != self.version or expires_at <= now or self.max_size <= 0:
+                return
+            self._entries[key] = (principal, expires_at)
+            self._entries.move_to_end(key)
+            self._keys_by_user.setdefault(principal.id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: str):
+        """Forget every cached token of a user, e.g. after their profile changed."""
+        with self._lock:
+            self.version += 1
+            self.invalidations += 1
+            for key in self._keys_by_user.pop(user_id, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: str):
+        principal, _ = self._entries.pop(key)
+        keys = self._keys_by_user.get(principal.id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[principal.id]
+
+principal_cache = PrincipalCache(
+    max_size=int(os.getenv("AUTH_CACHE_SIZE", DEFAULT_MAX_SIZE)),
+    max_age=float(os.getenv("AUTH_CACHE_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS)),
+)
@@ -0,0 +1,124 @@
+"""
+Denormalized progress counters on sub-goals and goals.
+
+SubGoal.total_tasks/done_tasks count the sub-goal's tasks, and Goal's counters
+sum those of its sub-goals, so progress for any list of goals is a column read.
+Every path that creates, deletes, moves or (un)completes a task applies the
+change as relative UPDATEs in the same transaction, which keeps concurrent
+writers from overwriting each other's counts. recompute_progress rebuilds the
+counters from the tasks table if they ever drift.
+
+Usage:
+    python -m backend.core.progress
+"""
+import argparse
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models import models
+
+DONE = "done"
+
+# (sub_goal_id, is_done) of a task, or None when it counts towards no sub-goal
+TaskProgress = Optional[Tuple[str, bool]]
+
+def task_progress(task) -> TaskProgress:
+    """What a task contributes to the counters; take it before and after changing the task."""
+    if not task.sub_goal_id:
+        return None
+    return task.sub_goal_id, task.status == DONE
+
+def progress_deltas(changes: Iterable[Tuple[TaskProgress, TaskProgress]]) -> Dict[str, Tuple[int, int]]:
+    """Net (total, done) change per sub-goal for (before, after) pairs; None means absent."""
+    deltas = defaultdict(lambda: [0, 0])
+    for before, after in changes:
+        if before == after:
+            continue
+        if before is not None:
+            deltas[before[0]][0] -= 1
+            deltas[before[0]][1] -= before[1]
+        if after is not None:
+            deltas[after[0]][0] += 1
+            deltas[after[0]][1] += after[1]
+    return {sub_goal_id: (total, done) for sub_goal_id, (total, done) in deltas.items() if total or done}
+
+def _shift(model, condition, total: int, done: int):
+    return update(model).where(condition).values(
+        total_tasks=model.total_tasks + total,
+        done_tasks=model.done_tasks + done,
+    )
+
+def progress_statements(changes: Iterable[Tuple[TaskProgress, TaskProgress]]) -> List:
+    """UPDATEs applying the net effect of task changes to their sub-goals and goals."""
+    statements = []
+    for sub_goal_id, (total, done) in progress_deltas(changes).items():
+        statements.append(_shift(models.SubGoal, models.SubGoal.id == sub_goal_id, total, done))
+        parent_goal_id = select(models.SubGoal.goal_id).where(models.SubGoal.id == sub_goal_id).scalar_subquery()
+        statements.append(_shift(models.Goal, models.Goal.id == parent_goal_id, total, done))
+    return statements
+
+def goal_progress_statements(goal_id: Optional[str], total: int, done: int) -> List:
+    """UPDATE moving a whole sub-goal's counts onto (positive) or off (negative) a goal."""
+    if not goal_id or not (total or done):
+        return []
+    return [_shift(models.Goal, models.Goal.id == goal_id, total, done)]
+
+def apply_progress(db: Session, statements: List):
+    for statement in statements:
+        db.execute(statement)
+
+async def apply_progress_async(db: AsyncSession, statements: List):
+    for statement in statements:
+        await db.execute(statement)
+
+def recompute_progress(db: Session) -> Dict[str, int]:
+    """
+    Rebuild every counter from the tasks table, in two bulk UPDATEs.
+
+    Only rows whose counters drifted are written; their counts are returned.
+    The caller commits.
+    """
+    task = models.Task
+    total = select(func.count(task.id)).where(task.sub_goal_id == models.SubGoal.id).scalar_subquery()
+    done = select(func.count(task.id)).where(and_(task.sub_goal_id == models.SubGoal.id, task.status == DONE)).scalar_subquery()
+    sub_goals = db.execute(
+        update(models.SubGoal)
+        .where(or_(models.SubGoal.total_tasks != total, models.SubGoal.done_tasks != done))
+        .values(total_tasks=total, done_tasks=done)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    sub_goal = models.SubGoal
+    goal_total = select(func.coalesce(func.sum(sub_goal.total_tasks), 0)).where(sub_goal.goal_id == models.Goal.id).scalar_subquery()
+    goal_done = select(func.coalesce(func.sum(sub_goal.done_tasks), 0)).where(sub_goal.goal_id == models.Goal.id).scalar_subquery()
+    goals = db.execute(
+        update(models.Goal)
+        .where(or_(models.Goal.total_tasks != goal_total, models.Goal.done_tasks != goal_done))
+        .values(total_tasks=goal_total, done_tasks=goal_done)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    # Loaded objects may hold the old counts
+    db.expire_all()
+    return {"sub_goals": sub_goals, "goals": goals}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute the task counters of every sub-goal and goal.")
+    parser.parse_args(argv)
+
+    from ..database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        repaired = recompute_progress(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Repaired {repaired['sub_goals']} sub-goals and {repaired['goals']} goals")
+    return repaired
+
+if __name__ == "__main__":
+    main()
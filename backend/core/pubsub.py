@@ -0,0 +1,237 @@
+import abc
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (user_id, message, coalesce_key, topic); user_id and topic are both None for a broadcast
+Envelope = Tuple[Optional[str], str, Optional[str], Optional[str]]
+DeliverCallback = Callable[[List[Envelope]], Awaitable[None]]
+
+DEFAULT_FLUSH_INTERVAL = 0.005
+DEFAULT_MAX_BATCH = 500
+
+class PubSubBackend(abc.ABC):
+    """
+    Carries WebSocket messages between worker processes.
+
+    Publishes are buffered and sent as one batch every few milliseconds (or as
+    soon as max_batch messages are waiting). Every worker receives every batch
+    except its own and delivers the messages to the sockets it holds.
+    """
+
+    def __init__(self, flush_interval: float = DEFAULT_FLUSH_INTERVAL, max_batch: int = DEFAULT_MAX_BATCH):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._deliver: Optional[DeliverCallback] = None
+        self._buffer: List[Envelope] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self.messages_published = 0
+        self.batches_published = 0
+        self.messages_received = 0
+
+    async def start(self, deliver: DeliverCallback):
+        self._deliver = deliver
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def publish(self, user_id: Optional[str], message: str, coalesce_key: Optional[str] = None, topic: Optional[str] = None):
+        self._buffer.append((user_id, message, coalesce_key, topic))
+        if len(self._buffer) >= self.max_batch:
+            batch, self._buffer = self._buffer, []
+            asyncio.ensure_future(self._send(batch))
+        elif self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_after(self.flush_interval))
+
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(delay)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            await self._send(batch)
+
+    async def _send(self, batch: List[Envelope]):
+        try:
+            await self._send_batch(batch)
+            self.messages_published += len(batch)
+            self.batches_published += 1
+        except Exception:
+            logger.exception("Pub/sub publish failed (%d messages)", len(batch))
+
+    @abc.abstractmethod
+    async def _send_batch(self, batch: List[Envelope]):
+        """Send one batch to every other worker."""
+
+    async def _receive(self, batch: List[Envelope]):
+        self.messages_received += len(batch)
+        if self._deliver is not None:
+            await self._deliver(batch)
+
+    def metrics(self) -> dict:
+        return {
+            "pubsub_messages_published": self.messages_published,
+            "pubsub_batches_published": self.batches_published,
+            "pubsub_messages_received": self.messages_received,
+        }
+
+class SQLiteBackend(PubSubBackend):
+    """
+    Shared-SQLite message bus for workers on one host; needs no external service.
+
+    Batches are appended to a WAL-mode table and every worker tails it by
+    sequence number. Old rows are pruned after `retention_seconds`.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.02, retention_seconds: float = 60.0, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._last_seq = 0
+        self._last_prune = 0.0
+        self._poller: Optional[asyncio.Task] = None
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS ws_messages ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn = conn
+        self._last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM ws_messages").fetchone()[0]
+
+    async def start(self, deliver: DeliverCallback):
+        await super().start(deliver)
+        await asyncio.to_thread(self._open)
+        self._poller = asyncio.ensure_future(self._poll())
+
+    async def stop(self):
+        await super().stop()
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _insert(self, payload: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ws_messages (origin, payload, created_at) VALUES (?, ?, ?)",
+                (self.origin, payload, time.time()),
+            )
+
+    async def _send_batch(self, batch: List[Envelope]):
+        # One row per batch keeps the cross-process cost to a single insert
+        await asyncio.to_thread(self._insert, json.dumps(batch))
+
+    def _fetch(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, origin, payload FROM ws_messages WHERE seq > ? ORDER BY seq LIMIT 1000",
+                (self._last_seq,),
+            ).fetchall()
+            now = time.time()
+            if now - self._last_prune > self.retention_seconds:
+                self._conn.execute("DELETE FROM ws_messages WHERE created_at < ?", (now - self.retention_seconds,))
+                self._last_prune = now
+        return rows
+
+    async def _poll(self):
+        while True:
+            try:
+                rows = await asyncio.to_thread(self._fetch)
+                for seq, origin, payload in rows:
+                    self._last_seq = seq
+                    if origin != self.origin:
+                        await self._receive([tuple(envelope) for envelope in json.loads(payload)])
+                if len(rows) < 1000:
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Pub/sub poll failed")
+                await asyncio.sleep(1.0)
+
+class RedisBackend(PubSubBackend):
+    """Redis-compatible pub/sub channel shared by all workers (requires the `redis` package)."""
+
+    def __init__(self, url: str, channel: str = "pathcraft:ws", **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.channel = channel
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: DeliverCallback):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("The redis pub/sub backend requires the 'redis' package")
+        await super().start(deliver)
+        self._redis = redis.from_url(self.url)
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.ensure_future(self._listen())
+
+    async def stop(self):
+        await super().stop()
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+        if self._redis is not None:
+            await self._redis.close()
+
+    async def _send_batch(self, batch: List[Envelope]):
+        await self._redis.publish(self.channel, json.dumps({"origin": self.origin, "messages": batch}))
+
+    async def _listen(self):
+        async for item in self._pubsub.listen():
+            if item.get("type") != "message":
+                continue
+            try:
+                data = json.loads(item["data"])
+                if data["origin"] != self.origin:
+                    await self._receive([tuple(envelope) for envelope in data["messages"]])
+            except Exception:
+                logger.exception("Pub/sub message dropped")
+
+def create_backend(kind: Optional[str] = None, url: Optional[str] = None) -> Optional[PubSubBackend]:
+    """
+    Build the pub/sub backend configured by WS_PUBSUB_BACKEND / WS_PUBSUB_URL.
+
+    SQLite (the default) relays messages between the workers of one host through
+    a shared file; redis also spans hosts, and none keeps messages in this process.
+    """
+    kind = (kind or os.getenv("WS_PUBSUB_BACKEND", "sqlite")).lower()
+    url = url or os.getenv("WS_PUBSUB_URL")
+    if kind in ("", "none", "local"):
+        return None
+    if kind == "sqlite":
+        return SQLiteBackend(url or "./pathcraft_ws_bus.db")
+    if kind == "redis":
+        return RedisBackend(url or "redis://localhost:6379/0")
+    raise ValueError(f"Unknown WebSocket pub/sub backend: {kind}")
@@ -0,0 +1,103 @@
+"""
+Fast JSON responses for rows read from our own database.
+
+FastAPI validates a route's return value against its response_model (reading
+ORM attributes one by one through from_attributes) before encoding it. For rows
+we just loaded that validation can never fail, so trusted() copies the schema's
+fields off the ORM rows into plain dicts without running validators, and
+ORJSONResponse encodes them with orjson, which writes datetimes, dates and
+UUIDs natively. Only the schema's public model_fields are read, so nothing
+depends on how Pydantic lays out its model instances.
+
+Routes opt in by returning ORJSONResponse(trusted(rows, schema), headers=...);
+their response_model still documents the body. Use it only for ORM rows or
+already validated data: values are not coerced to the schema's types.
+"""
+import operator
+import typing
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+def _model_schema(annotation) -> Tuple[Optional[type], bool]:
+    """(schema, is_list) of a field annotated with a model, List[model] or Optional[...] of those."""
+    origin = typing.get_origin(annotation)
+    if origin in (list, typing.List):
+        schema, _ = _model_schema(typing.get_args(annotation)[0])
+        return schema, schema is not None
+    if origin is typing.Union:
+        for argument in typing.get_args(annotation):
+            schema, many = _model_schema(argument)
+            if schema is not None:
+                return schema, many
+        return None, False
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None, False
+
+class _Plan:
+    """How to copy one schema's fields off an ORM object into a dict."""
+
+    def __init__(self, schema: type):
+        self.fields = tuple(schema.model_fields)
+        # Loaded ORM attributes live in the instance __dict__; reading them there
+        # skips SQLAlchemy's instrumented descriptors
+        self.loaded = operator.itemgetter(*self.fields)
+        self.attributes = operator.attrgetter(*self.fields)
+        if len(self.fields) == 1:
+            self.loaded = lambda values, get=self.loaded: (get(values),)
+            self.attributes = lambda row, get=self.attributes: (get(row),)
+        self.nested: Dict[str, Tuple[type, bool]] = {}
+        for name, field in schema.model_fields.items():
+            nested_schema, many = _model_schema(field.annotation)
+            if nested_schema is not None:
+                self.nested[name] = (nested_schema, many)
+
+    def build(self, row) -> Dict[str, Any]:
+        if isinstance(row, BaseModel):
+            return row.model_dump()
+        try:
+            values = dict(zip(self.fields, self.loaded(row.__dict__)))
+        except (AttributeError, KeyError):
+            # Expired or unloaded attributes, or not an ORM object
+            values = dict(zip(self.fields, self.attributes(row)))
+        for name, (schema, many) in self.nested.items():
+            value = values[name]
+            if value is not None:
+                values[name] = [_plan(schema).build(item) for item in value] if many else _plan(schema).build(value)
+        return values
+
+@lru_cache(maxsize=None)
+def _plan(schema: type) -> _Plan:
+    return _Plan(schema)
+
+def trusted(content: Any, schema) -> Any:
+    """The JSON-ready dicts of schema (which may also be List[model]) for trusted ORM rows, skipping validation."""
+    item_schema, many = _model_schema(schema)
+    if item_schema is None:
+        raise TypeError(f"{schema!r} is not a Pydantic model or a list of them")
+    plan = _plan(item_schema)
+    if content is None:
+        return None
+    if many or isinstance(content, (list, tuple)):
+        return [plan.build(row) for row in content]
+    return plan.build(content)
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson; use it with trusted() dicts or plain JSON data (Pydantic models are dumped first)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,27 +1,355 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set
+
 from fastapi import WebSocket
 
+from .pubsub import Envelope, PubSubBackend, create_backend
+from .ws_encoding import TEXT, encode_frame, negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+# Per-connection outbound queue bound and what to do when a slow client fills it:
+# "coalesce" replaces a queued message with the same coalesce key (or drops the
+# oldest queued message), "disconnect" closes the slow client.
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_SEND_TIMEOUT = 10.0
+OVERFLOW_POLICIES = ("coalesce", "disconnect")
+
+# Batching connections (any negotiated encoding other than text) wait this long
+# after the first queued message before writing, so a burst leaves as one frame;
+# a frame is written early once batch_size messages are waiting
+DEFAULT_FLUSH_INTERVAL = 0.005
+DEFAULT_BATCH_SIZE = 32
+
+# Connections that send nothing (not even a pong) for heartbeat_interval seconds
+# are pinged; after another heartbeat_timeout seconds they are evicted
+DEFAULT_HEARTBEAT_INTERVAL = 30.0
+DEFAULT_HEARTBEAT_TIMEOUT = 30.0
+PING_MESSAGE = json.dumps({"type": "ping"})
+CLOSE_GOING_AWAY = 1001
+
+class SendStats:
+    """Send rates over a sliding window plus a sample of recent send latencies."""
+
+    def __init__(self, window_seconds: int = 10, latency_samples: int = 1024):
+        self.window_seconds = window_seconds
+        self._buckets: deque = deque()  # [second, messages, bytes]
+        self.latencies: deque = deque(maxlen=latency_samples)
+
+    def _prune(self, now: int):
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            self._buckets.popleft()
+
+    def record(self, messages: int, nbytes: int, now: float):
+        second = int(now)
+        if self._buckets and self._buckets[-1][0] == second:
+            bucket = self._buckets[-1]
+            bucket[1] += messages
+            bucket[2] += nbytes
+        else:
+            self._buckets.append([second, messages, nbytes])
+            self._prune(second)
+
+    def rates(self) -> Dict[str, float]:
+        self._prune(int(time.monotonic()))
+        return {
+            "messages_per_second": sum(bucket[1] for bucket in self._buckets) / self.window_seconds,
+            "bytes_per_second": sum(bucket[2] for bucket in self._buckets) / self.window_seconds,
+        }
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        """Queue-to-wire latency of recent messages, in milliseconds."""
+        samples = sorted(self.latencies)
+        result = {}
+        for percentile in (50, 90, 99):
+            value = samples[min(len(samples) - 1, len(samples) * percentile // 100)] if samples else 0.0
+            result[f"send_latency_ms_p{percentile}"] = round(value * 1000, 3)
+        return result
+
+class Connection:
+    """One client socket with its bounded outbound queue."""
+
+    # Slots keep idle connections small; the writer task only exists while the
+    # queue is non-empty, so idle sockets cost no task at all
+    __slots__ = ("websocket", "user_id", "encoding", "queue", "writer", "flush_timer", "topics", "last_seen")
+
+    def __init__(self, websocket: WebSocket, user_id: str, encoding: str = TEXT):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.encoding = encoding
+        self.queue: deque = deque()  # (message, coalesce_key, enqueued_at) tuples
+        self.writer: Optional[asyncio.Task] = None
+        self.flush_timer: Optional[asyncio.TimerHandle] = None
+        self.topics: Optional[Set[str]] = None  # Created on first subscribe
+        self.last_seen = time.monotonic()  # Last frame received from the client
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[str, WebSocket] = {}
+    def __init__(self, max_queue: int = DEFAULT_MAX_QUEUE, overflow_policy: str = "coalesce", send_timeout: float = DEFAULT_SEND_TIMEOUT, backend: Optional[PubSubBackend] = None, flush_interval: float = DEFAULT_FLUSH_INTERVAL, batch_size: int = DEFAULT_BATCH_SIZE, heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL, heartbeat_timeout: float = DEFAULT_HEARTBEAT_TIMEOUT):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        # Optional pub/sub bridge so messages reach sockets held by other workers
+        self.backend = backend
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self._reaper: Optional[asyncio.Task] = None
+        self.active_connections: Dict[str, Dict[WebSocket, Connection]] = {}
+        self.topic_subscribers: Dict[str, Set[Connection]] = {}
+        self.stats = SendStats()
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.send_failures = 0
+        self.pings_sent = 0
+        self.connections_reaped = 0
+        self.messages_dropped = 0
+        self.messages_coalesced = 0
+        self.slow_consumers_disconnected = 0
 
-    async def connect(self, user_id: str, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-        print(f"WebSocket connected for user: {user_id}")
+    async def start(self):
+        if self.backend is not None:
+            await self.backend.start(self.deliver_remote)
+        if self.heartbeat_interval > 0 and self._reaper is None:
+            self._reaper = asyncio.ensure_future(self._reap_forever())
 
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-            print(f"WebSocket disconnected for user: {user_id}")
+    async def stop(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        if self.backend is not None:
+            await self.backend.stop()
 
-    async def send_personal_message(self, message: str, user_id: str):
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_text(message)
+    async def connect(self, websocket: WebSocket, user_id: str) -> Connection:
+        # The client lists the frame encodings it understands as subprotocols
+        encoding, subprotocol = negotiate_encoding(websocket.scope.get("subprotocols", []))
+        if subprotocol is not None:
+            await websocket.accept(subprotocol=subprotocol)
         else:
-            print(f"User {user_id} not connected via WebSocket.")
+            await websocket.accept()
+        connection = Connection(websocket, user_id, encoding)
+        self.active_connections.setdefault(user_id, {})[websocket] = connection
+        self.connections_opened += 1
+        return connection
+
+    def touch(self, connection: Connection):
+        """Record that the client is alive (any received frame, including pongs)."""
+        connection.last_seen = time.monotonic()
+
+    def reap_idle(self, now: Optional[float] = None) -> int:
+        """Ping quiet connections and evict the ones that missed the heartbeat timeout."""
+        now = time.monotonic() if now is None else now
+        reaped = 0
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections.values()):
+                idle = now - connection.last_seen
+                if idle >= self.heartbeat_interval + self.heartbeat_timeout:
+                    logger.info("Evicting unresponsive WebSocket for user %s (idle %.0fs)", connection.user_id, idle)
+                    self.disconnect(connection.websocket, connection.user_id)
+                    asyncio.ensure_future(self._close(connection.websocket, code=CLOSE_GOING_AWAY))
+                    reaped += 1
+                elif idle >= self.heartbeat_interval:
+                    self._enqueue(connection, PING_MESSAGE, coalesce_key="ping")
+                    self.pings_sent += 1
+        self.connections_reaped += reaped
+        return reaped
+
+    async def _reap_forever(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                self.reap_idle()
+            except Exception:
+                logger.exception("WebSocket reaper failed")
+
+    def disconnect(self, websocket: WebSocket, user_id: str):
+        connections = self.active_connections.get(user_id)
+        if not connections:
+            return
+        connection = connections.pop(websocket, None)
+        if not connections:
+            del self.active_connections[user_id]
+        if connection is not None:
+            for topic in connection.topics or ():
+                self._remove_subscriber(topic, connection)
+            connection.queue.clear()
+            if connection.flush_timer is not None:
+                connection.flush_timer.cancel()
+                connection.flush_timer = None
+            if connection.writer is not None and connection.writer is not asyncio.current_task():
+                connection.writer.cancel()
+
+    def subscribe(self, connection: Connection, topic: str):
+        if connection.topics is None:
+            connection.topics = set()
+        connection.topics.add(topic)
+        self.topic_subscribers.setdefault(topic, set()).add(connection)
+
+    def unsubscribe(self, connection: Connection, topic: str):
+        if connection.topics:
+            connection.topics.discard(topic)
+        self._remove_subscriber(topic, connection)
+
+    def _remove_subscriber(self, topic: str, connection: Connection):
+        subscribers = self.topic_subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.topic_subscribers[topic]
+
+    def _enqueue(self, connection: Connection, message: str, coalesce_key: Optional[str] = None):
+        if len(connection.queue) >= self.max_queue:
+            if self.overflow_policy == "disconnect":
+                self.slow_consumers_disconnected += 1
+                self.messages_dropped += len(connection.queue) + 1
+                self.disconnect(connection.websocket, connection.user_id)
+                asyncio.ensure_future(self._close(connection.websocket, code=1013))
+                return
+            if coalesce_key is not None:
+                for index, (_, queued_key, enqueued_at) in enumerate(connection.queue):
+                    if queued_key == coalesce_key:
+                        # Replace the stale queued update with the latest one
+                        connection.queue[index] = (message, coalesce_key, enqueued_at)
+                        self.messages_coalesced += 1
+                        return
+            connection.queue.popleft()
+            self.messages_dropped += 1
+
+        connection.queue.append((message, coalesce_key, time.monotonic()))
+        if connection.writer is not None:
+            return
+        if connection.encoding == TEXT:
+            self._start_writer(connection)
+        elif len(connection.queue) >= self.batch_size:
+            if connection.flush_timer is not None:
+                connection.flush_timer.cancel()
+            self._start_writer(connection)
+        elif connection.flush_timer is None:
+            connection.flush_timer = asyncio.get_running_loop().call_later(self.flush_interval, self._start_writer, connection)
+
+    def _start_writer(self, connection: Connection):
+        connection.flush_timer = None
+        if connection.writer is None and connection.queue:
+            connection.writer = asyncio.ensure_future(self._write(connection))
+
+    async def _write(self, connection: Connection):
+        """Drain one connection's queue; exits as soon as the queue is empty."""
+        websocket = connection.websocket
+        try:
+            while connection.queue:
+                count = 1 if connection.encoding == TEXT else min(len(connection.queue), self.batch_size)
+                batch = [connection.queue.popleft() for _ in range(count)]
+                frame = encode_frame(connection.encoding, [message for message, _, _ in batch])
+                if isinstance(frame, bytes):
+                    nbytes = len(frame)
+                    await asyncio.wait_for(websocket.send_bytes(frame), self.send_timeout)
+                else:
+                    nbytes = len(frame.encode())
+                    await asyncio.wait_for(websocket.send_text(frame), self.send_timeout)
+                now = time.monotonic()
+                self.stats.latencies.extend(now - enqueued_at for _, _, enqueued_at in batch)
+                self.stats.record(count, nbytes, now)
+                self.messages_sent += count
+                self.frames_sent += 1
+                self.bytes_sent += nbytes
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.send_failures += 1
+            logger.warning("WebSocket send failed for user %s: %s", connection.user_id, e)
+            self.disconnect(connection.websocket, connection.user_id)
+            await self._close(connection.websocket)
+        finally:
+            connection.writer = None
+
+    async def _close(self, websocket: WebSocket, code: int = 1011):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    def send(self, connection: Connection, message: str):
+        """Queue a message for a single connection."""
+        self._enqueue(connection, message)
+
+    def _send_local(self, message: str, user_id: str, coalesce_key: Optional[str] = None):
+        connections = self.active_connections.get(user_id)
+        if not connections:
+            return
+        for connection in list(connections.values()):
+            self._enqueue(connection, message, coalesce_key)
+
+    def _broadcast_local(self, message: str, coalesce_key: Optional[str] = None):
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections.values()):
+                self._enqueue(connection, message, coalesce_key)
+
+    async def send_personal_message(self, message: str, user_id: str, coalesce_key: Optional[str] = None):
+        """Queue a message for every connection of a user, on this and other workers."""
+        self._send_local(message, user_id, coalesce_key)
+        if self.backend is not None:
+            self.backend.publish(user_id, message, coalesce_key)
+
+    async def broadcast(self, message: str, coalesce_key: Optional[str] = None):
+        """Queue a message for every connection; each connection's writer delivers it concurrently."""
+        self._broadcast_local(message, coalesce_key)
+        if self.backend is not None:
+            self.backend.publish(None, message, coalesce_key)
+
+    def _publish_local(self, topic: str, message: str, coalesce_key: Optional[str] = None):
+        for connection in list(self.topic_subscribers.get(topic, ())):
+            self._enqueue(connection, message, coalesce_key)
+
+    async def publish(self, topic: str, message: str, coalesce_key: Optional[str] = None):
+        """Queue a message for the connections subscribed to a topic, on this and other workers."""
+        self._publish_local(topic, message, coalesce_key)
+        if self.backend is not None:
+            self.backend.publish(None, message, coalesce_key, topic)
+
+    async def deliver_remote(self, batch: List[Envelope]):
+        """Deliver a batch published by another worker to the sockets held here."""
+        for user_id, message, coalesce_key, topic in batch:
+            if topic is not None:
+                self._publish_local(topic, message, coalesce_key)
+            elif user_id is None:
+                self._broadcast_local(message, coalesce_key)
+            else:
+                self._send_local(message, user_id, coalesce_key)
 
-    async def broadcast(self, message: str):
-        for user_id, connection in self.active_connections.items():
-            await connection.send_text(message)
+    def metrics(self) -> Dict[str, float]:
+        depths = [len(c.queue) for connections in self.active_connections.values() for c in connections.values()]
+        return {
+            "users": len(self.active_connections),
+            "topics": len(self.topic_subscribers),
+            "connections": len(depths),
+            "connections_opened": self.connections_opened,
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "messages_sent": self.messages_sent,
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            **self.stats.rates(),
+            **self.stats.latency_percentiles(),
+            "messages_dropped": self.messages_dropped,
+            "messages_coalesced": self.messages_coalesced,
+            "slow_consumers_disconnected": self.slow_consumers_disconnected,
+            "send_failures": self.send_failures,
+            "pings_sent": self.pings_sent,
+            "connections_reaped": self.connections_reaped,
+            **(self.backend.metrics() if self.backend is not None else {}),
+        }
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager(
+    backend=create_backend(),
+    heartbeat_interval=float(os.getenv("WS_HEARTBEAT_INTERVAL", DEFAULT_HEARTBEAT_INTERVAL)),
+    heartbeat_timeout=float(os.getenv("WS_HEARTBEAT_TIMEOUT", DEFAULT_HEARTBEAT_TIMEOUT)),
+)
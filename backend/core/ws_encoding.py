@@ -0,0 +1,78 @@
+import json
+import zlib
+from typing import List, Optional, Sequence, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:  # Optional; clients fall back to another encoding
+    msgpack = None
+
+# Frame encodings a client can negotiate through the WebSocket subprotocol header.
+# "text" is the legacy behaviour: one text frame per message, no batching.
+# The others batch queued messages into one frame holding a list of events:
+#   pathcraft.json    - text frame with a JSON array
+#   pathcraft.deflate - binary frame with the JSON array, zlib-compressed
+#   pathcraft.msgpack - binary frame with a msgpack array (needs the msgpack package)
+SUBPROTOCOLS = {
+    "pathcraft.msgpack": "msgpack",
+    "pathcraft.deflate": "deflate",
+    "pathcraft.json": "json",
+}
+TEXT = "text"
+DEFLATE_LEVEL = 6
+
+Frame = Union[str, bytes]
+
+def available_encodings() -> List[str]:
+    encodings = [TEXT, "json", "deflate"]
+    if msgpack is not None:
+        encodings.append("msgpack")
+    return encodings
+
+def negotiate_encoding(offered: Sequence[str]) -> Tuple[str, Optional[str]]:
+    """
+    Pick the first subprotocol offered by the client that this server supports.
+
+    Returns the encoding and the subprotocol to accept the connection with
+    (None when the client offered nothing we support, which means legacy text).
+    """
+    for subprotocol in offered:
+        encoding = SUBPROTOCOLS.get(subprotocol)
+        if encoding == "msgpack" and msgpack is None:
+            continue
+        if encoding is not None:
+            return encoding, subprotocol
+    return TEXT, None
+
+def encode_frame(encoding: str, messages: List[str]) -> Frame:
+    """
+    Encode queued messages as a single frame.
+
+    Events are serialized once, when published, so the JSON array is built by
+    joining them rather than re-serializing; plain-text messages become JSON strings.
+    """
+    if encoding == TEXT:
+        if len(messages) != 1:
+            raise ValueError("Text frames carry exactly one message")
+        return messages[0]
+    if encoding == "msgpack":
+        return msgpack.packb([_decode(message) for message in messages])
+    payload = "[" + ",".join(message if message.startswith(("{", "[")) else json.dumps(message) for message in messages) + "]"
+    if encoding == "json":
+        return payload
+    if encoding == "deflate":
+        return zlib.compress(payload.encode(), DEFLATE_LEVEL)
+    raise ValueError(f"Unknown WebSocket encoding: {encoding}")
+
+def decode_frame(encoding: str, frame: Frame) -> list:
+    """Inverse of encode_frame for batching encodings (used by tests and Python clients)."""
+    if encoding == "msgpack":
+        return msgpack.unpackb(frame)
+    if encoding == "deflate":
+        frame = zlib.decompress(frame).decode()
+    return json.loads(frame)
+
+def _decode(message: str):
+    if message.startswith(("{", "[")):
+        return json.loads(message)
+    return message
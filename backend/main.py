@@ -1,17 +1,51 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, status
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+import json
+import logging
 import uuid
 
-from .database import engine, get_db
+from .database import add_missing_columns, engine, SessionLocal
 from .models import models
+from .core.auth import get_current_user, websocket_token
+from .core.compression import CompressionMiddleware, compression_metrics
+from .core.events import authorize_topic
+from .core.http_cache import response_cache
+from .core.progress import recompute_progress
+from .core.password_hashing import password_hasher
+from .core.principal_cache import principal_cache
 from .core.websocket_manager import manager
-from .api import goals, sub_goals, tasks, users, notifications, recurring_tasks, calendar_integration, teams, team_okrs, user_preferences, learning_platforms
+from .api import batch, goals, sub_goals, tasks, users, notifications, recurring_tasks, calendar_integration, teams, team_okrs, user_preferences, learning_platforms
+
+logger = logging.getLogger(__name__)
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
+# create_all skips tables that already exist, so add columns and indexes declared since
+added_columns = add_missing_columns(engine, models.Base.metadata)
+for table in models.Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+# Progress counters added to an existing database start at zero; fill them in
+if any(column == "total_tasks" for _, column in added_columns):
+    with SessionLocal() as db:
+        recompute_progress(db)
+        db.commit()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connect the WebSocket manager to the cross-worker pub/sub bus
+    await manager.start()
+    password_hasher.start()
+    yield
+    await manager.stop()
+    password_hasher.stop()
+
+app = FastAPI(title="PathCraft API", version="1.0.0", lifespan=lifespan)
 
-app = FastAPI(title="PathCraft API", version="1.0.0")
+# Compress large responses; added first so CORS headers are set outside it
+app.add_middleware(CompressionMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -34,6 +68,7 @@ app.include_router(teams.router, prefix="/api", tags=["teams"])
 app.include_router(team_okrs.router, prefix="/api", tags=["team_okrs"])
 app.include_router(user_preferences.router, prefix="/api", tags=["user_preferences"])
 app.include_router(learning_platforms.router, prefix="/api", tags=["learning_platforms"])
+app.include_router(batch.router, prefix="/api", tags=["batch"])
 
 @app.get("/")
 def read_root():
@@ -43,18 +78,90 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/websocket")
+def websocket_metrics():
+    return manager.metrics()
+
+@app.get("/metrics/compression")
+def compression_metrics_endpoint():
+    return compression_metrics.metrics()
+
+@app.get("/metrics/http_cache")
+def http_cache_metrics():
+    return response_cache.metrics()
+
+@app.get("/metrics/auth")
+def auth_metrics():
+    return {**principal_cache.metrics(), "password_hashing": password_hasher.metrics()}
+
+def _authorize_topic(user_id: str, topic: str) -> bool:
+    # Short-lived session so idle sockets never hold a database connection
+    db = SessionLocal()
+    try:
+        return authorize_topic(db, user_id, topic)
+    finally:
+        db.close()
+
+def _authenticate(token: str):
+    # Same check as get_current_user; most sockets are answered from the principal cache
+    db = SessionLocal()
+    try:
+        return get_current_user(token, db)
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+async def _handle_subscription(connection, user_id: str, command: dict):
+    """Handle {"action": "subscribe" | "unsubscribe", "topic": "goal:<id>"} commands."""
+    action = command.get("action")
+    topic = command.get("topic")
+    if not isinstance(topic, str):
+        reply = {"type": "error", "detail": "Missing topic"}
+    elif action == "subscribe":
+        if await run_in_threadpool(_authorize_topic, user_id, topic):
+            manager.subscribe(connection, topic)
+            reply = {"type": "subscribed", "topic": topic}
+        else:
+            reply = {"type": "error", "topic": topic, "detail": "Not authorized to subscribe to this topic"}
+    elif action == "unsubscribe":
+        manager.unsubscribe(connection, topic)
+        reply = {"type": "unsubscribed", "topic": topic}
+    else:
+        reply = {"type": "error", "detail": f"Unknown action: {action}"}
+    manager.send(connection, json.dumps(reply))
+
 @app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: str, db: Session = Depends(get_db)):
-    await manager.connect(websocket, user_id)
+async def websocket_endpoint(websocket: WebSocket, user_id: str):
+    token = websocket_token(websocket)
+    principal = await run_in_threadpool(_authenticate, token) if token else None
+    if principal is None or principal.id != user_id:
+        # Closing before accept rejects the handshake; nothing is sent to the socket
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    connection = await manager.connect(websocket, user_id)
     try:
         while True:
             data = await websocket.receive_text()
+            manager.touch(connection)
+            try:
+                command = json.loads(data)
+            except ValueError:
+                command = None
+            if isinstance(command, dict) and command.get("action") in ("pong", "ping"):
+                # Heartbeat replies only refresh last_seen; client pings get a pong back
+                if command["action"] == "ping":
+                    manager.send(connection, json.dumps({"type": "pong"}))
+                continue
+            if isinstance(command, dict) and "action" in command:
+                await _handle_subscription(connection, user_id, command)
+                continue
             # Handle incoming messages if needed
-            await manager.send_personal_message(f"Message received: {data}", user_id)
+            await manager.send_personal_message(json.dumps({"type": "message.received", "data": data}), user_id)
     except WebSocketDisconnect:
         manager.disconnect(websocket, user_id)
-        await manager.send_personal_message("Client disconnected", user_id)
+        await manager.send_personal_message(json.dumps({"type": "client.disconnected"}), user_id)
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        logger.warning("WebSocket error for user %s: %s", user_id, e)
         manager.disconnect(websocket, user_id)
         await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
\ No newline at end of file
@@ -8,6 +8,13 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import pickle
 
+from .reminder_bandit import ReminderBandit
+
+# Strategy modes: "ml" uses the trained model (falling back to rules), "rules"
+# always uses the rule-based strategy and "bandit" samples frequencies from
+# posteriors learned from recorded outcomes (see ReminderBandit).
+STRATEGY_MODES = ("ml", "rules", "bandit")
+
 @dataclass
 class ReminderContext:
     user_id: str
@@ -26,12 +33,42 @@ class ReminderStrategy:
     escalation_enabled: bool
     custom_message: Optional[str] = None
 
+# Number of columns produced by EnhancedReminderSystem.extract_features
+FEATURE_COUNT = 11
+
+def deadline_weights(hours_to_deadline: np.ndarray) -> np.ndarray:
+    """Vectorized deadline proximity weight, matching _calculate_urgency_score."""
+    return np.select(
+        [hours_to_deadline < 1, hours_to_deadline < 24, hours_to_deadline < 72, hours_to_deadline < 168],
+        [1.0, 0.8, 0.6, 0.4],
+        default=0.2,
+    )
+
+def urgency_scores(priorities: np.ndarray, hours_to_deadline: np.ndarray) -> np.ndarray:
+    """Vectorized urgency score for arrays of task priorities and deadlines."""
+    priority_weight = 1.0 - (priorities / 2.0)
+    return (priority_weight + deadline_weights(hours_to_deadline)) / 2.0
+
+def rule_based_frequencies(priorities: np.ndarray, hours_to_deadline: np.ndarray) -> np.ndarray:
+    """Vectorized reminder frequency (hours) of the rule-based strategy."""
+    frequency_hours = np.select(
+        [hours_to_deadline < 1, hours_to_deadline < 24, hours_to_deadline < 72, hours_to_deadline < 168],
+        [0.5, 2.0, 6.0, 12.0],
+        default=24.0,
+    )
+    frequency_hours = np.where(priorities == 0, np.maximum(1, frequency_hours // 2), frequency_hours)
+    return np.where(priorities == 2, frequency_hours * 2, frequency_hours)
+
 class EnhancedReminderSystem:
-    def __init__(self, model_path: str = "enhanced_reminder_model.pkl"):
+    def __init__(self, model_path: str = "enhanced_reminder_model.pkl", strategy_mode: str = "ml"):
+        if strategy_mode not in STRATEGY_MODES:
+            raise ValueError(f"Unknown reminder strategy mode: {strategy_mode}")
         self.model_path = model_path
+        self.strategy_mode = strategy_mode
         self.model = None
         self.scaler = StandardScaler()
         self.user_reminder_patterns = {}
+        self.bandit = ReminderBandit()
         self.load_model()
     
     def load_model(self):
@@ -43,17 +80,20 @@ class EnhancedReminderSystem:
                     self.model = model_data['model']
                     self.scaler = model_data['scaler']
                     self.user_reminder_patterns = model_data.get('user_reminder_patterns', {})
+                    if 'bandit' in model_data:
+                        self.bandit.load_state_dict(model_data['bandit'])
             except Exception as e:
                 print(f"Error loading reminder model: {e}")
                 self.model = None
     
     def save_model(self):
         """Save the trained reminder model."""
-        if self.model is not None:
+        if self.model is not None or self.bandit.posteriors:
             model_data = {
                 'model': self.model,
                 'scaler': self.scaler,
-                'user_reminder_patterns': self.user_reminder_patterns
+                'user_reminder_patterns': self.user_reminder_patterns,
+                'bandit': self.bandit.state_dict()
             }
             with open(self.model_path, 'wb') as f:
                 pickle.dump(model_data, f)
@@ -141,7 +181,9 @@ class EnhancedReminderSystem:
     
     def predict_reminder_strategy(self, context: ReminderContext) -> ReminderStrategy:
         """Predict optimal reminder strategy for a task."""
-        if self.model is None:
+        if self.strategy_mode == "bandit":
+            return self._bandit_strategy(context)
+        if self.strategy_mode == "rules" or self.model is None:
             return self._rule_based_strategy(context)
         
         try:
@@ -219,6 +261,16 @@ class EnhancedReminderSystem:
             escalation_enabled=urgency_score > 0.8
         )
     
+    def _bandit_strategy(self, context: ReminderContext) -> ReminderStrategy:
+        """Rule-based intensity and channels with an online-learned frequency."""
+        strategy = self._rule_based_strategy(context)
+        strategy.frequency_hours = self.bandit.select_frequency(context.user_id, context.task_priority)
+        return strategy
+    
+    def record_reminder_outcome(self, user_id: str, task_priority: int, frequency_hours: float, action: str):
+        """Feed a reminder outcome (completed, snoozed or ignored) to the bandit; call save_model to keep it."""
+        self.bandit.update(user_id, task_priority, frequency_hours, action)
+    
     def _determine_intensity(self, context: ReminderContext) -> str:
         """Determine reminder intensity based on context."""
         time_to_deadline = (context.task_deadline - datetime.datetime.now()).total_seconds() / 3600
@@ -302,18 +354,25 @@ class EnhancedReminderSystem:
         if not training_data:
             return
         
-        X = [features for features, _ in training_data]
-        y = [frequency for _, frequency in training_data]
+        X = np.asarray([features for features, _ in training_data], dtype=np.float32)
+        y = np.asarray([frequency for _, frequency in training_data], dtype=np.float32)
+        self.fit_arrays(X, y)
+
+    def fit_arrays(self, X: np.ndarray, y: np.ndarray, n_jobs: int = -1):
+        """Train the reminder model from feature and target arrays."""
+        if len(X) == 0:
+            return
         
         # Normalize features
         X_scaled = self.scaler.fit_transform(X)
         
-        # Train model
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
+        # Train model on all cores, then predict single contexts without a thread pool
+        self.model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs)
         self.model.fit(X_scaled, y)
+        self.model.set_params(n_jobs=None)
         
         # Save the model
         self.save_model()
 
 # Global reminder system instance
-enhanced_reminder_system = EnhancedReminderSystem()
+enhanced_reminder_system = EnhancedReminderSystem(strategy_mode=os.getenv("REMINDER_STRATEGY_MODE", "ml"))
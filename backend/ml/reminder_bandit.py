@@ -0,0 +1,110 @@
+import logging
+import threading
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Candidate reminder frequencies (hours between reminders) the bandit chooses from
+CANDIDATE_FREQUENCY_HOURS = (1, 2, 6, 12, 24, 48)
+
+# Reward credited to the chosen frequency for each reminder outcome
+ACTION_REWARDS = {"completed": 1.0, "snoozed": 0.5, "ignored": 0.0}
+
+class ReminderBandit:
+    """
+    Incremental reminder-timing learner using Thompson sampling.
+
+    Each (user, priority) bucket keeps a Beta(alpha, beta) posterior per candidate
+    frequency, i.e. two floats per arm. Selecting a frequency samples every arm
+    once and updating an outcome touches a single arm, so both are O(1) in the
+    amount of history and need no retraining.
+
+    The API does not report reminder outcomes yet, so the bandit only learns
+    from outcomes a caller feeds it, e.g. replay_reminder_strategies over an
+    interaction log. Its posteriors are saved with the reminder model.
+    """
+
+    def __init__(self, arms: Sequence[float] = CANDIDATE_FREQUENCY_HOURS, seed: Optional[int] = None):
+        self.arms = tuple(arms)
+        self.arm_index = {arm: i for i, arm in enumerate(self.arms)}
+        self.posteriors: Dict[str, np.ndarray] = {}
+        self.rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def bucket_key(user_id: str, task_priority: int) -> str:
+        # Same key layout as EnhancedReminderSystem.user_reminder_patterns
+        return f"{user_id}_{task_priority}"
+
+    def _posterior(self, key: str) -> np.ndarray:
+        posterior = self.posteriors.get(key)
+        if posterior is None:
+            # Row 0 holds alpha, row 1 beta; Beta(1, 1) is a uniform prior
+            posterior = np.ones((2, len(self.arms)))
+            self.posteriors[key] = posterior
+        return posterior
+
+    def select_frequency(self, user_id: str, task_priority: int) -> float:
+        """Sample a reminder frequency (hours) for the user's priority bucket."""
+        with self._lock:
+            posterior = self._posterior(self.bucket_key(user_id, task_priority))
+            samples = self.rng.beta(posterior[0], posterior[1])
+        return self.arms[int(np.argmax(samples))]
+
+    def update(self, user_id: str, task_priority: int, frequency_hours: float, action: str):
+        """Credit a reminder outcome (completed, snoozed or ignored) to the frequency used."""
+        arm = self.arm_index.get(frequency_hours)
+        if arm is None:
+            arm = min(range(len(self.arms)), key=lambda i: abs(self.arms[i] - frequency_hours))
+        reward = ACTION_REWARDS.get(action, 0.0)
+        with self._lock:
+            posterior = self._posterior(self.bucket_key(user_id, task_priority))
+            posterior[0, arm] += reward
+            posterior[1, arm] += 1.0 - reward
+
+    def _arm_indices(self, frequencies: np.ndarray) -> np.ndarray:
+        """Index of the nearest candidate arm for each frequency."""
+        arms = np.asarray(self.arms, dtype=float)
+        return np.abs(np.asarray(frequencies, dtype=float)[:, None] - arms[None, :]).argmin(axis=1)
+
+    def select_frequencies(self, keys: Sequence[str]) -> np.ndarray:
+        """Vectorized select_frequency for a batch of bucket keys."""
+        unique_keys, inverse = np.unique(np.asarray(keys, dtype=str), return_inverse=True)
+        with self._lock:
+            posteriors = np.stack([self._posterior(key) for key in unique_keys.tolist()])[inverse]
+            samples = self.rng.beta(posteriors[:, 0], posteriors[:, 1])
+        return np.asarray(self.arms)[samples.argmax(axis=1)]
+
+    def update_batch(self, keys: Sequence[str], frequencies: Sequence[float], actions: Sequence[str]):
+        """Vectorized update for a batch of reminder outcomes."""
+        unique_keys, inverse = np.unique(np.asarray(keys, dtype=str), return_inverse=True)
+        arms = self._arm_indices(np.asarray(frequencies))
+        actions = np.asarray(actions, dtype=str)
+        rewards = np.zeros(len(actions))
+        for action, reward in ACTION_REWARDS.items():
+            rewards[actions == action] = reward
+        with self._lock:
+            posteriors = np.stack([self._posterior(key) for key in unique_keys.tolist()])
+            np.add.at(posteriors[:, 0], (inverse, arms), rewards)
+            np.add.at(posteriors[:, 1], (inverse, arms), 1.0 - rewards)
+            for key, posterior in zip(unique_keys.tolist(), posteriors):
+                self.posteriors[key] = posterior
+
+    def expected_rewards(self, user_id: str, task_priority: int) -> Dict[float, float]:
+        """Posterior mean reward per candidate frequency."""
+        posterior = self.posteriors.get(self.bucket_key(user_id, task_priority))
+        if posterior is None:
+            return {arm: 0.5 for arm in self.arms}
+        means = posterior[0] / posterior.sum(axis=0)
+        return dict(zip(self.arms, means.tolist()))
+
+    def state_dict(self) -> Dict:
+        return {"arms": self.arms, "posteriors": self.posteriors}
+
+    def load_state_dict(self, state: Dict):
+        if tuple(state.get("arms", ())) != self.arms:
+            logger.warning("Reminder bandit arms changed from %s to %s; discarding saved posteriors", tuple(state.get("arms", ())), self.arms)
+            return
+        self.posteriors = dict(state.get("posteriors", {}))
@@ -1,20 +1,75 @@
 import datetime
-from ..database import get_db
-from ..models.models import Task
+from typing import Dict, Iterable, Optional, Tuple
 
-def get_reminder_frequency(task_id: str | None) -> datetime.timedelta:
+from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..core.authorization import Owned, task_ownership
+from ..models.models import Task, UserPreference
+
+DEFAULT_REMINDER_INTERVAL_MINUTES = 30  # Default to 30 minutes before the task
+REMINDER_INTERVAL_PREFERENCE_KEY = "reminder_interval_minutes"
+
+def _resolve_interval(task_interval: Optional[int], preferred_interval: Optional[str]) -> datetime.timedelta:
+    """Task interval first, then the user's preference, then the default."""
+    if task_interval:
+        return datetime.timedelta(minutes=task_interval)
+    if preferred_interval:
+        try:
+            return datetime.timedelta(minutes=int(preferred_interval))
+        except ValueError:
+            pass
+    return datetime.timedelta(minutes=DEFAULT_REMINDER_INTERVAL_MINUTES)
+
+def _with_preference(query, user_id: Optional[str]):
+    # The preference side matches at most one row, so the outer join never fans out
+    return query.outerjoin(
+        UserPreference,
+        and_(
+            UserPreference.user_id == user_id,
+            UserPreference.preference_key == REMINDER_INTERVAL_PREFERENCE_KEY,
+        ),
+    )
+
+def get_reminder_intervals(db: Session, task_ids: Iterable[str], user_id: Optional[str] = None) -> Dict[str, datetime.timedelta]:
+    """
+    Resolves reminder intervals for many tasks in a single query.
+    Tasks that do not exist are omitted from the result.
+    """
+    task_ids = list(set(task_ids))
+    if not task_ids:
+        return {}
+    query = _with_preference(db.query(Task.id, Task.reminder_interval, UserPreference.preference_value), user_id)
+    rows = query.filter(Task.id.in_(task_ids)).all()
+    return {task_id: _resolve_interval(interval, preferred) for task_id, interval, preferred in rows}
+
+def get_task_with_reminder_interval(db: Session, task_id: str, user_id: Optional[str] = None) -> Tuple[Optional[Task], datetime.timedelta]:
+    """Loads a task together with its resolved reminder interval in one query."""
+    row = _with_preference(db.query(Task, UserPreference.preference_value), user_id).filter(Task.id == task_id).first()
+    if row is None:
+        return None, _resolve_interval(None, None)
+    task, preferred = row
+    return task, _resolve_interval(task.reminder_interval, preferred)
+
+async def get_owned_task_with_reminder_interval_async(db: AsyncSession, task_id: str, user_id: Optional[str] = None) -> Tuple[Optional[Owned], datetime.timedelta]:
+    """
+    Loads a task with its owner (see core.authorization) and its resolved
+    reminder interval in one query, for an AsyncSession.
+    """
+    statement = _with_preference(task_ownership([task_id]).add_columns(UserPreference.preference_value), user_id)
+    row = (await db.execute(statement)).first()
+    if row is None:
+        return None, _resolve_interval(None, None)
+    task, owner_id, preferred = row
+    return Owned(task, owner_id), _resolve_interval(task.reminder_interval, preferred)
+
+def get_reminder_frequency(db: Session, task_id: str | None, user_id: Optional[str] = None) -> datetime.timedelta:
     """
     Gets the reminder frequency for a task.
     If the user has set a custom reminder interval for the task, it returns that.
-    Otherwise, it returns the default reminder interval.
+    Otherwise, it returns the user's preferred interval or the default.
     """
     if not task_id:
-        return datetime.timedelta(minutes=30)
-
-    db = next(get_db())
-    task = db.query(Task).filter(Task.id == task_id).first()
-
-    if task and task.reminder_interval:
-        return datetime.timedelta(minutes=task.reminder_interval)
-    else:
-        return datetime.timedelta(minutes=30) # Default to 30 minutes before the task
+        return _resolve_interval(None, None)
+    return get_reminder_intervals(db, [task_id], user_id).get(task_id, _resolve_interval(None, None))
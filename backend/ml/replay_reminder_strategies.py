@@ -0,0 +1,199 @@
+"""
+Offline replay benchmark for reminder strategies.
+
+Historical reminder interactions are streamed in chunks, featurized like the
+training pipeline, and every strategy decides a reminder frequency for the whole
+batch at once. Because the logs do not record what a different policy would have
+caused, outcomes are estimated with proxies:
+
+- sends: reminders the policy would send before the deadline (capped at a week)
+- wasted_send_share: share of those sends going to reminders the user ignored
+- response_rate_proxy: share of decisions within 2x of the frequency implied by
+  the logged outcome (the training target of train_reminder_model)
+
+sends and wasted_send_share are scored against the logged outcomes alone and
+compare every strategy. response_rate_proxy does not compare the ml strategy:
+its model was fit to that very target, so it scores well by construction. Its
+row is reported with response_rate_proxy_comparable set to False.
+
+Strategies decide a whole batch at once, so latency is measured per batch:
+batch_latency_us_p50/p99 are percentiles over batches of the mean time per
+decision in each batch, not of individual decisions.
+
+Usage:
+    python -m backend.ml.replay_reminder_strategies reminder_interaction_data.csv
+    # ml needs a model trained by train_reminder_model
+    python -m backend.ml.replay_reminder_strategies reminder_interaction_data.csv --strategies rules,ml,bandit
+"""
+import abc
+import argparse
+import time
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from .enhanced_reminders import EnhancedReminderSystem, FEATURE_COUNT, rule_based_frequencies
+from .reminder_bandit import ReminderBandit
+from .train_reminder_model import DEFAULT_CHUNK_SIZE, UserRunningStats, count_csv_rows, fill_chunk, iter_csv_chunks, peak_memory_mb
+
+MAX_HORIZON_HOURS = 168
+
+class ReplayStrategy(abc.ABC):
+    """A reminder policy evaluated on batches of logged interactions."""
+
+    name = "base"
+    # Whether the policy was fit to the implied frequencies response_rate_proxy scores against
+    fit_to_proxy_target = False
+
+    @abc.abstractmethod
+    def decide(self, X: np.ndarray, bucket_keys: np.ndarray) -> np.ndarray:
+        """Return the reminder frequency (hours) for each row of X."""
+
+    def observe(self, bucket_keys: np.ndarray, frequencies: np.ndarray, actions: np.ndarray):
+        """Receive the logged outcomes of a batch after deciding it."""
+
+class RuleBasedReplayStrategy(ReplayStrategy):
+    """Vectorized EnhancedReminderSystem._rule_based_strategy."""
+
+    name = "rules"
+
+    def decide(self, X, bucket_keys):
+        return rule_based_frequencies(X[:, 1], X[:, 0])
+
+class ModelReplayStrategy(ReplayStrategy):
+    """Batch predictions of the trained EnhancedReminderSystem model."""
+
+    name = "ml"
+    fit_to_proxy_target = True
+
+    def __init__(self, system: EnhancedReminderSystem):
+        if system.model is None:
+            raise ValueError(f"No trained reminder model at {system.model_path}")
+        self.system = system
+
+    def decide(self, X, bucket_keys):
+        predictions = self.system.model.predict(self.system.scaler.transform(X))
+        return np.clip(predictions.astype(int), 1, 168)
+
+class BanditReplayStrategy(ReplayStrategy):
+    """Thompson sampling bandit, learning from each batch as it is replayed."""
+
+    name = "bandit"
+
+    def __init__(self, bandit: ReminderBandit):
+        self.bandit = bandit
+
+    def decide(self, X, bucket_keys):
+        return self.bandit.select_frequencies(bucket_keys)
+
+    def observe(self, bucket_keys, frequencies, actions):
+        self.bandit.update_batch(bucket_keys, frequencies, actions)
+
+def build_strategy(name: str, model_path: str, seed: int = 0) -> ReplayStrategy:
+    if name == "rules":
+        return RuleBasedReplayStrategy()
+    if name == "ml":
+        return ModelReplayStrategy(EnhancedReminderSystem(model_path=model_path))
+    if name == "bandit":
+        return BanditReplayStrategy(ReminderBandit(seed=seed))
+    raise ValueError(f"Unknown strategy: {name}")
+
+class ReplayReport:
+    """Running totals for one strategy."""
+
+    def __init__(self, name: str, proxy_comparable: bool = True):
+        self.name = name
+        self.proxy_comparable = proxy_comparable
+        self.decisions = 0
+        self.sends = 0.0
+        self.wasted_sends = 0.0
+        self.aligned = 0
+        self.decide_seconds = 0.0
+        self.batch_latencies_us: List[float] = []
+
+    def add(self, frequencies: np.ndarray, X: np.ndarray, implied: np.ndarray, ignored: np.ndarray, seconds: float):
+        horizon = np.clip(X[:, 0], 1, MAX_HORIZON_HOURS)
+        sends = np.ceil(horizon / frequencies)
+        self.decisions += len(frequencies)
+        self.sends += float(sends.sum())
+        self.wasted_sends += float(sends[ignored].sum())
+        self.aligned += int((np.abs(np.log2(frequencies / implied)) <= 1).sum())
+        self.decide_seconds += seconds
+        # Mean time per decision in this batch
+        self.batch_latencies_us.append(seconds / len(frequencies) * 1e6)
+
+    def summary(self) -> Dict[str, float]:
+        latencies = np.asarray(self.batch_latencies_us) if self.batch_latencies_us else np.zeros(1)
+        return {
+            "strategy": self.name,
+            "decisions": self.decisions,
+            "sends": self.sends,
+            "sends_per_decision": self.sends / self.decisions if self.decisions else 0.0,
+            "wasted_send_share": self.wasted_sends / self.sends if self.sends else 0.0,
+            "response_rate_proxy": self.aligned / self.decisions if self.decisions else 0.0,
+            "response_rate_proxy_comparable": self.proxy_comparable,
+            "batch_latency_us_p50": float(np.percentile(latencies, 50)),
+            "batch_latency_us_p99": float(np.percentile(latencies, 99)),
+            "decisions_per_minute": self.decisions / self.decide_seconds * 60 if self.decide_seconds else float("inf"),
+        }
+
+def replay(chunks: Iterator[pd.DataFrame], strategies: List[ReplayStrategy]) -> List[Dict[str, float]]:
+    """Replay interaction chunks through every strategy and summarize each."""
+    reports = [ReplayReport(strategy.name, proxy_comparable=not strategy.fit_to_proxy_target) for strategy in strategies]
+    stats = UserRunningStats()
+    for chunk in chunks:
+        n = len(chunk)
+        X = np.empty((n, FEATURE_COUNT), dtype=np.float32)
+        implied = np.empty(n, dtype=np.float32)
+        fill_chunk(chunk, X, implied, stats)
+
+        actions = chunk["action"].astype(str).to_numpy()
+        ignored = actions == "ignored"
+        bucket_keys = (chunk["user_id"].astype(str) + "_" + X[:, 1].astype(int).astype(str)).to_numpy()
+
+        for strategy, report in zip(strategies, reports):
+            started = time.perf_counter()
+            frequencies = np.asarray(strategy.decide(X, bucket_keys), dtype=np.float32)
+            report.add(frequencies, X, implied, ignored, time.perf_counter() - started)
+            strategy.observe(bucket_keys, frequencies, actions)
+    return [report.summary() for report in reports]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay reminder interaction logs through reminder strategies.")
+    parser.add_argument("csv_path", nargs="?", default="reminder_interaction_data.csv")
+    parser.add_argument("--strategies", default="rules,bandit", help="Comma-separated list of rules, ml, bandit (ml needs --model-path)")
+    parser.add_argument("--model-path", default="enhanced_reminder_model.pkl")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    strategies = []
+    for name in args.strategies.split(","):
+        try:
+            strategies.append(build_strategy(name.strip(), args.model_path, args.seed))
+        except ValueError as e:
+            parser.error(f"strategy {name.strip()}: {e}")
+
+    started = time.perf_counter()
+    summaries = replay(iter_csv_chunks(args.csv_path, args.chunk_size), strategies)
+    elapsed = time.perf_counter() - started
+
+    total_rows = count_csv_rows(args.csv_path)
+    print(f"Replayed {total_rows} events in {elapsed:.2f}s ({total_rows / elapsed * 60:.0f} events/min)")
+    for summary in summaries:
+        print(
+            f"{summary['strategy']:>8}: sends={summary['sends']:.0f} "
+            f"({summary['sends_per_decision']:.2f}/decision), "
+            f"wasted={summary['wasted_send_share']:.1%}, "
+            f"response_proxy={summary['response_rate_proxy']:.1%}"
+            f"{'' if summary['response_rate_proxy_comparable'] else ' (not comparable: trained on this target)'}, "
+            f"mean decision time per batch p50={summary['batch_latency_us_p50']:.2f}us p99={summary['batch_latency_us_p99']:.2f}us"
+        )
+    peak = peak_memory_mb()
+    if peak is not None:
+        print(f"Peak memory: {peak:.1f} MB")
+    return summaries
+
+if __name__ == "__main__":
+    main()
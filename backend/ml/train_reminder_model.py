@@ -0,0 +1,190 @@
+"""
+Train the EnhancedReminderSystem model from reminder interaction logs.
+
+Interaction logs are streamed in chunks and turned into features with vectorized
+NumPy code, so tens of millions of rows never exist as Python objects.
+
+Logs must record each reminder's own outcome (the action column). The
+application database cannot supply one: notifications only record that they
+were sent, and tasks keep their current status but not when it changed, so
+labels derived from them would leak later task state into earlier reminders.
+
+Usage:
+    python -m backend.ml.train_reminder_model reminder_interaction_data.csv
+"""
+import argparse
+import time
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from .enhanced_reminders import EnhancedReminderSystem, FEATURE_COUNT, rule_based_frequencies, urgency_scores
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_CHUNK_SIZE = 500_000
+
+# Scale applied to the rule-based frequency to derive the training target:
+# completed reminders were well timed, snoozes ask for a sooner follow-up and
+# ignored reminders should back off.
+ACTION_FREQUENCY_SCALE = {"completed": 1.0, "snoozed": 0.5, "ignored": 2.0}
+RESPONDED_ACTIONS = ("completed", "snoozed")
+
+# Defaults used when a log does not carry the task context
+DEFAULT_PRIORITY = 1
+DEFAULT_HOURS_TO_DEADLINE = 24.0
+DEFAULT_RESPONSE_TIME_HOURS = 24.0
+DEFAULT_REMINDER_FREQUENCY_HOURS = 24.0
+
+class UserRunningStats:
+    """Per-user reminder counters carried across chunks."""
+
+    def __init__(self):
+        self.sent: Dict[str, int] = {}
+        self.responded: Dict[str, int] = {}
+        self.completed: Dict[str, int] = {}
+
+    def prior(self, user_ids: pd.Series, counts: Dict[str, int]) -> np.ndarray:
+        return user_ids.map(counts).fillna(0).to_numpy(dtype=np.float32)
+
+    def update(self, totals: pd.DataFrame):
+        for counts, column in ((self.sent, "sent"), (self.responded, "responded"), (self.completed, "completed")):
+            for user_id, value in totals[column].items():
+                counts[user_id] = counts.get(user_id, 0) + int(value)
+
+def count_csv_rows(path: str, block_size: int = 1 << 24) -> int:
+    """Count data rows in a CSV file without parsing it."""
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(0, lines - 1)  # Header row
+
+def fill_chunk(chunk: pd.DataFrame, X: np.ndarray, y: np.ndarray, stats: UserRunningStats) -> None:
+    """Write features and targets for one chunk of interactions into X and y."""
+    n = len(chunk)
+    action = chunk["action"].astype(str)
+    user_ids = chunk["user_id"].astype(str)
+
+    if "task_priority" in chunk:
+        priority = chunk["task_priority"].fillna(DEFAULT_PRIORITY).to_numpy(dtype=np.float32)
+    else:
+        priority = np.full(n, DEFAULT_PRIORITY, dtype=np.float32)
+
+    if "hours_to_deadline" in chunk:
+        hours = chunk["hours_to_deadline"].fillna(DEFAULT_HOURS_TO_DEADLINE).to_numpy(dtype=np.float32)
+    elif "task_deadline" in chunk and "reminder_time" in chunk:
+        delta = pd.to_datetime(chunk["task_deadline"]) - pd.to_datetime(chunk["reminder_time"])
+        hours = (delta.dt.total_seconds() / 3600).fillna(DEFAULT_HOURS_TO_DEADLINE).to_numpy(dtype=np.float32)
+    else:
+        hours = np.full(n, DEFAULT_HOURS_TO_DEADLINE, dtype=np.float32)
+
+    if "response_time_hours" in chunk:
+        response_time = chunk["response_time_hours"].fillna(DEFAULT_RESPONSE_TIME_HOURS).to_numpy(dtype=np.float32)
+    else:
+        response_time = np.full(n, DEFAULT_RESPONSE_TIME_HOURS, dtype=np.float32)
+
+    # Response and completion rates use only the interactions seen before each row
+    flags = pd.DataFrame({
+        "user_id": user_ids,
+        "sent": 1,
+        "responded": action.isin(RESPONDED_ACTIONS).astype(np.int32),
+        "completed": (action == "completed").astype(np.int32),
+    })
+    grouped = flags.groupby("user_id", sort=False)
+    seen = grouped.cumcount().to_numpy(dtype=np.float32) + stats.prior(user_ids, stats.sent)
+    responded = (grouped["responded"].cumsum() - flags["responded"]).to_numpy(dtype=np.float32) + stats.prior(user_ids, stats.responded)
+    completed = (grouped["completed"].cumsum() - flags["completed"]).to_numpy(dtype=np.float32) + stats.prior(user_ids, stats.completed)
+    has_history = seen > 0
+    safe_seen = np.maximum(seen, 1)
+    stats.update(grouped[["sent", "responded", "completed"]].sum())
+
+    X[:, 0] = hours
+    X[:, 1] = priority
+    X[:, 2] = np.where(has_history, responded / safe_seen, 0.5)
+    X[:, 3] = response_time
+    X[:, 4] = urgency_scores(priority, hours)
+    X[:, 5] = np.where(has_history, completed / safe_seen, 0.5)
+    X[:, 6] = DEFAULT_REMINDER_FREQUENCY_HOURS
+    X[:, 7] = 1  # Single preferred channel
+    X[:, 8] = 1  # push
+    X[:, 9] = 0  # email
+    X[:, 10] = 0  # sms
+
+    scale = action.map(ACTION_FREQUENCY_SCALE).fillna(1.0).to_numpy(dtype=np.float32)
+    y[:] = np.clip(rule_based_frequencies(priority, hours) * scale, 1, 168)
+
+def iter_csv_chunks(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Stream a reminder interaction CSV (generate_reminder_data.py schema)."""
+    return pd.read_csv(path, chunksize=chunk_size, dtype={"user_id": str, "task_id": str, "action": str})
+
+def peak_memory_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, where the platform reports it."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def build_training_arrays(chunks: Iterator[pd.DataFrame], total_rows: int):
+    """Fill preallocated feature/target arrays from a stream of chunks."""
+    X = np.empty((total_rows, FEATURE_COUNT), dtype=np.float32)
+    y = np.empty(total_rows, dtype=np.float32)
+    stats = UserRunningStats()
+    offset = 0
+    for chunk in chunks:
+        n = min(len(chunk), total_rows - offset)
+        if n <= 0:
+            break
+        fill_chunk(chunk.iloc[:n], X[offset:offset + n], y[offset:offset + n], stats)
+        offset += n
+    return X[:offset], y[:offset]
+
+def train(chunks: Iterator[pd.DataFrame], total_rows: int, model_path: str, n_jobs: int = -1) -> Dict[str, float]:
+    """Build features from the chunk stream, fit the model and report throughput."""
+    started = time.perf_counter()
+    X, y = build_training_arrays(chunks, total_rows)
+    featurized = time.perf_counter()
+
+    system = EnhancedReminderSystem(model_path=model_path)
+    system.fit_arrays(X, y, n_jobs=n_jobs)
+    finished = time.perf_counter()
+
+    feature_seconds = featurized - started
+    return {
+        "rows": len(X),
+        "feature_seconds": feature_seconds,
+        "train_seconds": finished - featurized,
+        "rows_per_second": len(X) / feature_seconds if feature_seconds > 0 else float("inf"),
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the enhanced reminder model from interaction logs.")
+    parser.add_argument("csv_path", nargs="?", default="reminder_interaction_data.csv")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--model-path", default="enhanced_reminder_model.pkl")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args(argv)
+
+    total_rows = count_csv_rows(args.csv_path)
+    report = train(iter_csv_chunks(args.csv_path, args.chunk_size), total_rows, args.model_path, args.n_jobs)
+
+    print(f"Rows: {report['rows']}")
+    print(f"Feature build: {report['feature_seconds']:.2f}s ({report['rows_per_second']:.0f} rows/s)")
+    print(f"Training: {report['train_seconds']:.2f}s")
+    if report["peak_memory_mb"] is not None:
+        print(f"Peak memory: {report['peak_memory_mb']:.1f} MB")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Text, Boolean, Float, Date
+from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Text, Boolean, Float, Date, Index
 from sqlalchemy.orm import relationship, declarative_base
 import datetime
 from datetime import datetime as dt
@@ -31,6 +31,7 @@ class Team(Base):
     name = Column(String)
     description = Column(String, nullable=True)
     owner_id = Column(String, ForeignKey('users.id'))
+    created_at = Column(DateTime, default=dt.utcnow)
 
     members = relationship("TeamMember", back_populates="team")
     goals = relationship("Goal", back_populates="team")
@@ -47,6 +48,13 @@ class TeamMember(Base):
     team = relationship("Team", back_populates="members")
     user = relationship("User", back_populates="teams")
 
+    __table_args__ = (
+        # Membership checks filter on both columns; listing a team's members uses the prefix
+        Index('ix_team_members_team_user', 'team_id', 'user_id'),
+        # "My teams"
+        Index('ix_team_members_user_id', 'user_id'),
+    )
+
 class Goal(Base):
     __tablename__ = 'goals'
 
@@ -54,13 +62,21 @@ class Goal(Base):
     title = Column(String)
     target_date = Column(DateTime)
     methodology = Column(String) # SMART, OKR, etc.
-    owner_id = Column(String, ForeignKey('users.id'))
-    team_id = Column(String, ForeignKey('teams.id'), nullable=True)
+    owner_id = Column(String, ForeignKey('users.id'), index=True)
+    team_id = Column(String, ForeignKey('teams.id'), nullable=True, index=True)
+    # Sums of the sub-goals' counters, maintained by core.progress
+    total_tasks = Column(Integer, default=0, server_default="0", nullable=False)
+    done_tasks = Column(Integer, default=0, server_default="0", nullable=False)
 
     owner = relationship("User", back_populates="goals")
     team = relationship("Team", back_populates="goals")
     sub_goals = relationship("SubGoal", back_populates="parent_goal")
 
+    __table_args__ = (
+        # Keyset pages of a user's goals by target date
+        Index('ix_goals_owner_target', 'owner_id', 'target_date', 'id'),
+    )
+
 class SubGoal(Base):
     __tablename__ = 'sub_goals'
 
@@ -68,7 +84,10 @@ class SubGoal(Base):
     title = Column(String)
     description = Column(String, nullable=True)
     target_date = Column(DateTime)
-    goal_id = Column(String, ForeignKey('goals.id'))
+    goal_id = Column(String, ForeignKey('goals.id'), index=True)
+    # Task counts, maintained by core.progress
+    total_tasks = Column(Integer, default=0, server_default="0", nullable=False)
+    done_tasks = Column(Integer, default=0, server_default="0", nullable=False)
 
     parent_goal = relationship("Goal", back_populates="sub_goals")
     tasks = relationship("Task", back_populates="parent_sub_goal")
@@ -77,7 +96,7 @@ class Task(Base):
     __tablename__ = 'tasks'
 
     id = Column(String, primary_key=True, index=True)
-    sub_goal_id = Column(String, ForeignKey('sub_goals.id'), nullable=True)
+    sub_goal_id = Column(String, ForeignKey('sub_goals.id'), nullable=True, index=True)
     recurring_task_id = Column(String, ForeignKey('recurring_tasks.id'), nullable=True)
     generated_date = Column(DateTime, nullable=True)  # Date for which this recurring task was generated
     planned_start = Column(DateTime, nullable=True)
@@ -85,9 +104,15 @@ class Task(Base):
     status = Column(String, default="todo") # todo, in_progress, done
     priority = Column(Integer, default=1) # 0=high, 1=medium, 2=low
     dependencies = Column(String, nullable=True) # JSON array of task IDs
+    reminder_interval = Column(Integer, nullable=True) # Minutes before planned_start to remind
 
     parent_sub_goal = relationship("SubGoal", back_populates="tasks")
 
+    __table_args__ = (
+        # Duplicate check when generating occurrences of a recurring task
+        Index('ix_tasks_recurring_generated', 'recurring_task_id', 'generated_date'),
+    )
+
 class Notification(Base):
     __tablename__ = 'notifications'
 
@@ -99,22 +124,33 @@ class Notification(Base):
     method = Column(String) # push, email, sms
     is_sent = Column(Boolean, default=False)
 
+    __table_args__ = (
+        # Backs the keyset-paginated feed and every other user_id filter; is_sent is
+        # included so sent filters and the feed's ETag aggregate are answered from
+        # the index alone
+        Index('ix_notifications_user_time', 'user_id', 'notification_time', 'id', 'is_sent'),
+    )
+
 class RecurringTask(Base):
     __tablename__ = 'recurring_tasks'
 
     id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey('users.id'))
+    user_id = Column(String, ForeignKey('users.id'), index=True)
     title = Column(String)
     description = Column(String, nullable=True)
     rrule = Column(String) # RRULE string
     start_date = Column(DateTime)
     end_date = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index('ix_recurring_tasks_user_start', 'user_id', 'start_date', 'id'),
+    )
+
 class CalendarIntegration(Base):
     __tablename__ = 'calendar_integrations'
 
     id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey('users.id'))
+    user_id = Column(String, ForeignKey('users.id'), index=True)
     provider = Column(String)  # google, outlook, etc.
     access_token = Column(String)
     refresh_token = Column(String, nullable=True)
@@ -127,7 +163,7 @@ class TeamOKR(Base):
     __tablename__ = 'team_okrs'
 
     id = Column(String, primary_key=True, index=True)
-    team_id = Column(String, ForeignKey('teams.id'))
+    team_id = Column(String, ForeignKey('teams.id'), index=True)
     title = Column(String)
     description = Column(String, nullable=True)
     objective = Column(String)
@@ -140,11 +176,15 @@ class TeamOKR(Base):
     team = relationship("Team", back_populates="okrs")
     key_results = relationship("TeamOKRKeyResult", back_populates="okr", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('ix_team_okrs_team_created', 'team_id', 'created_at', 'id'),
+    )
+
 class TeamOKRKeyResult(Base):
     __tablename__ = 'team_okr_key_results'
 
     id = Column(String, primary_key=True, index=True)
-    okr_id = Column(String, ForeignKey('team_okrs.id'))
+    okr_id = Column(String, ForeignKey('team_okrs.id'), index=True)
     title = Column(String)
     description = Column(String, nullable=True)
     target_value = Column(Float)
@@ -169,6 +209,11 @@ class UserPreference(Base):
 
     user = relationship("User", back_populates="preferences")
 
+    __table_args__ = (
+        # Key lookups and keyset pages by key (id breaks ties)
+        Index('ix_user_preferences_user_key_id', 'user_id', 'preference_key', 'id'),
+    )
+
 class UserAnalytics(Base):
     __tablename__ = 'user_analytics'
 
@@ -183,12 +228,17 @@ class UserAnalytics(Base):
 
     user = relationship("User", back_populates="analytics")
 
+    __table_args__ = (
+        # Per-day lookups and keyset pages of date-range reports for one user
+        Index('ix_user_analytics_user_date_id', 'user_id', 'date', 'id'),
+    )
+
 # HR Learning Platform Integration
 class LearningPlatform(Base):
     __tablename__ = 'learning_platforms'
 
     id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey('users.id'))
+    user_id = Column(String, ForeignKey('users.id'), index=True)
     platform_name = Column(String)  # e.g., "LinkedIn Learning", "Coursera", "Udemy"
     api_key = Column(String)
     api_secret = Column(String, nullable=True)
@@ -205,7 +255,7 @@ class LearningCourse(Base):
     __tablename__ = 'learning_courses'
 
     id = Column(String, primary_key=True, index=True)
-    platform_id = Column(String, ForeignKey('learning_platforms.id'))
+    platform_id = Column(String, ForeignKey('learning_platforms.id'), index=True)
     course_id = Column(String)  # External course ID from the platform
     title = Column(String)
     description = Column(String, nullable=True)
@@ -215,4 +265,43 @@ class LearningCourse(Base):
     enrollment_date = Column(DateTime, default=dt.utcnow)
     completion_date = Column(DateTime, nullable=True)
 
-    platform = relationship("LearningPlatform", back_populates="courses")
\ No newline at end of file
+    platform = relationship("LearningPlatform", back_populates="courses")
+
+    __table_args__ = (
+        Index('ix_learning_courses_platform_enrolled', 'platform_id', 'enrollment_date', 'id'),
+    )
+
+
+# Transactional outbox: one row per mutation, written in the mutation's transaction
+class OutboxEvent(Base):
+    __tablename__ = 'outbox_events'
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    event_type = Column(String, nullable=False)  # e.g. "task.updated"
+    aggregate_type = Column(String, nullable=False)  # task, goal, sub_goal, okr, key_result, analytics
+    aggregate_id = Column(String, nullable=True)
+    user_id = Column(String, nullable=True)  # User who made the change
+    goal_id = Column(String, nullable=True)
+    sub_goal_id = Column(String, nullable=True)
+    team_id = Column(String, nullable=True)
+    payload = Column(Text)  # JSON
+    created_at = Column(DateTime, default=dt.utcnow)
+
+    # AUTOINCREMENT so sequence numbers are never reused after consumed rows are pruned
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class OutboxCheckpoint(Base):
+    __tablename__ = 'outbox_checkpoints'
+
+    consumer = Column(String, primary_key=True)  # e.g. "analytics", "reminders", "websocket"
+    last_seq = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=dt.utcnow, onupdate=dt.utcnow)
+
+# Version stamp of a group of resources (e.g. one user's goals), replaced on every
+# write to them; conditional GETs derive their ETags from it
+class ResourceVersion(Base):
+    __tablename__ = 'resource_versions'
+
+    scope = Column(String, primary_key=True)  # e.g. "goals:<user_id>", "team:<team_id>"
+    stamp = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=dt.utcnow, onupdate=dt.utcnow)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import datetime
 from datetime import date
 
@@ -35,7 +35,8 @@ class TeamCreate(TeamBase):
 class Team(TeamBase):
     id: str
     owner_id: str
-    created_at: datetime.datetime
+    # Teams created before the column was added have none
+    created_at: Optional[datetime.datetime] = None
 
     class Config:
         from_attributes = True
@@ -65,9 +66,13 @@ class GoalCreate(GoalBase):
     pass
 
 class Goal(GoalBase):
+    # Goals stored before target dates were required may have none
+    target_date: Optional[datetime.datetime] = None
     id: str
     owner_id: str
     team_id: Optional[str] = None
+    total_tasks: int = 0
+    done_tasks: int = 0
 
     class Config:
         from_attributes = True
@@ -84,18 +89,24 @@ class SubGoalCreate(SubGoalBase):
 class SubGoal(SubGoalBase):
     id: str
     goal_id: str
+    total_tasks: int = 0
+    done_tasks: int = 0
 
     class Config:
         from_attributes = True
 
+class SubGoalBulkUpdate(SubGoalCreate):
+    id: str
+
 # --- Task Schemas ---
 class TaskBase(BaseModel):
-    sub_goal_id: str
+    sub_goal_id: Optional[str] = None
     planned_start: Optional[datetime.datetime] = None
     planned_end: Optional[datetime.datetime] = None
     status: str = "todo"
     priority: int = 1
     dependencies: Optional[str] = None
+    reminder_interval: Optional[int] = None
 
 class TaskCreate(TaskBase):
     pass
@@ -106,6 +117,16 @@ class Task(TaskBase):
     class Config:
         from_attributes = True
 
+class TaskBulkUpdate(TaskCreate):
+    id: str
+
+# --- Goal tree Schemas ---
+class SubGoalTree(SubGoal):
+    tasks: List[Task] = []
+
+class GoalTree(Goal):
+    sub_goals: List[SubGoalTree] = []
+
 class RescheduleTask(BaseModel):
     planned_start: datetime.datetime
     planned_end: datetime.datetime
@@ -281,4 +302,32 @@ class LearningPlatform(LearningPlatformBase):
     courses: List[LearningCourse] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Bulk Schemas
+class BulkItemError(BaseModel):
+    index: int
+    status: int
+    detail: str
+
+class BulkResult(BaseModel):
+    ids: List[Optional[str]]
+    errors: List[BulkItemError] = []
+
+# Batch Schemas
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+class BatchItemResult(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = {}
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchItemResult]
@@ -1,7 +1,9 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from unittest.mock import AsyncMock, patch, Mock
 
 # Mock the websocket manager before it's imported by the app
@@ -10,10 +12,13 @@ mock_manager = AsyncMock()
 websocket_manager.manager = mock_manager
 
 from backend.main import app
-from backend.database import get_db
-from backend.models.models import Base, User, Goal, SubGoal, Task, Notification, RecurringTask, CalendarIntegration
+from backend.database import get_async_db, get_db
+from backend.models.models import Base, User, Goal, SubGoal, Task, Notification, RecurringTask, CalendarIntegration, Team, TeamMember
 from backend.core.auth import get_password_hash
+from backend.core.http_cache import response_cache, version_stamps
+from backend.core.principal_cache import principal_cache
 import datetime
+import json
 import uuid
 
 # Setup a test database
@@ -22,6 +27,9 @@ engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Each TestClient runs its own event loop, so async connections are not pooled across tests
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Override the get_db dependency for testing
 @pytest.fixture(name="session")
@@ -36,7 +44,15 @@ def session_fixture():
 def client_fixture(session):
     def override_get_db():
         yield session
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    # Tokens minted in the same second are identical across tests
+    principal_cache.clear()
+    version_stamps.clear()
+    response_cache.clear()
     with TestClient(app) as client:
         yield client
     app.dependency_overrides.clear()
@@ -620,4 +636,784 @@ def test_goal_decomposition_and_scheduling_integration(client):
     assert notifications_response.status_code == 200
     assert len(notifications_response.json()) > 0
     from backend.core.websocket_manager import manager
-    manager.send_personal_message.assert_called() # Check if it was called at least once
\ No newline at end of file
+    manager.send_personal_message.assert_called() # Check if it was called at least once
+
+def test_notification_feed_pagination_and_etag(client):
+    token = get_test_user_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+    for i in range(5):
+        client.post(
+            "/api/notifications/",
+            headers=headers,
+            json={
+                "user_id": user_id,
+                "message": f"Notification {i}",
+                "notification_time": f"2025-08-05T1{i}:00:00",
+                "method": "push"
+            }
+        )
+
+    first_page = client.get("/api/notifications/me?limit=2", headers=headers)
+    assert first_page.status_code == 200
+    assert [n["message"] for n in first_page.json()] == ["Notification 4", "Notification 3"]
+    cursor = first_page.headers["X-Next-Cursor"]
+
+    second_page = client.get(f"/api/notifications/me?limit=2&cursor={cursor}", headers=headers)
+    assert [n["message"] for n in second_page.json()] == ["Notification 2", "Notification 1"]
+
+    # Filters
+    window = client.get("/api/notifications/me?since=2025-08-05T11:00:00&until=2025-08-05T13:00:00", headers=headers)
+    assert [n["message"] for n in window.json()] == ["Notification 2", "Notification 1"]
+    assert client.get("/api/notifications/me?is_sent=true", headers=headers).json() == []
+
+    # Unchanged feed answers 304; marking a notification sent changes the ETag
+    etag = first_page.headers["ETag"]
+    not_modified = client.get("/api/notifications/me?limit=2", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    client.put(f"/api/notifications/{first_page.json()[0]['id']}/mark_sent", headers=headers)
+    modified = client.get("/api/notifications/me?limit=2", headers={**headers, "If-None-Match": etag})
+    assert modified.status_code == 200
+
+    assert client.get("/api/notifications/me?cursor=not-a-cursor", headers=headers).status_code == 400
+
+def test_keyset_pages_continue_past_null_sort_keys(client, session):
+    from backend.core.pagination import keyset_page
+
+    token = get_test_user_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+    for i, hour in enumerate([10, None, 11, None, 12]):
+        session.add(Notification(
+            id=f"n{i}", user_id=user_id, message=f"Notification {i}", method="push",
+            notification_time=datetime.datetime(2025, 8, 5, hour) if hour is not None else None,
+        ))
+    session.commit()
+
+    def walk(page):
+        messages, cursor = [], None
+        while True:
+            rows, cursor = page(cursor)
+            messages += [row["message"] if isinstance(row, dict) else row.message for row in rows]
+            if cursor is None:
+                return messages
+
+    # Timed notifications newest first, then the untimed ones, across page boundaries
+    def feed(cursor):
+        response = client.get("/api/notifications/me", headers=headers, params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        return response.json(), response.headers.get("X-Next-Cursor")
+    assert walk(feed) == ["Notification 4", "Notification 2", "Notification 0", "Notification 3", "Notification 1"]
+
+    query = session.query(Notification).filter(Notification.user_id == user_id)
+    ascending = lambda cursor: keyset_page(query, Notification.notification_time, Notification.id, cursor, 1, descending=False)
+    assert walk(ascending) == ["Notification 0", "Notification 2", "Notification 4", "Notification 1", "Notification 3"]
+    since = query.filter(Notification.notification_time >= datetime.datetime(2025, 8, 5, 11))
+    assert walk(lambda cursor: keyset_page(since, Notification.notification_time, Notification.id, cursor, 1)) == ["Notification 4", "Notification 2"]
+
+def test_notification_uses_task_reminder_interval(client, session):
+    token = get_test_user_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+    goal_id = client.post("/api/goals/", headers=headers, json={"title": "Goal", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}).json()["id"]
+    sub_goal_id = client.post("/api/sub_goals/", headers=headers, json={"goal_id": goal_id, "title": "Sub-goal", "target_date": "2025-12-31T23:59:59"}).json()["id"]
+    custom_task_id = client.post("/api/tasks/", headers=headers, json={"sub_goal_id": sub_goal_id, "planned_start": "2025-08-05T09:00:00", "reminder_interval": 45}).json()["id"]
+    default_task_id = client.post("/api/tasks/", headers=headers, json={"sub_goal_id": sub_goal_id, "planned_start": "2025-08-05T09:00:00"}).json()["id"]
+
+    def notify(task_id):
+        return client.post(
+            "/api/notifications/",
+            headers=headers,
+            json={"user_id": user_id, "task_id": task_id, "message": "Reminder", "notification_time": "2025-08-05T00:00:00", "method": "push"}
+        )
+
+    assert notify(custom_task_id).json()["notification_time"] == "2025-08-05T08:15:00"
+    assert notify(default_task_id).json()["notification_time"] == "2025-08-05T08:30:00"
+
+    # The user's preferred interval applies to tasks without their own
+    client.post("/api/preferences/", headers=headers, json={"user_id": user_id, "preference_key": "reminder_interval_minutes", "preference_value": "10"})
+    assert notify(default_task_id).json()["notification_time"] == "2025-08-05T08:50:00"
+    assert notify("missing-task").status_code == 404
+
+    from backend.ml.reminder_optimizer import get_reminder_intervals
+    intervals = get_reminder_intervals(session, [custom_task_id, default_task_id, "missing-task"], user_id)
+    assert intervals == {custom_task_id: datetime.timedelta(minutes=45), default_task_id: datetime.timedelta(minutes=10)}
+
+def test_goal_topic_authorization_and_change_events(client, session):
+    from backend.core.events import authorize_topic
+    from backend.core.websocket_manager import manager
+
+    token = get_test_user_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+    goal_id = client.post("/api/goals/", headers=headers, json={"title": "Goal", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}).json()["id"]
+    sub_goal_id = client.post("/api/sub_goals/", headers=headers, json={"goal_id": goal_id, "title": "Sub-goal", "target_date": "2025-12-31T23:59:59"}).json()["id"]
+
+    assert authorize_topic(session, user_id, f"goal:{goal_id}")
+    assert authorize_topic(session, user_id, f"sub_goal:{sub_goal_id}")
+    assert not authorize_topic(session, "someone-else", f"goal:{goal_id}")
+    assert not authorize_topic(session, user_id, "team:unknown")
+    assert not authorize_topic(session, user_id, "user:1")
+
+    manager.publish.reset_mock()
+    client.post("/api/tasks/", headers=headers, json={"sub_goal_id": sub_goal_id, "status": "todo"})
+    topics = {call.args[0] for call in manager.publish.call_args_list}
+    assert topics == {f"goal:{goal_id}", f"sub_goal:{sub_goal_id}"}
+    event = json.loads(manager.publish.call_args_list[0].args[1])
+    assert event["type"] == "task.created"
+    assert event["data"]["sub_goal_id"] == sub_goal_id
+
+def test_websocket_requires_a_token_for_the_path_user(client):
+    from starlette.websockets import WebSocketDisconnect
+    from backend.core.websocket_manager import manager
+
+    token = get_test_user_token(client)
+    user_id = client.get("/api/users/me", headers={"Authorization": f"Bearer {token}"}).json()["id"]
+    other_token = get_test_user_token(client, email="other@example.com")
+    other_id = client.get("/api/users/me", headers={"Authorization": f"Bearer {other_token}"}).json()["id"]
+
+    manager.connect.reset_mock()
+    for url, subprotocols in [
+        (f"/ws/{user_id}", None),
+        (f"/ws/{user_id}?token=not-a-token", None),
+        (f"/ws/{user_id}?token={other_token}", None),
+        (f"/ws/{other_id}", [f"bearer.{token}"]),
+    ]:
+        with pytest.raises(WebSocketDisconnect) as rejected:
+            with client.websocket_connect(url, subprotocols=subprotocols):
+                pass
+        assert rejected.value.code == 1008
+    manager.connect.assert_not_called()
+
+    async def accept(websocket, _):
+        await websocket.accept()
+    manager.connect.side_effect = accept
+    try:
+        for url, subprotocols in [(f"/ws/{user_id}?token={token}", None), (f"/ws/{user_id}", [f"bearer.{token}"])]:
+            with client.websocket_connect(url, subprotocols=subprotocols):
+                pass
+    finally:
+        manager.connect.side_effect = None
+    assert [call.args[1] for call in manager.connect.call_args_list] == [user_id, user_id]
+
+def test_outbox_records_changes_and_checkpoints_consumers(client, session):
+    from backend.core import outbox
+    from backend.models import schemas
+    from backend.models.models import OutboxEvent, OutboxCheckpoint
+
+    token = get_test_user_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    goal_id = client.post("/api/goals/", headers=headers, json={"title": "Goal", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}).json()["id"]
+    sub_goal_id = client.post("/api/sub_goals/", headers=headers, json={"goal_id": goal_id, "title": "Sub-goal", "target_date": "2025-12-31T23:59:59"}).json()["id"]
+    task_id = client.post("/api/tasks/", headers=headers, json={"sub_goal_id": sub_goal_id, "status": "todo"}).json()["id"]
+    client.put(f"/api/tasks/{task_id}", headers=headers, json={"sub_goal_id": sub_goal_id, "status": "done"})
+
+    events = session.query(OutboxEvent).order_by(OutboxEvent.seq).all()
+    assert [e.event_type for e in events] == ["goal.created", "sub_goal.created", "task.created", "task.updated"]
+    assert [e.seq for e in events] == sorted(e.seq for e in events)
+    assert events[-1].aggregate_type == "task" and events[-1].aggregate_id == task_id
+    updated = json.loads(events[-1].payload)
+    assert updated["status"] == "done"
+    # The completion notification committed in the same transaction as the update
+    assert session.query(Notification).filter(Notification.task_id == task_id).count() == 1
+
+    # A rolled-back change leaves no outbox row
+    outbox.record_change(session, "goal.updated", {"id": goal_id}, goal_id=goal_id)
+    session.rollback()
+    assert session.query(OutboxEvent).count() == 4
+
+    seen = []
+    def handler(db, batch):
+        seen.extend(e.event_type for e in batch)
+
+    assert outbox.consume(session, "analytics", handler, batch_size=3) == 3
+    assert outbox.consume(session, "analytics", handler, batch_size=3) == 1
+    assert outbox.consume(session, "analytics", handler, batch_size=3) == 0
+    assert seen == [e.event_type for e in events]
+    assert outbox.get_offset(session, "analytics") == events[-1].seq
+
+    # A failing handler does not advance the checkpoint, so the batch is retried
+    def failing(db, batch):
+        raise RuntimeError("boom")
+    with pytest.raises(RuntimeError):
+        outbox.consume(session, "reminders", failing)
+    assert outbox.get_offset(session, "reminders") == 0
+    assert outbox.consume(session, "reminders", lambda db, batch: None) == 4
+
+    # Events are pruned once every consumer has processed them
+    assert outbox.prune_consumed(session) == 4
+    assert session.query(OutboxEvent).count() == 0
+    assert session.query(OutboxCheckpoint).count() == 2
+
+    # Task events carry the Task schema whether or not the task is in a sub-goal
+    loose_id = client.post("/api/tasks/", headers=headers, json={"sub_goal_id": None}).json()["id"]
+    loose = session.query(OutboxEvent).filter(OutboxEvent.aggregate_id == loose_id).one()
+    assert json.loads(loose.payload).keys() == updated.keys() == set(schemas.Task.model_fields)
+
+def test_ownership_is_enforced_with_one_query(client):
+    from sqlalchemy import event
+
+    owner = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    other = {"Authorization": f"Bearer {get_test_user_token(client, email='other@example.com')}"}
+    other_id = client.get("/api/users/me", headers=other).json()["id"]
+    goal_id = client.post("/api/goals/", headers=owner, json={"title": "Goal", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}).json()["id"]
+    sub_goal_id = client.post("/api/sub_goals/", headers=owner, json={"goal_id": goal_id, "title": "Sub-goal", "description": "Read", "target_date": "2025-12-31T23:59:59"}).json()["id"]
+    task_id = client.post("/api/tasks/", headers=owner, json={"sub_goal_id": sub_goal_id, "planned_start": "2025-08-05T09:00:00"}).json()["id"]
+
+    assert client.get(f"/api/goals/{goal_id}", headers=other).status_code == 403
+    assert client.delete(f"/api/goals/{goal_id}", headers=other).status_code == 403
+    assert client.get(f"/api/sub_goals/{sub_goal_id}", headers=other).status_code == 403
+    assert client.post(f"/api/sub_goals/{sub_goal_id}/schedule/", headers=other).status_code == 403
+    assert client.get(f"/api/sub_goals/{sub_goal_id}/tasks/", headers=other).status_code == 403
+    assert client.get(f"/api/tasks/{task_id}", headers=other).status_code == 403
+    assert client.get("/api/tasks/missing", headers=other).status_code == 404
+    notification = {"user_id": other_id, "task_id": task_id, "message": "Hi", "notification_time": "2025-08-05T08:00:00", "method": "push"}
+    assert client.post("/api/notifications/", headers=other, json=notification).status_code == 403
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        assert client.get(f"/api/tasks/{task_id}", headers=owner).status_code == 200
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    # The user is already cached, so just the task joined to its sub-goal and goal
+    assert len(statements) == 1
+    assert "JOIN goals" in statements[0]
+
+def test_orphaned_rows_are_not_readable_by_other_users(client, session):
+    owner = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    other = {"Authorization": f"Bearer {get_test_user_token(client, email='other@example.com')}"}
+    goal = {"title": "Goal", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}
+    goal_id = client.post("/api/goals/", headers=owner, json=goal).json()["id"]
+    sub_goal_id = client.post("/api/sub_goals/", headers=owner, json={"goal_id": goal_id, "title": "Sub-goal", "description": "Read", "target_date": "2025-12-31T23:59:59"}).json()["id"]
+    task_id = client.post("/api/tasks/", headers=owner, json={"sub_goal_id": sub_goal_id, "planned_start": "2025-08-05T09:00:00"}).json()["id"]
+    update = {"sub_goal_id": sub_goal_id, "planned_start": "2025-08-06T09:00:00", "status": "done"}
+
+    # Rows left without a goal by an older delete are missing, not public
+    session.query(SubGoal).filter_by(id=sub_goal_id).update({"goal_id": None})
+    session.commit()
+    assert client.get(f"/api/tasks/{task_id}", headers=other).status_code == 404
+    assert client.put(f"/api/tasks/{task_id}", headers=other, json=update).status_code == 404
+    assert client.get(f"/api/sub_goals/{sub_goal_id}/tasks/", headers=other).status_code == 404
+    assert client.get(f"/api/sub_goals/{sub_goal_id}", headers=other).status_code == 404
+
+    # Deleting a goal takes its sub-goals and tasks with it
+    goal_id = client.post("/api/goals/", headers=owner, json=goal).json()["id"]
+    session.query(SubGoal).filter_by(id=sub_goal_id).update({"goal_id": goal_id})
+    session.commit()
+    assert client.delete(f"/api/goals/{goal_id}", headers=owner).status_code == 200
+    session.expire_all()
+    assert session.get(SubGoal, sub_goal_id) is None
+    assert session.get(Task, task_id) is None
+    assert client.get(f"/api/tasks/{task_id}", headers=other).status_code == 404
+    assert client.put(f"/api/tasks/{task_id}", headers=other, json=update).status_code == 404
+
+    # Tasks without a sub-goal stay reachable
+    unparented = client.post("/api/tasks/", headers=owner, json={"planned_start": "2025-08-05T09:00:00"}).json()["id"]
+    assert client.get(f"/api/tasks/{unparented}", headers=owner).status_code == 200
+
+def test_principal_cache_skips_user_lookup_and_is_invalidated_on_update(client):
+    from sqlalchemy import event
+
+    token = get_test_user_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        me = client.get("/api/users/me", headers=headers).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert me["daily_start_hour"] == 9
+    assert statements == []
+
+    invalidations = client.get("/metrics/auth").json()["invalidations"]
+    client.put(f"/api/users/{user_id}", headers=headers, json={"email": "test@example.com", "password": "testpassword", "daily_start_hour": 6, "daily_end_hour": 15})
+    assert client.get("/api/users/me", headers=headers).json()["daily_start_hour"] == 6
+
+    metrics = client.get("/metrics/auth").json()
+    assert metrics["hits"] >= 2
+    assert metrics["invalidations"] == invalidations + 1
+    assert 0 < metrics["hit_rate"] < 1
+
+def test_principal_cache_evicts_and_expires():
+    from backend.core.principal_cache import Principal, PrincipalCache
+
+    cache = PrincipalCache(max_size=2, max_age=60)
+    principal = lambda user_id: Principal(user_id, f"{user_id}@example.com", True, 9, 17, "free", 3)
+    for token in ("a", "b", "c"):
+        cache.put(token, principal(token), expires_at=1000, version=cache.version, now=0)
+    assert cache.get("a", now=1) is None
+    assert cache.get("c", now=1).id == "c"
+    assert cache.get("c", now=61) is None  # max_age caps the token's own expiry
+
+    # A lookup that raced an invalidation does not cache what it read
+    version = cache.version
+    cache.invalidate_user("b")
+    cache.put("d", principal("d"), expires_at=1000, version=version, now=0)
+    assert cache.get("b", now=1) is None and cache.get("d", now=1) is None
+    assert cache.metrics()["evictions"] == 1
+
+def test_login_rehashes_passwords_with_another_cost(client, session):
+    from backend.core.password_hashing import hash_password, password_hasher
+
+    session.add(User(id="legacy-user", email="legacy@example.com", hashed_password=hash_password("secret", 4)))
+    session.commit()
+    response = client.post("/api/token", data={"username": "legacy@example.com", "password": "secret"})
+    assert response.status_code == 200
+    session.expire_all()
+    assert session.get(User, "legacy-user").hashed_password.startswith(f"$2b${password_hasher.rounds:02d}$")
+    assert client.post("/api/token", data={"username": "legacy@example.com", "password": "wrong"}).status_code == 401
+
+def test_password_hasher_sheds_load_when_saturated():
+    import asyncio
+    from fastapi import HTTPException
+    from backend.core.password_hashing import PasswordHasher
+
+    hasher = PasswordHasher(workers=1, max_pending=1, rounds=4)
+
+    async def burst():
+        return await asyncio.gather(hasher.hash("a"), hasher.hash("b"), return_exceptions=True)
+
+    try:
+        first, second = asyncio.run(burst())
+    finally:
+        hasher.stop()
+    assert first.startswith("$2b$04$")
+    assert isinstance(second, HTTPException) and second.status_code == 503
+    assert second.headers["Retry-After"] == "1"
+    assert hasher.metrics()["shed"] == 1
+
+def test_password_hashing_benchmark_runs():
+    from backend.benchmarks import password_hashing
+
+    summaries = password_hashing.main(["--clients", "2", "--seconds", "0.2", "--rounds", "4", "--workers", "1"])
+    assert set(summaries) == {"inline", "pool-1"}
+    assert all(summary["logins_per_second"] > 0 for summary in summaries.values())
+
+def test_progress_counters_follow_task_changes_and_can_be_repaired(client, session):
+    from backend.core.progress import recompute_progress
+
+    headers = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    goal_id = client.post("/api/goals/", headers=headers, json={"title": "Goal", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}).json()["id"]
+    other_goal_id = client.post("/api/goals/", headers=headers, json={"title": "Other", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}).json()["id"]
+    sub_goal = {"goal_id": goal_id, "title": "Sub-goal", "target_date": "2025-12-31T23:59:59"}
+    first_id = client.post("/api/sub_goals/", headers=headers, json=sub_goal).json()["id"]
+    second_id = client.post("/api/sub_goals/", headers=headers, json=sub_goal).json()["id"]
+    task_ids = [client.post("/api/tasks/", headers=headers, json={"sub_goal_id": first_id}).json()["id"] for _ in range(3)]
+
+    def progress(path):
+        body = client.get(path, headers=headers).json()
+        return body["total_tasks"], body["done_tasks"]
+
+    client.put(f"/api/tasks/{task_ids[0]}", headers=headers, json={"sub_goal_id": first_id, "status": "done"})
+    assert progress(f"/api/goals/{goal_id}") == (3, 1)
+    assert progress(f"/api/sub_goals/{first_id}") == (3, 1)
+
+    # Moving a completed task carries both counts; deleting one drops it
+    client.put(f"/api/tasks/{task_ids[0]}", headers=headers, json={"sub_goal_id": second_id, "status": "done"})
+    client.delete(f"/api/tasks/{task_ids[1]}", headers=headers)
+    assert progress(f"/api/sub_goals/{first_id}") == (1, 0)
+    assert progress(f"/api/sub_goals/{second_id}") == (1, 1)
+    assert progress(f"/api/goals/{goal_id}") == (2, 1)
+
+    # Moving a sub-goal moves its counts between goals
+    client.put(f"/api/sub_goals/{second_id}", headers=headers, json={**sub_goal, "goal_id": other_goal_id})
+    assert progress(f"/api/goals/{goal_id}") == (1, 0)
+    assert progress(f"/api/goals/{other_goal_id}") == (1, 1)
+
+    # The repair job rewrites only the rows that drifted
+    session.query(SubGoal).filter(SubGoal.id == first_id).update({"total_tasks": 7})
+    session.query(Goal).filter(Goal.id == other_goal_id).update({"done_tasks": 0})
+    session.commit()
+    assert recompute_progress(session) == {"sub_goals": 1, "goals": 1}
+    session.commit()
+    assert progress(f"/api/sub_goals/{first_id}") == (1, 0)
+    assert progress(f"/api/goals/{other_goal_id}") == (1, 1)
+    assert recompute_progress(session) == {"sub_goals": 0, "goals": 0}
+
+def test_goal_tree_loads_in_three_queries_with_projection(client):
+    from sqlalchemy import event
+
+    headers = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    goal_ids = []
+    for title in ("Later", "Sooner"):
+        target_date = "2026-06-30T00:00:00" if title == "Later" else "2025-12-31T00:00:00"
+        goal_id = client.post("/api/goals/", headers=headers, json={"title": title, "target_date": target_date, "methodology": "SMART"}).json()["id"]
+        goal_ids.append(goal_id)
+        for _ in range(3):
+            sub_goal_id = client.post("/api/sub_goals/", headers=headers, json={"goal_id": goal_id, "title": "Sub-goal", "target_date": target_date}).json()["id"]
+            for _ in range(2):
+                client.post("/api/tasks/", headers=headers, json={"sub_goal_id": sub_goal_id})
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        tree = client.get(f"/api/goals/{goal_ids[0]}/tree", headers=headers).json()
+        assert len(statements) == 3
+        del statements[:]
+        # A full page: goals, then their sub-goals, then their tasks
+        assert len(client.get("/api/goals/tree", headers=headers, params={"limit": 1}).json()) == 1
+        assert len(statements) == 3
+        del statements[:]
+        # The last page also looks for goals without a target date
+        trees = client.get("/api/goals/tree", headers=headers, params={"fields": "id,title,done_tasks", "sub_goal_fields": "id", "task_fields": "id,status"})
+        assert len(statements) == 4
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    assert tree["total_tasks"] == 6
+    assert len(tree["sub_goals"]) == 3 and all(len(sub_goal["tasks"]) == 2 for sub_goal in tree["sub_goals"])
+    assert tree["sub_goals"][0]["tasks"][0]["sub_goal_id"] == tree["sub_goals"][0]["id"]
+
+    assert trees.status_code == 200
+    assert [goal["title"] for goal in trees.json()] == ["Sooner", "Later"]
+    first = trees.json()[0]
+    assert set(first) == {"id", "title", "done_tasks", "sub_goals"}
+    assert set(first["sub_goals"][0]) == {"id", "tasks"}
+    assert set(first["sub_goals"][0]["tasks"][0]) == {"id", "status"}
+
+    page = client.get("/api/goals/tree", headers=headers, params={"limit": 1})
+    assert [goal["id"] for goal in page.json()] == [goal_ids[1]]
+    assert client.get("/api/goals/tree", headers=headers, params={"cursor": page.headers["X-Next-Cursor"]}).json()[0]["id"] == goal_ids[0]
+    assert client.get("/api/goals/tree", headers=headers, params={"task_fields": "secret"}).status_code == 400
+
+    other = {"Authorization": f"Bearer {get_test_user_token(client, email='other@example.com')}"}
+    assert client.get(f"/api/goals/{goal_ids[0]}/tree", headers=other).status_code == 403
+    assert client.get("/api/goals/tree", headers=other).json() == []
+
+def test_goals_without_a_target_date_are_listed_last(client, session):
+    headers = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+    for title in ("Dated", "Other"):
+        client.post("/api/goals/", headers=headers, json={"title": title, "target_date": "2025-12-31T00:00:00", "methodology": "SMART"})
+    session.add(Goal(id="undated", title="Undated", methodology="SMART", owner_id=user_id))
+    session.commit()
+
+    first = client.get("/api/goals/", headers=headers, params={"limit": 2})
+    assert sorted(goal["title"] for goal in first.json()) == ["Dated", "Other"]
+    rest = client.get("/api/goals/", headers=headers, params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]}).json()
+    assert [(goal["id"], goal["target_date"]) for goal in rest] == [("undated", None)]
+    trees = client.get("/api/goals/tree", headers=headers).json()
+    assert [goal["title"] for goal in trees][-1] == "Undated"
+
+def test_list_endpoints_are_owner_scoped_and_keyset_paginated(client):
+    headers = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    other = {"Authorization": f"Bearer {get_test_user_token(client, email='other@example.com')}"}
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+    client.post("/api/goals/", headers=other, json={"title": "Not mine", "target_date": "2025-01-01T00:00:00", "methodology": "SMART"})
+    for day in (3, 1, 2):
+        client.post("/api/goals/", headers=headers, json={"title": f"Day {day}", "target_date": f"2025-01-0{day}T00:00:00", "methodology": "SMART"})
+        client.post("/api/preferences/", headers=headers, json={"user_id": user_id, "preference_key": f"key{day}", "preference_value": "v"})
+
+    def walk(path):
+        pages, params = [], {"limit": 2}
+        while True:
+            response = client.get(path, headers=headers, params=params)
+            assert response.status_code == 200
+            pages.append(response.json())
+            if "X-Next-Cursor" not in response.headers:
+                return pages
+            params = {"limit": 2, "cursor": response.headers["X-Next-Cursor"]}
+
+    assert [[goal["title"] for goal in page] for page in walk("/api/goals/")] == [["Day 1", "Day 2"], ["Day 3"]]
+    assert [[pref["preference_key"] for pref in page] for page in walk("/api/preferences/")] == [["key1", "key2"], ["key3"]]
+    assert client.get("/api/goals/", headers=headers, params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/goals/", headers=headers, params={"limit": 1000}).status_code == 422
+
+def test_conditional_get_and_response_cache_follow_writes(client, monkeypatch):
+    from sqlalchemy import event
+
+    monkeypatch.setattr(response_cache, "max_size", 100)
+    headers = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    goal = {"title": "Goal", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}
+    goal_id = client.post("/api/goals/", headers=headers, json=goal).json()["id"]
+
+    first = client.get("/api/goals/", headers=headers)
+    etag = first.headers["ETag"]
+    assert client.get("/api/goals/", headers={**headers, "If-None-Match": etag}).status_code == 304
+    # Another URL under the same stamp has its own ETag
+    assert client.get(f"/api/goals/{goal_id}", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        cached = client.get("/api/goals/", headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert statements == []
+    assert cached.json() == first.json() and cached.headers["ETag"] == etag
+
+    # A write replaces the stamp: old ETags miss and the cache is bypassed
+    client.put(f"/api/goals/{goal_id}", headers=headers, json={**goal, "title": "Renamed"})
+    changed = client.get("/api/goals/", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()[0]["title"] == "Renamed"
+    assert changed.headers["ETag"] != etag
+
+    # Another worker only sees the stamp in the database
+    version_stamps.clear()
+    assert client.get("/api/goals/", headers={**headers, "If-None-Match": changed.headers["ETag"]}).status_code == 304
+
+    metrics = client.get("/metrics/http_cache").json()
+    assert metrics["hits"] >= 1 and metrics["not_modified"] == 2
+
+def test_conditional_reads_are_authorized_before_the_cache(client, session, monkeypatch):
+    monkeypatch.setattr(response_cache, "max_size", 100)
+    admin = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    member = {"Authorization": f"Bearer {get_test_user_token(client, email='member@example.com')}"}
+    admin_id = client.get("/api/users/me", headers=admin).json()["id"]
+    member_id = client.get("/api/users/me", headers=member).json()["id"]
+    team_id = "team"
+    session.add(Team(id=team_id, name="Team", owner_id=admin_id))
+    session.add(TeamMember(id="admin", team_id=team_id, user_id=admin_id, role="admin"))
+    session.commit()
+    assert client.post(f"/api/teams/{team_id}/members/", headers=admin, json={"user_id": member_id}).status_code == 200
+    okr = {"team_id": team_id, "title": "Ship", "objective": "Grow", "quarter": "Q1", "year": 2025}
+    okr_id = client.post(f"/api/teams/{team_id}/okrs/", headers=admin, json=okr).json()["id"]
+
+    urls = [f"/api/teams/{team_id}/okrs/", f"/api/teams/{team_id}/okrs/{okr_id}"]
+    etags = {}
+    for url in urls:
+        first = client.get(url, headers=member)
+        assert first.status_code == 200
+        etags[url] = first.headers["ETag"]
+        assert client.get(url, headers={**member, "If-None-Match": etags[url]}).status_code == 304
+
+    # Removed by another worker: this one still remembers the team's stamp
+    session.query(TeamMember).filter_by(user_id=member_id).delete()
+    session.commit()
+    for url in urls:
+        assert client.get(url, headers={**member, "If-None-Match": etags[url]}).status_code == 403
+        assert client.get(url, headers=member).status_code == 403
+
+def test_trusted_orjson_serialization_matches_validated_output():
+    from typing import List
+    from pydantic import TypeAdapter
+    from backend.benchmarks import serialization
+    from backend.core.serialization import dumps, trusted
+    from backend.models import models, schemas
+
+    created = datetime.datetime(2025, 1, 1, 9, 30, tzinfo=datetime.timezone.utc)
+    okr = models.TeamOKR(
+        id="okr", team_id="team", title="Ship", description=None, objective="Grow", quarter="Q1", year=2025,
+        status="active", created_at=created, updated_at=created,
+        key_results=[models.TeamOKRKeyResult(id="kr", okr_id="okr", title="Users", target_value=10, current_value=2.5, unit="k", status="in_progress", created_at=created, updated_at=created)],
+    )
+    cases = [(serialization.build_rows(kind, 3), List[schema]) for kind, schema in serialization.SCHEMAS.items()]
+    cases.append((okr, schemas.TeamOKR))
+    for content, schema in cases:
+        adapter = TypeAdapter(schema)
+        validated = adapter.validate_python(content, from_attributes=True)
+        expected = [model.model_dump(mode="json") for model in validated] if isinstance(validated, list) else validated.model_dump(mode="json")
+        assert json.loads(dumps(trusted(content, schema))) == expected == json.loads(adapter.dump_json(validated))
+    assert dumps(trusted(okr, schemas.TeamOKR)).count(b'"2025-01-01T09:30:00Z"') == 4
+
+    summaries = serialization.main(["--rows", "20", "--repeat", "2", "--kinds", "tasks"])
+    assert set(summaries) == {"tasks-stdlib", "tasks-pydantic", "tasks-orjson"}
+
+def test_compression_negotiates_streams_and_reports_per_route(client):
+    import gzip
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+    from backend.core.compression import CompressionMetrics, CompressionMiddleware, negotiate_encoding
+
+    assert negotiate_encoding("gzip, deflate", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("gzip;q=0.5, br", ["br", "gzip"]) == "br"
+    assert negotiate_encoding("br;q=0, *", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("identity", ["br", "gzip"]) is None
+    assert negotiate_encoding(None) is None
+
+    headers = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    goal_id = client.post("/api/goals/", headers=headers, json={"title": "Goal", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}).json()["id"]
+    sub_goal_id = client.post("/api/sub_goals/", headers=headers, json={"goal_id": goal_id, "title": "Sub-goal", "target_date": "2025-12-31T23:59:59"}).json()["id"]
+    for _ in range(12):
+        client.post("/api/tasks/", headers=headers, json={"sub_goal_id": sub_goal_id})
+    url = f"/api/sub_goals/{sub_goal_id}/tasks/"
+    plain = client.get(url, headers={**headers, "Accept-Encoding": "identity"})
+    compressed = client.get(url, headers={**headers, "Accept-Encoding": "gzip"})
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["vary"]
+    assert compressed.json() == plain.json()
+    assert "content-encoding" not in client.get("/health", headers={"Accept-Encoding": "gzip"}).headers
+    routes = client.get("/metrics/compression").json()["routes"]
+    tasks_route = routes["/api/sub_goals/{sub_goal_id}/tasks/"]
+    assert tasks_route["compressed"] >= 1 and tasks_route["ratio"] > 1 and tasks_route["cpu_seconds"] >= 0
+
+    # Streamed bodies are compressed chunk by chunk; encoded and binary bodies pass through
+    app = FastAPI()
+    metrics = CompressionMetrics()
+    app.add_middleware(CompressionMiddleware, minimum_size=100, metrics=metrics)
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f'{{"row": {i}}}\n'.encode() for i in range(500)), media_type="application/x-ndjson")
+
+    @app.get("/encoded")
+    def encoded():
+        return StreamingResponse(iter([gzip.compress(b"x" * 500)]), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/image")
+    def image():
+        return StreamingResponse(iter([b"\x89PNG" * 500]), media_type="image/png")
+
+    with TestClient(app) as raw:
+        streamed = raw.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert streamed.headers["content-encoding"] == "gzip" and "content-length" not in streamed.headers
+        assert streamed.text.count("row") == 500
+        assert raw.get("/encoded", headers={"Accept-Encoding": "gzip"}).text == "x" * 500
+        assert "content-encoding" not in raw.get("/image", headers={"Accept-Encoding": "gzip"}).headers
+    routes = metrics.metrics()["routes"]
+    assert routes["/stream"]["compressed"] == 1 and routes["/stream"]["bytes_in"] > 5 * routes["/stream"]["bytes_out"]
+    assert routes["/encoded"]["skipped"] == 1 and "/image" not in routes
+
+def test_batch_runs_read_only_sub_requests_with_per_item_status(client):
+    headers = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    goal_id = client.post("/api/goals/", headers=headers, json={"title": "Goal", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}).json()["id"]
+    other = {"Authorization": f"Bearer {get_test_user_token(client, email='other@example.com')}"}
+
+    paths = ["/api/users/me", "/api/goals/?limit=1", "/api/notifications/me", "/api/preferences/", "/api/teams/me", "/api/analytics/summary/?days=7"]
+    response = client.post("/api/batch", headers=headers, json={"requests": [{"id": str(i), "path": path} for i, path in enumerate(paths)]})
+    assert response.status_code == 200
+    results = response.json()["responses"]
+    assert [result["id"] for result in results] == [str(i) for i in range(len(paths))]
+    for path, result in zip(paths, results):
+        direct = client.get(path, headers=headers)
+        assert result["status"] == direct.status_code == 200
+        assert result["body"] == direct.json()
+    assert results[1]["body"][0]["id"] == goal_id and "etag" in results[1]["headers"]
+
+    results = client.post("/api/batch", headers=other, json={"requests": [
+        {"path": f"/api/goals/{goal_id}"},
+        {"path": "/api/goals/missing"},
+        {"method": "DELETE", "path": f"/api/goals/{goal_id}"},
+        {"path": "/api/batch"},
+        {"path": "http://example.com/api/users/me"},
+    ]}).json()["responses"]
+    assert [result["status"] for result in results] == [403, 404, 405, 400, 400]
+    assert client.get(f"/api/goals/{goal_id}", headers=headers).status_code == 200
+
+    assert client.post("/api/batch", json={"requests": [{"path": "/api/users/me"}]}).status_code == 401
+    assert client.post("/api/batch", headers=headers, json={"requests": [{"path": "/api/users/me"}] * 21}).status_code == 400
+
+def test_bulk_create_and_update_tasks_and_sub_goals(client, session):
+    from sqlalchemy import event
+    from backend.core.progress import recompute_progress
+
+    headers = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    other = {"Authorization": f"Bearer {get_test_user_token(client, email='other@example.com')}"}
+    goal = {"target_date": "2025-12-31T23:59:59", "methodology": "SMART"}
+    goal_id = client.post("/api/goals/", headers=headers, json={**goal, "title": "Goal"}).json()["id"]
+    second_goal_id = client.post("/api/goals/", headers=headers, json={**goal, "title": "Second"}).json()["id"]
+    other_goal_id = client.post("/api/goals/", headers=other, json={**goal, "title": "Theirs"}).json()["id"]
+    other_sub_goal_id = client.post("/api/sub_goals/", headers=other, json={"goal_id": other_goal_id, "title": "Theirs", "target_date": goal["target_date"]}).json()["id"]
+
+    sub_goal = {"title": "Phase", "target_date": goal["target_date"]}
+    result = client.post("/api/sub_goals/bulk", headers=headers, json=[
+        {**sub_goal, "goal_id": goal_id}, {**sub_goal, "goal_id": other_goal_id}, {**sub_goal, "goal_id": "missing"}, {**sub_goal, "goal_id": goal_id},
+    ]).json()
+    first_id, _, _, second_id = result["ids"]
+    assert first_id and second_id and result["ids"][1:3] == [None, None]
+    assert [(error["index"], error["status"]) for error in result["errors"]] == [(1, 403), (2, 404)]
+
+    tasks = [{"sub_goal_id": first_id if i % 2 else second_id, "status": "done" if i % 4 == 0 else "todo"} for i in range(1000)]
+    tasks += [{"sub_goal_id": other_sub_goal_id}, {"sub_goal_id": "missing"}]
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement.split()[0], executemany, statement))
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        result = client.post("/api/tasks/bulk", headers=headers, json=tasks).json()
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert sum(task_id is not None for task_id in result["ids"]) == 1000
+    assert [(error["index"], error["status"]) for error in result["errors"]] == [(1000, 403), (1001, 404)]
+    assert len([s for s in statements if s[0] == "SELECT"]) == 1
+    assert [s[1] for s in statements if "INSERT INTO tasks" in s[2]] == [True]
+    assert client.post("/api/tasks/bulk", headers=headers, json=[]).status_code == 400
+
+    first, second = client.get(f"/api/sub_goals/{first_id}", headers=headers).json(), client.get(f"/api/sub_goals/{second_id}", headers=headers).json()
+    assert (first["total_tasks"], first["done_tasks"], second["total_tasks"], second["done_tasks"]) == (500, 0, 500, 250)
+
+    task_ids = result["ids"][:4]
+    updates = [
+        {"id": task_ids[0], "sub_goal_id": second_id, "status": "todo"},
+        {"id": task_ids[1], "sub_goal_id": second_id, "status": "done"},
+        {"id": task_ids[1], "sub_goal_id": first_id, "status": "todo"},
+        {"id": task_ids[2], "sub_goal_id": other_sub_goal_id},
+        {"id": "missing", "sub_goal_id": first_id},
+    ]
+    result = client.put("/api/tasks/bulk", headers=headers, json=updates).json()
+    assert result["ids"] == [task_ids[0], task_ids[1], None, None, None]
+    assert [(error["index"], error["status"]) for error in result["errors"]] == [(2, 400), (3, 403), (4, 404)]
+    assert client.get(f"/api/tasks/{task_ids[1]}", headers=headers).json()["status"] == "done"
+    assert len(client.get("/api/notifications/me", headers=headers).json()) == 1
+
+    result = client.put("/api/sub_goals/bulk", headers=headers, json=[
+        {"id": first_id, "goal_id": second_goal_id, "title": "Moved", "target_date": goal["target_date"]},
+        {"id": other_sub_goal_id, "goal_id": goal_id, "title": "Stolen", "target_date": goal["target_date"]},
+    ]).json()
+    assert result["ids"] == [first_id, None] and result["errors"][0]["status"] == 403
+    goals = {g["id"]: g for g in client.get("/api/goals/", headers=headers).json()}
+    assert (goals[goal_id]["total_tasks"], goals[goal_id]["done_tasks"]) == (501, 250)
+    assert (goals[second_goal_id]["total_tasks"], goals[second_goal_id]["done_tasks"]) == (499, 0)
+    assert client.get(f"/api/sub_goals/{first_id}", headers=headers).json()["title"] == "Moved"
+
+    # The counters written in bulk match a rebuild from the tasks table
+    assert recompute_progress(session) == {"sub_goals": 0, "goals": 0}
+
+def test_bulk_tasks_accept_a_null_sub_goal(client, session):
+    from backend.models.models import OutboxEvent
+
+    headers = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    goal_id = client.post("/api/goals/", headers=headers, json={"title": "Goal", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}).json()["id"]
+    sub_goal_id = client.post("/api/sub_goals/", headers=headers, json={"goal_id": goal_id, "title": "Phase", "target_date": "2025-12-31T23:59:59"}).json()["id"]
+    assert client.post("/api/tasks/", headers=headers, json={"sub_goal_id": None}).status_code == 200
+
+    def events_since(seq):
+        return [(event.event_type, event.sub_goal_id) for event in session.query(OutboxEvent).filter(OutboxEvent.seq > seq).order_by(OutboxEvent.seq)]
+    seq = session.query(OutboxEvent).count()
+
+    result = client.post("/api/tasks/bulk", headers=headers, json=[{"sub_goal_id": None}, {"sub_goal_id": sub_goal_id, "status": "done"}]).json()
+    assert result["errors"] == [] and all(result["ids"])
+    loose_id, parented_id = result["ids"]
+    assert set(events_since(seq)) == {("sub_goal.tasks_created", sub_goal_id), ("task.created", None)}
+    seq = session.query(OutboxEvent).count()
+
+    # Moving a task out of its sub-goal is announced to that sub-goal
+    result = client.put("/api/tasks/bulk", headers=headers, json=[
+        {"id": loose_id, "sub_goal_id": None, "status": "done"},
+        {"id": parented_id, "sub_goal_id": None, "status": "done"},
+    ]).json()
+    assert result == {"ids": [loose_id, parented_id], "errors": []}
+    assert set(events_since(seq)) == {("sub_goal.tasks_updated", sub_goal_id), ("task.updated", None)}
+    sub_goal = client.get(f"/api/sub_goals/{sub_goal_id}", headers=headers).json()
+    assert (sub_goal["total_tasks"], sub_goal["done_tasks"]) == (0, 0)
+
+def test_recurring_and_sub_goal_changes_reach_the_outbox(client, session):
+    from backend.models.models import OutboxEvent
+
+    headers = {"Authorization": f"Bearer {get_test_user_token(client)}"}
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+    goal_id = client.post("/api/goals/", headers=headers, json={"title": "Goal", "target_date": "2025-12-31T23:59:59", "methodology": "SMART"}).json()["id"]
+    sub_goal = {"goal_id": goal_id, "title": "Sub-goal", "description": "Read", "target_date": "2025-12-31T23:59:59"}
+    sub_goal_id = client.post("/api/sub_goals/", headers=headers, json=sub_goal).json()["id"]
+    assert client.put(f"/api/sub_goals/{sub_goal_id}", headers=headers, json={**sub_goal, "title": "Renamed"}).status_code == 200
+    assert client.delete(f"/api/sub_goals/{sub_goal_id}", headers=headers).status_code == 200
+
+    recurring_task_id = client.post("/api/recurring_tasks/", headers=headers, json={"user_id": user_id, "title": "Daily", "rrule": "FREQ=DAILY", "start_date": "2025-08-04T09:00:00"}).json()["id"]
+    generated = client.post(f"/api/recurring_tasks/{recurring_task_id}/generate_tasks", headers=headers).json()
+    assert generated
+
+    events = session.query(OutboxEvent).filter(OutboxEvent.aggregate_type != "goal").order_by(OutboxEvent.seq).all()
+    assert [event.event_type for event in events] == ["sub_goal.created", "sub_goal.updated", "sub_goal.deleted"] + ["task.created"] * len(generated)
+    assert {event.user_id for event in events} == {user_id}
+    assert [event.aggregate_id for event in events[3:]] == [task["id"] for task in generated]
@@ -0,0 +1,72 @@
+import asyncio
+
+from sqlalchemy import text
+
+from backend.benchmarks import async_routes, bulk_import, db_engine
+from backend.database import add_missing_columns, async_database_url, create_async_db_engine, create_db_engine
+from backend.models import models
+
+def test_sqlite_engine_applies_pragmas(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "1234")
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+    assert engine.pool.size() == 3
+    engine.dispose()
+
+    memory = create_db_engine("sqlite://")
+    with memory.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+    with memory.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 0
+
+def test_engine_benchmark_runs():
+    summaries = db_engine.main(["--threads", "2", "--seconds", "0.2", "--rows", "200", "--sub-goals", "20"])
+    assert set(summaries) == {"sqlite-default", "sqlite-tuned"}
+    for summary in summaries.values():
+        assert summary["reads_per_second"] > 0
+        assert summary["errors"] == 0
+
+def test_async_engine_uses_async_driver_and_pragmas(tmp_path):
+    assert async_database_url("sqlite:///./app.db").drivername == "sqlite+aiosqlite"
+    assert async_database_url("postgresql://u:p@localhost/db").drivername in ("postgresql+asyncpg", "postgresql+psycopg")
+
+    async def journal_mode():
+        engine = create_async_db_engine(f"sqlite:///{tmp_path / 'app.db'}")
+        async with engine.connect() as conn:
+            journal_mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+        await engine.dispose()
+        return journal_mode
+
+    assert asyncio.run(journal_mode()) == "wal"
+
+def test_async_routes_benchmark_runs():
+    summaries = async_routes.main(["--clients", "2", "--seconds", "0.2", "--sub-goals", "5", "--tasks-per-sub-goal", "2"])
+    assert set(summaries) == {"threadpool", "blocking", "async"}
+    for summary in summaries.values():
+        assert summary["requests_per_second"] > 0
+        assert summary["errors"] == 0
+
+def test_bulk_import_benchmark_runs():
+    summaries = bulk_import.main(["--rows", "50", "--single", "5", "--sub-goals", "3"])
+    assert set(summaries) == {"single", "bulk-create", "bulk-update"}
+    for summary in summaries.values():
+        assert summary["rows_per_second"] > 0
+        assert summary["errors"] == 0
+
+def test_add_missing_columns_upgrades_existing_tables(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE goals (id VARCHAR PRIMARY KEY, title VARCHAR)"))
+        conn.execute(text("INSERT INTO goals (id, title) VALUES ('g', 'Goal')"))
+    models.Base.metadata.create_all(bind=engine)
+
+    added = add_missing_columns(engine, models.Base.metadata)
+    assert ("goals", "total_tasks") in added and ("goals", "done_tasks") in added
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT total_tasks, done_tasks FROM goals")).one() == (0, 0)
+    assert add_missing_columns(engine, models.Base.metadata) == []
+    engine.dispose()
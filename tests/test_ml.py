@@ -0,0 +1,144 @@
+import csv
+import datetime
+
+import numpy as np
+import pytest
+
+from backend.ml import train_reminder_model
+from backend.ml.enhanced_reminders import EnhancedReminderSystem, FEATURE_COUNT
+
+def _write_interactions(path, rows):
+    with open(path, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=["user_id", "task_id", "reminder_time", "action"])
+        writer.writeheader()
+        for i, (user_id, action) in enumerate(rows):
+            writer.writerow({
+                "user_id": user_id,
+                "task_id": f"task_{i}",
+                "reminder_time": datetime.datetime(2025, 1, 1, 9, 0).isoformat(),
+                "action": action,
+            })
+
+# --- Reminder Training Tests ---
+def test_reminder_features_independent_of_chunk_size(tmp_path):
+    path = tmp_path / "interactions.csv"
+    actions = ["completed", "snoozed", "ignored"]
+    _write_interactions(path, [(f"user_{i % 4}", actions[i % 3]) for i in range(50)])
+
+    total_rows = train_reminder_model.count_csv_rows(str(path))
+    assert total_rows == 50
+
+    X_small, y_small = train_reminder_model.build_training_arrays(train_reminder_model.iter_csv_chunks(str(path), 7), total_rows)
+    X_large, y_large = train_reminder_model.build_training_arrays(train_reminder_model.iter_csv_chunks(str(path), 1000), total_rows)
+    assert X_small.shape == (50, FEATURE_COUNT)
+    np.testing.assert_allclose(X_small, X_large)
+    np.testing.assert_allclose(y_small, y_large)
+
+    # First reminder for a user has no history; the next one sees the completion
+    assert X_small[0, 2] == 0.5
+    assert X_small[4, 2] == 1.0
+    assert X_small[4, 5] == 1.0
+
+def test_train_reminder_model_from_csv(tmp_path):
+    path = tmp_path / "interactions.csv"
+    _write_interactions(path, [(f"user_{i % 5}", "completed" if i % 2 else "ignored") for i in range(200)])
+    model_path = tmp_path / "reminder_model.pkl"
+
+    report = train_reminder_model.main([str(path), "--model-path", str(model_path), "--chunk-size", "64"])
+    assert report["rows"] == 200
+    assert report["rows_per_second"] > 0
+
+    system = EnhancedReminderSystem(model_path=str(model_path))
+    assert system.model is not None
+
+# --- Reminder Bandit Tests ---
+def test_reminder_bandit_learns_preferred_frequency():
+    from backend.ml.reminder_bandit import ReminderBandit
+
+    bandit = ReminderBandit(seed=0)
+    for _ in range(200):
+        frequency = bandit.select_frequency("user_1", 0)
+        bandit.update("user_1", 0, frequency, "completed" if frequency == 6 else "ignored")
+
+    rewards = bandit.expected_rewards("user_1", 0)
+    assert max(rewards, key=rewards.get) == 6
+    # Other buckets are untouched
+    assert bandit.expected_rewards("user_1", 2)[6] == 0.5
+
+def test_bandit_strategy_mode(tmp_path):
+    from backend.ml.enhanced_reminders import ReminderContext
+
+    system = EnhancedReminderSystem(model_path=str(tmp_path / "model.pkl"), strategy_mode="bandit")
+    context = ReminderContext(
+        user_id="user_1",
+        task_id="task_1",
+        task_priority=1,
+        task_deadline=datetime.datetime.now() + datetime.timedelta(days=2),
+        user_response_history=[],
+        task_completion_rate=0.5,
+        user_preferences={},
+    )
+    strategy = system.predict_reminder_strategy(context)
+    assert strategy.frequency_hours in system.bandit.arms
+    system.record_reminder_outcome("user_1", 1, strategy.frequency_hours, "completed")
+    system.save_model()
+
+    reloaded = EnhancedReminderSystem(model_path=str(tmp_path / "model.pkl"), strategy_mode="bandit")
+    assert reloaded.bandit.expected_rewards("user_1", 1)[strategy.frequency_hours] > 0.5
+
+# --- Reminder Replay Tests ---
+def test_vectorized_rules_match_rule_based_strategy():
+    from backend.ml.enhanced_reminders import ReminderContext, rule_based_frequencies
+
+    system = EnhancedReminderSystem(model_path="missing_model.pkl", strategy_mode="rules")
+    now = datetime.datetime.now()
+    for priority in (0, 1, 2):
+        for hours in (0.5, 12, 48, 100, 400):
+            context = ReminderContext("user_1", "task_1", priority, now + datetime.timedelta(hours=hours), [], 0.5, {})
+            expected = system._rule_based_strategy(context).frequency_hours
+            actual = rule_based_frequencies(np.array([priority]), np.array([hours - 0.01]))[0]
+            assert actual == expected
+
+def test_replay_reminder_strategies(tmp_path):
+    from backend.ml import replay_reminder_strategies
+
+    path = tmp_path / "interactions.csv"
+    actions = ["completed", "snoozed", "ignored"]
+    _write_interactions(path, [(f"user_{i % 3}", actions[i % 3]) for i in range(90)])
+
+    # The default strategies need no trained model
+    summaries = replay_reminder_strategies.main([str(path), "--chunk-size", "20", "--model-path", str(tmp_path / "missing.pkl")])
+    assert [s["strategy"] for s in summaries] == ["rules", "bandit"]
+    for summary in summaries:
+        assert summary["decisions"] == 90
+        assert summary["sends"] >= 90
+        assert 0.0 <= summary["response_rate_proxy"] <= 1.0
+        assert 0.0 <= summary["batch_latency_us_p50"] <= summary["batch_latency_us_p99"]
+
+def test_replay_marks_the_model_proxy_as_not_comparable(tmp_path):
+    from backend.ml import replay_reminder_strategies
+
+    path = tmp_path / "interactions.csv"
+    _write_interactions(path, [(f"user_{i % 3}", "completed" if i % 2 else "ignored") for i in range(60)])
+    model_path = str(tmp_path / "reminder_model.pkl")
+    train_reminder_model.main([str(path), "--model-path", model_path, "--n-jobs", "1"])
+
+    summaries = replay_reminder_strategies.main([str(path), "--strategies", "rules,ml", "--model-path", model_path])
+    assert {s["strategy"]: s["response_rate_proxy_comparable"] for s in summaries} == {"rules": True, "ml": False}
+
+    # A strategy that cannot be built stops the replay instead of being skipped
+    with pytest.raises(SystemExit):
+        replay_reminder_strategies.main([str(path), "--strategies", "rules,ml", "--model-path", str(tmp_path / "missing.pkl")])
+    with pytest.raises(TypeError):
+        replay_reminder_strategies.ReplayStrategy()
+
+def test_bandit_discards_posteriors_saved_for_other_arms(caplog):
+    from backend.ml.reminder_bandit import ReminderBandit
+
+    saved = ReminderBandit(arms=(1, 2), seed=0)
+    saved.update("user_1", 0, 2, "completed")
+    bandit = ReminderBandit(seed=0)
+    with caplog.at_level("WARNING", logger="backend.ml.reminder_bandit"):
+        bandit.load_state_dict(saved.state_dict())
+    assert bandit.posteriors == {}
+    assert "arms changed" in caplog.text
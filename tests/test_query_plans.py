@@ -0,0 +1,237 @@
+"""
+Query-plan regression suite.
+
+Drives every router through the API against a scratch SQLite database while
+recording the SQL it runs, then pretends each table holds 1M rows (by writing
+sqlite_stat1, which the planner reads instead of counting rows) and asserts via
+EXPLAIN QUERY PLAN that no recorded query scans a whole table and no keyset
+page sorts its rows instead of reading them in index order.
+"""
+import re
+import sqlite3
+from unittest.mock import AsyncMock
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from backend.core import websocket_manager
+if not isinstance(websocket_manager.manager, AsyncMock):
+    websocket_manager.manager = AsyncMock()
+
+from backend.main import app
+from backend.database import get_async_db, get_db
+from backend.core.pagination import encode_cursor
+from backend.core.principal_cache import principal_cache
+from backend.models.models import Base
+
+SIMULATED_ROWS = 1_000_000
+FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+
+# Sorting the matching rows instead of reading them in index order
+TEMP_SORT = re.compile(r"^USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY")
+KEYSET_PAGE = re.compile(r"ORDER BY .* LIMIT \?")
+
+# Queries whose full scan is inherent to the endpoint rather than a missing index
+ALLOWED_SCANS = set()
+
+def _seed_stats(path: str):
+    """Write planner statistics describing SIMULATED_ROWS rows per table."""
+    conn = sqlite3.connect(path)
+    conn.execute("ANALYZE")  # Creates sqlite_stat1
+    conn.execute("DELETE FROM sqlite_stat1")
+    for table in Base.metadata.tables:
+        conn.execute("INSERT INTO sqlite_stat1 VALUES (?, NULL, ?)", (table, str(SIMULATED_ROWS)))
+        for _, index, unique, *_ in conn.execute(f"PRAGMA index_list('{table}')").fetchall():
+            columns = len(conn.execute(f"PRAGMA index_info('{index}')").fetchall())
+            # Non-unique prefixes narrow 1M rows to ~10 per key; unique ones to 1
+            per_key = ["10"] * columns
+            if unique:
+                per_key[-1] = "1"
+            conn.execute("INSERT INTO sqlite_stat1 VALUES (?, ?, ?)", (table, index, " ".join([str(SIMULATED_ROWS)] + per_key)))
+    conn.commit()
+    conn.close()
+
+class _CheckedClient:
+    """A TestClient whose calls must succeed, so every recorded query comes from a working request."""
+
+    def __init__(self, client: TestClient):
+        self.client = client
+
+    def request(self, method: str, url: str, **kwargs):
+        response = self.client.request(method, url, **kwargs)
+        assert response.status_code < 400, f"{method} {url} answered {response.status_code}: {response.text[:200]}"
+        return response
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+def _exercise_routers(client: _CheckedClient):
+    """Call every router's endpoints with data that reaches their queries."""
+    def register(email):
+        client.post("/api/users/", json={"email": email, "password": "pw"})
+        token = client.post("/api/token", data={"username": email, "password": "pw"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        return headers, client.get("/api/users/me", headers=headers).json()["id"]
+
+    headers, user_id = register("owner@example.com")
+    other_headers, other_id = register("member@example.com")
+    client.put(f"/api/users/{user_id}", headers=headers, json={"email": "owner@example.com", "password": "pw", "daily_start_hour": 8})
+
+    # Goals, sub-goals and tasks
+    goal_id = client.post("/api/goals/", headers=headers, json={"title": "Learn Python", "target_date": "2030-01-01T00:00:00", "methodology": "SMART"}).json()["id"]
+    client.post(f"/api/goals/{goal_id}/decompose", headers=headers)
+    client.get("/api/goals/", headers=headers)
+    client.get("/api/goals/", headers=headers, params={"cursor": encode_cursor("2030-01-01T00:00:00", goal_id)})
+    client.get("/api/goals/", headers=headers, params={"cursor": encode_cursor(None, goal_id)})
+    client.get(f"/api/goals/{goal_id}", headers=headers)
+    client.put(f"/api/goals/{goal_id}", headers=headers, json={"title": "Learn Rust", "target_date": "2030-01-01T00:00:00", "methodology": "SMART"})
+    sub_goal_id = client.post("/api/sub_goals/", headers=headers, json={"goal_id": goal_id, "title": "Basics", "description": "Syntax", "target_date": "2030-01-01T00:00:00"}).json()["id"]
+    client.get(f"/api/goals/{goal_id}/sub_goals/", headers=headers)
+    client.get(f"/api/sub_goals/{sub_goal_id}", headers=headers)
+    client.put(f"/api/sub_goals/{sub_goal_id}", headers=headers, json={"goal_id": goal_id, "title": "Basics 2", "description": "Syntax", "target_date": "2030-01-01T00:00:00"})
+    task_id = client.post("/api/tasks/", headers=headers, json={"sub_goal_id": sub_goal_id, "planned_start": "2030-01-01T09:00:00", "planned_end": "2030-01-01T10:00:00"}).json()["id"]
+    client.get(f"/api/sub_goals/{sub_goal_id}/tasks/", headers=headers)
+    client.get(f"/api/tasks/{task_id}", headers=headers)
+    client.put(f"/api/tasks/{task_id}", headers=headers, json={"sub_goal_id": sub_goal_id, "status": "done"})
+    client.put(f"/api/tasks/{task_id}/reschedule", headers=headers, json={"planned_start": "2030-01-02T09:00:00", "planned_end": "2030-01-02T10:00:00"})
+    client.post(f"/api/sub_goals/{sub_goal_id}/schedule/", headers=headers)
+
+    # Notifications
+    notification_id = client.post("/api/notifications/", headers=headers, json={"user_id": user_id, "task_id": task_id, "message": "Reminder", "notification_time": "2030-01-01T08:00:00", "method": "push"}).json()["id"]
+    feed = client.get("/api/notifications/me?limit=1&is_sent=false&since=2029-01-01T00:00:00", headers=headers)
+    client.get(f"/api/notifications/me?cursor={feed.headers.get('X-Next-Cursor', '')}", headers=headers)
+    client.get("/api/notifications/me", headers=headers, params={"cursor": encode_cursor(None, notification_id)})
+    client.put(f"/api/notifications/{notification_id}/mark_sent", headers=headers)
+
+    # Recurring tasks and calendar integrations
+    recurring_id = client.post("/api/recurring_tasks/", headers=headers, json={"user_id": user_id, "title": "Standup", "rrule": "FREQ=DAILY;COUNT=3", "start_date": "2020-01-01T09:00:00"}).json()["id"]
+    client.get("/api/recurring_tasks/me", headers=headers)
+    client.get("/api/recurring_tasks/me", headers=headers, params={"cursor": encode_cursor("2020-01-01T09:00:00", recurring_id)})
+    client.get("/api/recurring_tasks/me", headers=headers, params={"cursor": encode_cursor(None, recurring_id)})
+    client.post(f"/api/recurring_tasks/{recurring_id}/generate_tasks", headers=headers)
+    integration_id = client.post("/api/calendar_integrations/", headers=headers, json={"user_id": user_id, "provider": "google", "access_token": "token"}).json()["id"]
+    client.get("/api/calendar_integrations/me", headers=headers)
+    client.delete(f"/api/calendar_integrations/{integration_id}", headers=headers)
+
+    # Teams and OKRs
+    team_id = client.post("/api/teams/", headers=headers, json={"name": "Team"}).json()["id"]
+    client.post(f"/api/teams/{team_id}/members/", headers=headers, json={"user_id": other_id})
+    client.get("/api/teams/me", headers=other_headers)
+    client.get(f"/api/teams/{team_id}", headers=headers)
+    client.get(f"/api/teams/{team_id}/members", headers=headers)
+    client.put(f"/api/teams/{team_id}", headers=headers, json={"name": "Renamed"})
+    okr = {"team_id": team_id, "title": "OKR", "objective": "Ship", "quarter": "Q1", "year": 2030, "key_results": [{"title": "KR", "target_value": 10, "unit": "%"}]}
+    okr_id = client.post(f"/api/teams/{team_id}/okrs/", headers=headers, json=okr).json()["id"]
+    client.get(f"/api/teams/{team_id}/okrs/", headers=headers)
+    client.get(f"/api/teams/{team_id}/okrs/", headers=headers, params={"cursor": encode_cursor("2100-01-01T00:00:00", okr_id)})
+    client.get(f"/api/teams/{team_id}/okrs/{okr_id}", headers=headers)
+    client.put(f"/api/teams/{team_id}/okrs/{okr_id}", headers=headers, json=okr)
+    kr_id = client.post(f"/api/okrs/{okr_id}/key-results/", headers=headers, json={"title": "KR 2", "target_value": 5, "unit": "users"}).json()["id"]
+    client.put(f"/api/okrs/{okr_id}/key-results/{kr_id}", headers=headers, json={"title": "KR 2", "target_value": 6, "unit": "users"})
+    client.delete(f"/api/okrs/{okr_id}/key-results/{kr_id}", headers=headers)
+    client.delete(f"/api/teams/{team_id}/okrs/{okr_id}", headers=headers)
+    client.delete(f"/api/teams/{team_id}/members/{other_id}", headers=headers)
+
+    # Preferences and analytics
+    client.post("/api/preferences/", headers=headers, json={"user_id": user_id, "preference_key": "theme", "preference_value": "dark"})
+    client.get("/api/preferences/", headers=headers)
+    client.get("/api/preferences/", headers=headers, params={"cursor": encode_cursor("a", "id")})
+    client.get("/api/preferences/theme", headers=headers)
+    client.put("/api/preferences/theme", headers=headers, json={"user_id": user_id, "preference_key": "theme", "preference_value": "light"})
+    client.delete("/api/preferences/theme", headers=headers)
+    client.post("/api/analytics/", headers=headers, json={"user_id": user_id, "date": "2030-01-01", "tasks_completed": 3})
+    client.get("/api/analytics/?start_date=2029-12-01&end_date=2030-02-01", headers=headers)
+    client.get("/api/analytics/", headers=headers, params={"cursor": encode_cursor("2030-01-02", "id")})
+    client.get("/api/analytics/", headers=headers, params={"cursor": encode_cursor(None, "id")})
+    client.get("/api/analytics/2030-01-01", headers=headers)
+    client.put("/api/analytics/2030-01-01", headers=headers, json={"user_id": user_id, "date": "2030-01-01", "tasks_completed": 4})
+    client.get("/api/analytics/summary/", headers=headers)
+
+    # Learning platforms and courses
+    platform_id = client.post("/api/learning-platforms/", headers=headers, json={"user_id": user_id, "platform_name": "Coursera", "api_key": "key"}).json()["id"]
+    client.get("/api/learning-platforms/", headers=headers)
+    client.get(f"/api/learning-platforms/{platform_id}", headers=headers)
+    client.put(f"/api/learning-platforms/{platform_id}", headers=headers, json={"user_id": user_id, "platform_name": "Coursera", "api_key": "key2"})
+    course = {"platform_id": platform_id, "course_id": "ml-101", "title": "ML"}
+    course_id = client.post(f"/api/learning-platforms/{platform_id}/courses/", headers=headers, json=course).json()["id"]
+    client.get(f"/api/learning-platforms/{platform_id}/courses/", headers=headers)
+    client.get(f"/api/learning-platforms/{platform_id}/courses/", headers=headers, params={"cursor": encode_cursor("2100-01-01T00:00:00", course_id)})
+    client.get(f"/api/learning-courses/{course_id}", headers=headers)
+    client.put(f"/api/learning-courses/{course_id}", headers=headers, json={**course, "status": "completed"})
+    client.get("/api/learning-courses/summary/", headers=headers)
+    client.delete(f"/api/learning-courses/{course_id}", headers=headers)
+    client.delete(f"/api/learning-platforms/{platform_id}", headers=headers)
+
+    # Deletes last, once everything above has run
+    client.delete(f"/api/tasks/{task_id}", headers=headers)
+    client.delete(f"/api/sub_goals/{sub_goal_id}", headers=headers)
+    client.delete(f"/api/goals/{goal_id}", headers=headers)
+    client.delete(f"/api/teams/{team_id}", headers=headers)
+
+def test_router_queries_use_indexes_at_scale(tmp_path):
+    path = str(tmp_path / "plans.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    statements = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.setdefault(statement, parameters[0] if executemany else parameters)
+
+    event.listen(engine, "before_cursor_execute", record)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    principal_cache.clear()
+    try:
+        _exercise_routers(_CheckedClient(TestClient(app)))
+    finally:
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+    assert len(statements) > 50
+    _seed_stats(path)
+
+    conn = sqlite3.connect(path)
+    scans = []
+    for statement, parameters in statements.items():
+        normalized = " ".join(statement.split())
+        if any(pattern.match(normalized) for pattern in ALLOWED_SCANS):
+            continue
+        for *_, detail in conn.execute("EXPLAIN QUERY PLAN " + statement, parameters):
+            match = FULL_SCAN.match(detail)
+            if match and match.group(1) in Base.metadata.tables:
+                scans.append(f"{detail}\n    {normalized}")
+            # Keyset pages must walk an index in order, or page N sorts every matching row
+            if TEMP_SORT.match(detail) and KEYSET_PAGE.search(normalized):
+                scans.append(f"{detail}\n    {normalized}")
+    conn.close()
+    assert not scans, "Full table scans or sorts at 1M rows:\n" + "\n".join(scans)
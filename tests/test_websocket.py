@@ -0,0 +1,233 @@
+import asyncio
+import json
+
+import pytest
+
+from backend.core import ws_encoding
+from backend.core.websocket_manager import ConnectionManager
+
+class FakeWebSocket:
+    def __init__(self, delay=0.0, fail=False, subprotocols=()):
+        self.delay = delay
+        self.fail = fail
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.accepted_subprotocol = None
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self, subprotocol=None):
+        self.accepted_subprotocol = subprotocol
+
+    async def send_text(self, message):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+    async def send_bytes(self, data):
+        await self.send_text(data)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+async def _drain():
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+
+def test_multiple_connections_per_user():
+    async def scenario():
+        manager = ConnectionManager()
+        first, second, other = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await manager.connect(first, "user_1")
+        await manager.connect(second, "user_1")
+        await manager.connect(other, "user_2")
+
+        await manager.send_personal_message("hello", "user_1")
+        await manager.broadcast("everyone")
+        await _drain()
+        assert first.sent == ["hello", "everyone"]
+        assert second.sent == ["hello", "everyone"]
+        assert other.sent == ["everyone"]
+
+        manager.disconnect(first, "user_1")
+        await manager.send_personal_message("again", "user_1")
+        await _drain()
+        assert first.sent == ["hello", "everyone"]
+        assert second.sent[-1] == "again"
+        assert manager.metrics()["connections"] == 2
+    asyncio.run(scenario())
+
+def test_slow_consumer_does_not_block_others():
+    async def scenario():
+        manager = ConnectionManager(max_queue=2)
+        slow, fast = FakeWebSocket(delay=10), FakeWebSocket()
+        await manager.connect(slow, "slow")
+        await manager.connect(fast, "fast")
+
+        for i in range(5):
+            await manager.broadcast(f"update {i}", coalesce_key="progress")
+            await asyncio.sleep(0.01)
+        await _drain()
+        assert fast.sent == [f"update {i}" for i in range(5)]
+
+        metrics = manager.metrics()
+        assert metrics["max_queue_depth"] <= 2
+        assert metrics["messages_coalesced"] + metrics["messages_dropped"] > 0
+    asyncio.run(scenario())
+
+def test_disconnect_policy_and_failed_sends():
+    async def scenario():
+        manager = ConnectionManager(max_queue=1, overflow_policy="disconnect")
+        slow, broken = FakeWebSocket(delay=10), FakeWebSocket(fail=True)
+        await manager.connect(slow, "slow")
+        await manager.connect(broken, "broken")
+
+        for i in range(3):
+            await manager.send_personal_message(f"m{i}", "slow")
+        await manager.send_personal_message("boom", "broken")
+        await _drain()
+
+        assert slow.closed_with == 1013
+        assert broken.closed_with == 1011
+        metrics = manager.metrics()
+        assert metrics["connections"] == 0
+        assert metrics["slow_consumers_disconnected"] == 1
+    asyncio.run(scenario())
+
+def test_sqlite_pubsub_bridges_workers(tmp_path):
+    from backend.core.pubsub import SQLiteBackend
+
+    async def scenario():
+        path = str(tmp_path / "bus.db")
+        worker_a = ConnectionManager(backend=SQLiteBackend(path, poll_interval=0.005))
+        worker_b = ConnectionManager(backend=SQLiteBackend(path, poll_interval=0.005))
+        await worker_a.start()
+        await worker_b.start()
+        try:
+            tab_a, tab_b = FakeWebSocket(), FakeWebSocket()
+            await worker_a.connect(tab_a, "user_1")
+            await worker_b.connect(tab_b, "user_1")
+
+            for i in range(3):
+                await worker_a.send_personal_message(f"m{i}", "user_1")
+            await worker_b.broadcast("all")
+            await _drain()
+
+            # Each tab receives every message exactly once, whichever worker sent it;
+            # ordering is only guaranteed per publishing worker
+            assert tab_a.sent == ["m0", "m1", "m2", "all"]
+            assert sorted(tab_b.sent) == ["all", "m0", "m1", "m2"]
+            # The three personal messages went out as one batch
+            assert worker_a.metrics()["pubsub_batches_published"] == 1
+            assert worker_b.metrics()["pubsub_messages_received"] == 3
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+    asyncio.run(scenario())
+
+def test_pubsub_bus_defaults_to_sqlite(monkeypatch, tmp_path):
+    from backend.core.pubsub import PubSubBackend, RedisBackend, SQLiteBackend, create_backend
+
+    monkeypatch.delenv("WS_PUBSUB_BACKEND", raising=False)
+    monkeypatch.setenv("WS_PUBSUB_URL", str(tmp_path / "bus.db"))
+    assert isinstance(create_backend(), SQLiteBackend)
+    monkeypatch.setenv("WS_PUBSUB_BACKEND", "none")
+    assert create_backend() is None
+    assert isinstance(create_backend("redis", "redis://localhost:6379/0"), RedisBackend)
+    with pytest.raises(ValueError):
+        create_backend("kafka")
+    with pytest.raises(TypeError):
+        PubSubBackend()
+
+def test_topic_subscriptions_route_only_to_subscribers():
+    async def scenario():
+        manager = ConnectionManager()
+        watcher, bystander = FakeWebSocket(), FakeWebSocket()
+        watching = await manager.connect(watcher, "user_1")
+        await manager.connect(bystander, "user_2")
+
+        manager.subscribe(watching, "goal:1")
+        await manager.publish("goal:1", "goal 1 changed")
+        await manager.publish("goal:2", "goal 2 changed")
+        await _drain()
+        assert watcher.sent == ["goal 1 changed"]
+        assert bystander.sent == []
+
+        manager.unsubscribe(watching, "goal:1")
+        await manager.publish("goal:1", "ignored")
+        manager.subscribe(watching, "team:1")
+        manager.disconnect(watcher, "user_1")
+        await _drain()
+        assert watcher.sent == ["goal 1 changed"]
+        assert manager.metrics()["topics"] == 0
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize("subprotocol", ["pathcraft.json", "pathcraft.deflate", "pathcraft.msgpack"])
+def test_negotiated_encoding_batches_frames(subprotocol):
+    encoding = ws_encoding.SUBPROTOCOLS[subprotocol]
+    if encoding not in ws_encoding.available_encodings():
+        pytest.skip(f"{encoding} support is not installed")
+
+    async def scenario():
+        manager = ConnectionManager(batch_size=10)
+        batched = FakeWebSocket(subprotocols=["unknown", subprotocol])
+        legacy = FakeWebSocket()
+        await manager.connect(batched, "user_1")
+        await manager.connect(legacy, "user_1")
+        assert batched.accepted_subprotocol == subprotocol
+        assert legacy.accepted_subprotocol is None
+
+        # A burst of 25 events leaves as 3 frames on the batching connection
+        events = [json.dumps({"type": "task.created", "data": {"id": i}}) for i in range(25)]
+        for event in events:
+            await manager.send_personal_message(event, "user_1")
+        await manager.send_personal_message("plain text", "user_1")
+        await _drain()
+
+        assert legacy.sent == events + ["plain text"]
+        assert len(batched.sent) == 3
+        decoded = [item for frame in batched.sent for item in ws_encoding.decode_frame(encoding, frame)]
+        assert decoded == [json.loads(event) for event in events] + ["plain text"]
+        assert manager.metrics()["frames_sent"] == len(legacy.sent) + 3
+    asyncio.run(scenario())
+
+def test_heartbeat_pings_then_reaps_idle_connections():
+    async def scenario():
+        manager = ConnectionManager(heartbeat_interval=30, heartbeat_timeout=10)
+        quiet, chatty = FakeWebSocket(), FakeWebSocket()
+        quiet_connection = await manager.connect(quiet, "user_1")
+        chatty_connection = await manager.connect(chatty, "user_2")
+        start = quiet_connection.last_seen
+
+        # Idle past the interval: pinged but kept
+        chatty_connection.last_seen = start + 30
+        assert manager.reap_idle(now=start + 31) == 0
+        await _drain()
+        assert quiet.sent == [json.dumps({"type": "ping"})]
+        assert chatty.sent == []
+
+        # Still silent after the timeout: evicted; the responsive client stays
+        assert manager.reap_idle(now=start + 41) == 1
+        await _drain()
+        assert quiet.closed_with == 1001
+        metrics = manager.metrics()
+        assert metrics["connections"] == 1
+        assert metrics["connections_reaped"] == 1
+        assert metrics["pings_sent"] == 1
+    asyncio.run(scenario())
+
+def test_send_rate_and_latency_metrics():
+    async def scenario():
+        manager = ConnectionManager()
+        await manager.connect(FakeWebSocket(), "user_1")
+        for i in range(10):
+            await manager.send_personal_message(f"m{i}", "user_1")
+        await _drain()
+
+        metrics = manager.metrics()
+        assert metrics["messages_sent"] == 10
+        assert metrics["bytes_sent"] == 20
+        assert metrics["messages_per_second"] == 10 / manager.stats.window_seconds
+        assert metrics["bytes_per_second"] == 20 / manager.stats.window_seconds
+        assert 0 <= metrics["send_latency_ms_p50"] <= metrics["send_latency_ms_p99"]
+    asyncio.run(scenario())